@@ -21,6 +21,9 @@ const FileIcon = ({ type, size = 32 }) => {
   return <FileText size={size} className="text-indigo-400" />;
 };
 
+// Files per /files/list request (the server caps it at 200)
+const PAGE_SIZE = 50;
+
 // ── Tag color cycling ──
 const TAG_COLORS = [
   'bg-indigo-500/10 text-indigo-400 border-indigo-500/20',
@@ -44,6 +47,7 @@ const AITag = ({ tag, index }) => (
 const FileCard = ({ file, onSelect, onDelete, onRunAI, isAnalyzing }) => {
   const isImage = file.file_type?.startsWith('image');
   const tags = file.ai_tags ? file.ai_tags.split(',').slice(0, 3) : [];
+  const preview = file.summary_preview ?? file.summary;
 
   return (
     <motion.div
@@ -115,10 +119,10 @@ const FileCard = ({ file, onSelect, onDelete, onRunAI, isAnalyzing }) => {
                   {tags.map((tag, i) => <AITag key={i} tag={tag} index={i} />)}
                 </div>
               )}
-              {file.summary && (
+              {preview && (
                 <p className="text-[11px] leading-relaxed text-zinc-500 dark:text-zinc-400 line-clamp-3">
-                  {file.summary.replace(/\*/g, '').substring(0, 140)}
-                  {file.summary.length > 140 ? '…' : ''}
+                  {preview.replace(/\*/g, '').substring(0, 140)}
+                  {preview.length > 140 ? '…' : ''}
                 </p>
               )}
             </div>
@@ -161,6 +165,9 @@ const FileCard = ({ file, onSelect, onDelete, onRunAI, isAnalyzing }) => {
 const Dashboard = () => {
   const { user } = useAuth();
   const [files, setFiles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const loadMoreRef = useRef(null);
   const [uploading, setUploading] = useState(false);
   const [analyzing, setAnalyzing] = useState(null);
   const [search, setSearch] = useState('');
@@ -177,17 +184,52 @@ const Dashboard = () => {
 
   const getDownloadUrl = (url) => url ? url.replace('/upload/', '/upload/fl_attachment/') : '';
 
-  const fetchFiles = async () => {
+  // Keyset pages: the first page on load, the next one when the list end scrolls into view
+  const fetchFiles = async (cursor = null) => {
     try {
-      const res = await api.get('/files/list');
-      setFiles(res.data.files);
+      const res = await api.get('/files/list', { params: { limit: PAGE_SIZE, cursor } });
+      setFiles((prev) => {
+        if (!cursor) return res.data.files;
+        const seen = new Set(prev.map((f) => f.id));
+        return [...prev, ...res.data.files.filter((f) => !seen.has(f.id))];
+      });
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       toast.error('Could not load files.');
     }
   };
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    await fetchFiles(nextCursor);
+    setLoadingMore(false);
+  }, [nextCursor, loadingMore]);
+
   useEffect(() => { fetchFiles(); }, []);
 
+  useEffect(() => {
+    const node = loadMoreRef.current;
+    if (!node) return;
+    const observer = new IntersectionObserver(
+      (entries) => { if (entries[0].isIntersecting) loadMore(); },
+      { rootMargin: '200px' }
+    );
+    observer.observe(node);
+    return () => observer.disconnect();
+  }, [loadMore]);
+
+  // The list only carries a summary preview; load the full record on open
+  const selectFile = async (file) => {
+    setSelectedFile(file);
+    try {
+      const res = await api.get(`/files/${file.id}`);
+      setSelectedFile((prev) => prev?.id === file.id ? { ...prev, ...res.data.file } : prev);
+    } catch (err) {
+      toast.error('Could not load file details.');
+    }
+  };
+
   useEffect(() => {
     if (selectedFile) {
       setChatHistory([]);
@@ -196,7 +238,7 @@ const Dashboard = () => {
       setIsRenaming(false);
       setRenameValue(selectedFile.filename);
     }
-  }, [selectedFile]);
+  }, [selectedFile?.id]);
 
   useEffect(() => {
     chatEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -208,8 +250,9 @@ const Dashboard = () => {
     const formData = new FormData();
     formData.append('file', file);
     try {
-      await api.post('/files/upload', formData);
-      await fetchFiles();
+      // Newest first: put the new record on top instead of reloading the list
+      const res = await api.post('/files/upload', formData);
+      setFiles((prev) => [res.data.file, ...prev.filter((f) => f.id !== res.data.file.id)]);
       toast.success('File uploaded!', { id: loadingToast });
     } catch {
       toast.error('Upload failed.', { id: loadingToast });
@@ -243,7 +286,16 @@ const Dashboard = () => {
     setAnalyzing(fileId);
     const loadingToast = toast.loading('Analyzing with AI…');
     try {
-      const res = await api.post(`/files/${fileId}/analyze`);
+      let res = await api.post(`/files/${fileId}/analyze`);
+      // 202 = queued in the background; poll until the job finishes
+      while (res.status === 202 || ['queued', 'running'].includes(res.data.job?.status)) {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        res = await api.get(`/files/${fileId}/analyze/status`);
+      }
+      if (res.data.job?.status === 'failed') {
+        toast.error(res.data.job.error || 'Analysis Failed', { id: loadingToast });
+        return;
+      }
       const updatedFile = res.data.file;
       setFiles((prev) => prev.map((f) => f.id === fileId ? updatedFile : f));
       if (selectedFile?.id === fileId) setSelectedFile(updatedFile);
@@ -315,7 +367,7 @@ const Dashboard = () => {
   const filteredFiles = files.filter((f) =>
     f.filename.toLowerCase().includes(search.toLowerCase()) ||
     f.ai_tags?.toLowerCase().includes(search.toLowerCase()) ||
-    f.summary?.toLowerCase().includes(search.toLowerCase())
+    (f.summary_preview ?? f.summary)?.toLowerCase().includes(search.toLowerCase())
   );
 
   return (
@@ -362,7 +414,7 @@ const Dashboard = () => {
                 Your Files
               </h1>
               <p className="text-xs text-zinc-400 dark:text-zinc-500 font-mono mt-0.5">
-                {files.length} {files.length === 1 ? 'file' : 'files'} stored
+                {files.length}{nextCursor ? '+' : ''} {files.length === 1 && !nextCursor ? 'file' : 'files'} stored
               </p>
             </div>
 
@@ -468,7 +520,7 @@ const Dashboard = () => {
                   >
                     <FileCard
                       file={file}
-                      onSelect={setSelectedFile}
+                      onSelect={selectFile}
                       onDelete={deleteFile}
                       onRunAI={runAI}
                       isAnalyzing={analyzing === file.id}
@@ -479,6 +531,22 @@ const Dashboard = () => {
             </motion.div>
           )}
         </AnimatePresence>
+
+        {/* ── Next Page ── */}
+        {nextCursor && (
+          <div ref={loadMoreRef} className="flex justify-center pb-10">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="flex items-center gap-2 px-4 py-2 rounded-lg text-sm font-medium
+                text-zinc-600 dark:text-zinc-300 border border-zinc-200 dark:border-white/[0.08]
+                hover:bg-zinc-100 dark:hover:bg-white/[0.04] disabled:opacity-50 transition-all"
+            >
+              {loadingMore && <Loader2 size={14} className="animate-spin" />}
+              {loadingMore ? 'Loading…' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* ── File Detail Modal ── */}
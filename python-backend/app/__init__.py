@@ -19,25 +19,13 @@ def get_rate_limit_key():
     Determines the key used for rate limiting.
     Prioritizes the authenticated user ID from a Bearer token; 
     falls back to the remote IP address if no valid token is present.
+    The token is verified once per request and reused by the auth decorators.
     """
-    from flask import request
-    from app.auth.utils import verify_token
-
-    # 1. Get Authorization Header safely
-    auth_header = request.headers.get("Authorization", "")
-
-    # 2. ONLY attempt verification if it looks like a valid Bearer token
-    # This fixes the "TOKEN ERROR: Not enough segments" log spam
-    if auth_header and auth_header.startswith("Bearer "):
-        token_parts = auth_header.split(" ", 1)
-        if len(token_parts) == 2:
-            token = token_parts[1]
-            try:
-                user_id = verify_token(token)
-                if user_id:
-                    return f"user:{user_id}"
-            except:
-                pass
+    from app.auth.auth_helpers import get_auth_context
+
+    context = get_auth_context()
+    if context is not None:
+        return f"user:{context.user_id}"
 
     # Default to IP address if no valid token found
     return get_remote_address()
@@ -84,5 +72,38 @@ def create_app():
     # Create database tables within the application context
     with app.app_context():
         db.create_all()
+        # create_all skips columns and indexes added to tables that already exist
+        from .storage.blob_store import ensure_blob_schema
+        ensure_blob_schema()
+        from .models import UploadedFile
+        for index in UploadedFile.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        # AI text moved from uploaded_files into versioned file_analyses rows
+        from .ai.analysis_store import ensure_analysis_schema
+        ensure_analysis_schema()
+
+    # Full-text search index (Postgres tsvector / SQLite FTS5)
+    from .search import init_search_index, init_vector_index
+    init_search_index(app)
+    # Semantic (embedding) search over chunked AI text (pgvector / NumPy on disk)
+    init_vector_index(app)
+
+    # Gemini client, AI result + file handle caches (module-wide: AI stages run outside the app context)
+    from .ai.gemini_client import init_gemini_client
+    from .ai.result_cache import init_result_cache
+    from .ai.file_handles import init_file_cache
+    init_gemini_client(app)
+    init_result_cache(app)
+    init_file_cache(app)
+
+    # Activity log: schema upgrade + retention job, then the buffered writer (bulk inserts)
+    from .utils.activity_archive import init_activity_archiver
+    init_activity_archiver(app)
+    from .utils.activity_logger import init_activity_writer
+    init_activity_writer(app)
+
+    # Start the background analysis workers (needs the tables above)
+    from .jobs import init_job_queue
+    init_job_queue(app)
 
     return app
\ No newline at end of file
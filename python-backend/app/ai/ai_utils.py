@@ -60,15 +60,11 @@ def save_temp_file(file_obj: FileStorage) -> str:
 
 def extract_text_from_docx(file_path: str) -> str:
     """
-    Extracts text from a .docx file using python-docx.
+    Extracts text from a .docx file (paragraphs, tables, headers and footers).
     """
     try:
-        import docx
-        doc = docx.Document(file_path)
-        full_text = []
-        for para in doc.paragraphs:
-            full_text.append(para.text)
-        return '\n'.join(full_text)
+        from .text_extract import extract_docx
+        return extract_docx(file_path)
     except Exception as e:
         print(f"Error reading DOCX: {e}")
-        return ""
\ No newline at end of file
+        return ""
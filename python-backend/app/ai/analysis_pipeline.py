@@ -0,0 +1,262 @@
+# app/ai/analysis_pipeline.py
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+from flask import current_app
+
+from .ai_utils import is_image, extract_text_from_docx
+from .classify_local import classify_image
+from .ocr_local import extract_text
+from .summarize_api import summarize_text, summarize_document
+from .vision_api import analyze_file_bytes, analyze_via_upload, transcribe_via_upload
+from .text_extract import decode_text, extract_pdf, write_pdf_subset
+from .combined_api import analyze_image_combined
+from .image_prep import prepare_image
+from .stage_graph import StageGraph, StageRun
+from .analysis_store import ANALYSIS_FIELDS, record_analysis
+from app.storage.downloader import fetch_uploaded_file, DownloadError
+
+
+class AnalysisError(Exception):
+    """Raised when a stored file cannot be fetched or analyzed."""
+
+
+# --------------------------------------------------------
+## ⬇️ Download Helper
+# --------------------------------------------------------
+
+def _fetch_file(file_record):
+    """
+    Fetches the stored file behind `file_record` through the shared
+    download service (pooled session, on-disk blob cache).
+
+    Returns:
+        tuple: (local_path, file_bytes). The path belongs to the blob cache
+        (or is the LocalStorage file itself) and must not be deleted.
+    """
+    try:
+        local_path = fetch_uploaded_file(file_record)
+        with open(local_path, "rb") as f: file_bytes = f.read()
+    except DownloadError as e:
+        raise AnalysisError(str(e)) from e
+    except OSError as e:
+        raise AnalysisError(f"Failed to read file: {e}") from e
+
+    print(f"✅ DEBUG: File available at: {local_path}")
+    return local_path, file_bytes
+
+
+# --------------------------------------------------------
+## 🖼️ Image Stage Graph
+# --------------------------------------------------------
+
+def _run_image_stages(temp_path, file_bytes, mime_type, use_cache: bool = True) -> StageRun:
+    """
+    Tagging, OCR and the vision call are independent round trips, so they run
+    concurrently; the summary only waits for the vision stage. All three share
+    one File API upload of the image.
+    """
+    graph = StageGraph(
+        max_workers=current_app.config.get("AI_STAGE_WORKERS", 4),
+        default_timeout=current_app.config.get("AI_STAGE_TIMEOUT", 90)
+    )
+    if temp_path:
+        graph.add("classify", lambda _: classify_image(temp_path, use_cache=use_cache))
+        graph.add("ocr", lambda _: extract_text(temp_path, use_cache=use_cache))
+    if file_bytes:
+        graph.add("vision", lambda _: analyze_file_bytes(file_bytes, mime_type, use_cache=use_cache,
+                                                         file_path=temp_path))
+        graph.add(
+            "summary",
+            lambda r: summarize_text(r["vision"], use_cache=use_cache) if len(r["vision"]) > 500 else None,
+            depends_on=["vision"]
+        )
+    run = graph.run()
+    print(f"⏱️ DEBUG: Image stage timings: {run.timings}")
+    return run
+
+
+def run_combined_image(temp_path, mime_type, use_cache: bool = True) -> Optional[dict]:
+    """
+    Single structured-output call for tags, OCR, description and summary.
+    Returns None (after logging) when it fails, so the caller can run the stages.
+    """
+    if not temp_path:
+        return None
+    try:
+        return analyze_image_combined(temp_path, mime_type, use_cache=use_cache)
+    except Exception as e:
+        print(f"⚠️ DEBUG: Combined analysis failed, falling back to stages: {e}")
+        return None
+
+
+# --------------------------------------------------------
+## 📝 Document Summary
+# --------------------------------------------------------
+
+def _summarize_document(text: str, use_cache: bool = True) -> str:
+    """Whole-document summary (map-reduce past one chunk), sized by the app config."""
+    return summarize_document(
+        text, use_cache=use_cache,
+        max_chunk_tokens=current_app.config.get("SUMMARY_CHUNK_TOKENS", 3000),
+        fan_out=current_app.config.get("SUMMARY_FAN_OUT", 4)
+    )
+
+
+# --------------------------------------------------------
+## 📕 PDF Text Layer
+# --------------------------------------------------------
+
+def _transcribe_pages(temp_path, page_numbers, use_cache: bool = True) -> str:
+    """Sends only the given (scanned) pages to Gemini and returns their text."""
+    fd, subset_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        write_pdf_subset(temp_path, page_numbers, subset_path)
+        return transcribe_via_upload(subset_path, "application/pdf", use_cache=use_cache)
+    except Exception as e:
+        print(f"⚠️ DEBUG: Scanned page transcription failed: {e}")
+        return ""
+    finally:
+        os.remove(subset_path)
+
+
+def extract_pdf_text(temp_path, use_cache: bool = True) -> Optional[str]:
+    """
+    Reads the PDF's embedded text layer page by page. Pages without one
+    (scans) are sent to Gemini on their own; the rest never leave the host.
+
+    Returns None when there is no usable text layer at all, so the caller
+    sends the whole document to Gemini as before.
+    """
+    document = extract_pdf(temp_path)
+    if document is None or not document.page_texts:
+        return None
+    missing = document.pages_without_text
+
+    text = document.text
+    print(f"📄 DEBUG: PDF text layer on {len(document.page_texts)}/{document.page_count} pages")
+    if missing:
+        scanned = _transcribe_pages(temp_path, missing, use_cache)
+        if scanned:
+            pages = ", ".join(str(n) for n in missing)
+            text += f"\n\n[Scanned pages {pages}]\n{scanned}"
+    return text
+
+
+# --------------------------------------------------------
+## 🤖 Smart Analysis
+# --------------------------------------------------------
+
+def run_file_analysis(file_record, use_cache: bool = True) -> Dict[str, float]:
+    """
+    Runs the AI pipeline for a stored file and records the results as its
+    current FileAnalysis (ai_tags, ocr_text, summary, vision_analysis), then
+    sets is_analyzed.
+
+    The caller owns the database session and is responsible for committing.
+    Pass `use_cache=False` to force fresh Gemini calls. Images use one
+    combined call when AI_ANALYSIS_MODE is 'combined'.
+
+    Returns:
+        dict: Per-stage wall-clock seconds (empty for single-call paths).
+    """
+    print(f"⬇️ DEBUG: Downloading from {file_record.url[:30]}...")
+    temp_path, file_bytes = _fetch_file(file_record)
+    timings, result = _analyze(file_record, temp_path, file_bytes, use_cache)
+    # Fields this run did not produce (e.g. a failed stage) keep their current values
+    if file_record.analysis is not None:
+        for field in ANALYSIS_FIELDS:
+            result.setdefault(field, getattr(file_record.analysis, field))
+    record_analysis(file_record, **result)
+    file_record.is_analyzed = True
+    return timings
+
+
+def _analyze(file_record, temp_path, file_bytes, use_cache: bool):
+    """The type switch behind run_file_analysis; returns (timings, FileAnalysis fields)."""
+    timings: Dict[str, float] = {}
+    result: Dict[str, Optional[str]] = {}
+
+    print("🧠 DEBUG: Entering AI Logic Switch...")
+
+    # SCENARIO: PDF
+    if file_record.file_type == "application/pdf" or file_record.filename.lower().endswith(".pdf"):
+        print("👉 DEBUG: Processing as PDF")
+        result["ai_tags"] = "PDF Document"
+        pdf_text = extract_pdf_text(temp_path, use_cache) if temp_path else None
+        if pdf_text:
+            # Text-native PDF: summarize the local text instead of uploading the document
+            result["ocr_text"] = pdf_text
+            print("⏳ DEBUG: Summarizing PDF text...")
+            result["summary"] = _summarize_document(pdf_text, use_cache)
+            result["vision_analysis"] = result["summary"]
+            print("✅ DEBUG: PDF Analysis Success")
+        elif temp_path:
+            result["vision_analysis"] = analyze_via_upload(temp_path, "application/pdf", use_cache=use_cache)
+            result["summary"] = result["vision_analysis"]
+            print("✅ DEBUG: PDF Analysis returned.")
+
+    # SCENARIO: WORD DOCX
+    elif file_record.filename.lower().endswith(".docx"):
+        print("👉 DEBUG: Processing as DOCX")
+        result["ai_tags"] = "Word Document"
+        if temp_path:
+            doc_text = extract_text_from_docx(temp_path)
+            if doc_text:
+                # Full text is kept: chat retrieves the relevant chunks of it
+                result["ocr_text"] = doc_text
+                print("⏳ DEBUG: Summarizing Word Doc...")
+                result["summary"] = _summarize_document(doc_text, use_cache)
+                print("✅ DEBUG: DOCX Analysis Success")
+            else:
+                print("❌ DEBUG: Failed to extract text from DOCX")
+
+    # SCENARIO: TEXT
+    elif file_record.file_type.startswith("text") or file_record.filename.lower().endswith(('.txt', '.md', '.csv', '.py')):
+        print("👉 DEBUG: Processing as TEXT")
+        result["ai_tags"] = "Text File"
+        text = decode_text(file_bytes)
+        result["ocr_text"] = text
+        print("⏳ DEBUG: Summarizing text...")
+        result["summary"] = _summarize_document(text, use_cache)
+        print("✅ DEBUG: Summary created.")
+
+    # SCENARIO: IMAGE
+    elif is_image(file_record.file_type) or file_record.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.avif')):
+        print("👉 DEBUG: Processing as IMAGE")
+        mime_type = file_record.file_type
+        if temp_path:
+            # Downscaled / upright / transcoded variant, shared by every stage
+            prepared = prepare_image(temp_path, mime_type)
+            if prepared.transformed:
+                temp_path, mime_type, file_bytes = prepared.path, prepared.mime_type, prepared.read_bytes()
+
+        if current_app.config.get("AI_ANALYSIS_MODE", "stages").lower() == "combined":
+            start = time.perf_counter()
+            combined = run_combined_image(temp_path, mime_type, use_cache)
+            if combined is not None:
+                result["ai_tags"] = ", ".join(combined["tags"])
+                result["ocr_text"] = combined["ocr_text"]
+                result["vision_analysis"] = combined["description"]
+                result["summary"] = combined["summary"] or combined["description"]
+                elapsed = round(time.perf_counter() - start, 3)
+                return {"combined": elapsed, "total": elapsed}, result
+
+        run = _run_image_stages(temp_path, file_bytes, mime_type, use_cache)
+        timings = run.timings
+
+        if "classify" in run.results:
+            result["ai_tags"] = run.results["classify"].get("label", "")
+        if "ocr" in run.results:
+            result["ocr_text"] = run.results["ocr"]
+        if "vision" in run.results:
+            result["vision_analysis"] = run.results["vision"]
+
+            # ✨ FIX: For images, use the vision text as the summary!
+            # (Or summarize it if it's too long)
+            if not result.get("summary"):
+                result["summary"] = run.results.get("summary") or run.results["vision"]
+
+    return timings, result
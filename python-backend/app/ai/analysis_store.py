@@ -0,0 +1,122 @@
+# app/ai/analysis_store.py
+import hashlib
+import logging
+from typing import List, Optional
+
+from sqlalchemy import func, inspect, text
+
+from app import db
+from app.models import FileAnalysis
+from . import classify_local, combined_api, ocr_local, summarize_api, vision_api
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODEL = vision_api.MODEL_NAME
+# Changes whenever a prompt the pipeline sends changes, so results can be told apart by prompt set
+PROMPT_VERSION = hashlib.sha256("\x00".join((
+    classify_local.TAG_PROMPT, ocr_local.OCR_PROMPT, combined_api.COMBINED_PROMPT,
+    summarize_api.SUMMARY_PROMPT, summarize_api.CHUNK_PROMPT, summarize_api.MERGE_PROMPT,
+    vision_api.VISION_PROMPT, vision_api.DOCUMENT_PROMPT, vision_api.TRANSCRIBE_PROMPT,
+)).encode("utf-8")).hexdigest()[:12]
+
+LEGACY_COLUMNS = ("summary", "ocr_text", "vision_analysis")
+ANALYSIS_FIELDS = ("ai_tags",) + LEGACY_COLUMNS
+
+
+# --------------------------------------------------------
+## 🧱 Schema Upgrade
+# --------------------------------------------------------
+
+def ensure_analysis_schema(batch_size: int = 500):
+    """
+    Moves AI text stored inline on uploaded_files (before file_analyses
+    existed) into version-1 FileAnalysis rows, then drops those columns.
+    """
+    columns = {c["name"] for c in inspect(db.engine).get_columns("uploaded_files")}
+    if "analysis_id" not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE uploaded_files ADD COLUMN analysis_id INTEGER"))
+    legacy = [c for c in LEGACY_COLUMNS if c in columns]
+    if not legacy:
+        return
+
+    select_sql = text(
+        f"SELECT id, ai_tags, {', '.join(legacy)} FROM uploaded_files"
+        f" WHERE analysis_id IS NULL AND id > :after"
+        f" AND ({' OR '.join(f'{c} IS NOT NULL' for c in legacy)}) ORDER BY id LIMIT :limit"
+    )
+    moved, after = 0, 0
+    while True:
+        rows = db.session.execute(select_sql, {"after": after, "limit": batch_size}).mappings().all()
+        if not rows:
+            break
+        for row in rows:
+            analysis = FileAnalysis(row["id"], 1, "unknown", "legacy", ai_tags=row["ai_tags"],
+                                    **{c: row[c] for c in legacy})
+            db.session.add(analysis)
+            db.session.flush()
+            db.session.execute(text("UPDATE uploaded_files SET analysis_id = :analysis WHERE id = :id"),
+                               {"analysis": analysis.id, "id": row["id"]})
+        db.session.commit()
+        moved += len(rows)
+        after = rows[-1]["id"]
+
+    for column in legacy:
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE uploaded_files DROP COLUMN {column}"))
+        except Exception as e:
+            # e.g. SQLite < 3.35: keep the column but release its contents
+            logger.warning(f"Could not drop uploaded_files.{column} ({e}); clearing it instead")
+            with db.engine.begin() as conn:
+                conn.execute(text(f"UPDATE uploaded_files SET {column} = NULL"))
+    logger.info(f"Moved AI text of {moved} files into file_analyses")
+
+
+# --------------------------------------------------------
+## 💾 Versions
+# --------------------------------------------------------
+
+def record_analysis(file_record, ai_tags: Optional[str] = None, summary: Optional[str] = None,
+                    ocr_text: Optional[str] = None, vision_analysis: Optional[str] = None,
+                    model: str = ANALYSIS_MODEL, prompt_version: str = PROMPT_VERSION) -> FileAnalysis:
+    """
+    Makes the given results the file's current analysis. A new version is
+    added unless they equal the current one (same model, prompts and text,
+    e.g. a cached re-run), so history only grows when something changed.
+    Does not commit.
+    """
+    values = {"ai_tags": ai_tags, "summary": summary, "ocr_text": ocr_text, "vision_analysis": vision_analysis}
+    current = file_record.analysis
+    if (current is not None and current.model == model and current.prompt_version == prompt_version
+            and all(getattr(current, field) == value for field, value in values.items())):
+        return current
+
+    latest = db.session.query(func.max(FileAnalysis.version)).filter_by(file_id=file_record.id).scalar()
+    analysis = FileAnalysis(file_record.id, (latest or 0) + 1, model, prompt_version, **values)
+    db.session.add(analysis)
+    file_record.analysis = analysis
+    file_record.ai_tags = ai_tags
+    return analysis
+
+
+def copy_analysis(source_record, file_record) -> Optional[FileAnalysis]:
+    """Gives a deduplicated upload its own copy of the source file's current analysis. Does not commit."""
+    source = source_record.analysis
+    if source is None:
+        return None
+    analysis = FileAnalysis(file_record.id, 1, source.model, source.prompt_version,
+                            **{field: getattr(source, field) for field in ANALYSIS_FIELDS})
+    db.session.add(analysis)
+    file_record.analysis = analysis
+    return analysis
+
+
+def list_analyses(file_id: int) -> List[FileAnalysis]:
+    """All versions of a file's analysis, newest first (text columns stay unloaded)."""
+    return FileAnalysis.query.filter_by(file_id=file_id).order_by(FileAnalysis.version.desc()).all()
+
+
+def delete_analyses(file_id: int) -> int:
+    """Removes every version of a file's analysis. Does not commit."""
+    return FileAnalysis.query.filter_by(file_id=file_id).delete(synchronize_session=False)
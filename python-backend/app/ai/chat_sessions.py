@@ -0,0 +1,241 @@
+# app/ai/chat_sessions.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from flask import current_app
+
+from app import db
+from app.models import ChatSession, ChatTurn
+from app.storage.downloader import fetch_uploaded_file, DownloadError
+from .file_handles import get_file_cache
+from .image_prep import prepare_image
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.heic', '.avif']
+
+IMAGE_SYSTEM_PROMPT = (
+    "You are a helpful visual assistant. "
+    "Answer the user's question based on the image in a concise, conversational way. "
+    "If the user asks for advice/improvements, give exactly 3 short, actionable bullet points. "
+    "Do not write long paragraphs or formal reports."
+)
+TEXT_SYSTEM_PROMPT = (
+    "You are an AI assistant analyzing a file. "
+    "Answer based ONLY on the context. Use Markdown."
+)
+HISTORY_SUMMARY_PROMPT = (
+    "Condense this conversation about a file into a short paragraph that keeps every fact, "
+    "name and number a follow-up question might refer to.\n\n"
+)
+
+
+# --------------------------------------------------------
+## 🧱 Static Chat Context
+# --------------------------------------------------------
+
+class ChatContext:
+    """
+    The per-file part of a chat prompt that does not change between turns:
+    the system prompt plus the file summary (text files) or the image part.
+
+    It is always sent first and byte-for-byte identical, so the model's
+    implicit prefix caching can reuse it across turns.
+    """
+
+    def __init__(self, prefix: str, media=None):
+        self.prefix = prefix
+        # Gemini File API handle (uploaded once) or a decoded PIL image
+        self.media = media
+
+    @property
+    def is_image(self) -> bool:
+        return self.media is not None
+
+    def contents(self, question: str, history: str = "", excerpts: str = "") -> list:
+        parts = [self.prefix]
+        if self.media is not None:
+            parts.append(self.media)
+        if history:
+            parts.append(f"CONVERSATION SO FAR:\n{history}")
+        if excerpts:
+            parts.append(f"RELEVANT EXCERPTS:\n{excerpts}")
+        parts.append(f"USER QUESTION: {question}" if not self.is_image else question)
+        return parts
+
+
+def _image_part(image_path: str, mime_type: str):
+    """
+    Uses the preprocessed (downscaled) variant of the image; with the Gemini
+    backend it is uploaded to the File API so later turns send a reference
+    instead of the pixels, otherwise it is decoded once.
+    """
+    from PIL import Image
+
+    prepared = prepare_image(image_path, mime_type if "/" in (mime_type or "") else None)
+    if current_app.config.get("CHAT_MODEL_BACKEND", "gemini").lower() == "gemini":
+        try:
+            # Same content-addressed upload the analysis stages used, if still live
+            return get_file_cache().get_or_upload(prepared.path, prepared.mime_type)
+        except Exception as e:
+            print(f"⚠️ Chat image upload failed, sending pixels instead: {e}")
+
+    image = Image.open(prepared.path)
+    image.load()  # decode now; the cached blob file may be evicted later
+    return image
+
+
+def build_chat_context(file_record) -> Optional[ChatContext]:
+    """
+    Builds the static context for a file: the image itself for images
+    (when it can be fetched), else the summary. Returns None when there is
+    nothing to chat about yet.
+    """
+    if any(file_record.filename.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+        print("📷 DEBUG: Detected Image. Downloading for Vision API...")
+        try:
+            image_path = fetch_uploaded_file(file_record)
+            return ChatContext(IMAGE_SYSTEM_PROMPT, _image_part(image_path, file_record.file_type))
+        except (DownloadError, OSError) as e:
+            # Fall back to the text context
+            print(f"❌ Error loading image: {e}")
+
+    if not (file_record.summary or file_record.ocr_text or file_record.vision_analysis):
+        return None
+    prefix = TEXT_SYSTEM_PROMPT
+    if file_record.summary:
+        prefix += f"\n\nFILE SUMMARY:\n{file_record.summary}"
+    return ChatContext(prefix)
+
+
+# --------------------------------------------------------
+## 🗃️ Session Context Cache
+# --------------------------------------------------------
+
+class ChatContextCache:
+    """
+    In-process LRU of ChatContext per chat session, so follow-up questions
+    skip the download, image decode/upload and prefix rebuild. Entries
+    expire after `ttl` seconds (File API handles are short-lived too).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 1800):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: int) -> Optional[ChatContext]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            created, context = entry
+            if time.monotonic() - created > self.ttl:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return context
+
+    def put(self, session_id: int, context: ChatContext):
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), context)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def drop(self, session_id: int):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+def get_chat_context_cache() -> ChatContextCache:
+    cache = current_app.extensions.get("chat_context_cache")
+    if cache is None:
+        cache = current_app.extensions["chat_context_cache"] = ChatContextCache(
+            max_entries=current_app.config.get("CHAT_CONTEXT_CACHE_SIZE", 256),
+            ttl=current_app.config.get("CHAT_CONTEXT_TTL", 1800)
+        )
+    return cache
+
+
+def get_chat_context(file_record, session: Optional[ChatSession] = None) -> Optional[ChatContext]:
+    """Returns the session's cached context, building (and caching) it on first use."""
+    if session is None:
+        return build_chat_context(file_record)
+    cache = get_chat_context_cache()
+    context = cache.get(session.id)
+    if context is None:
+        context = build_chat_context(file_record)
+        if context is not None:
+            cache.put(session.id, context)
+    return context
+
+
+# --------------------------------------------------------
+## 🧠 Turn History
+# --------------------------------------------------------
+
+def _transcript(turns: List[ChatTurn]) -> str:
+    return "\n".join(f"{'User' if t.role == ChatTurn.ROLE_USER else 'Assistant'}: {t.text}" for t in turns)
+
+
+def _open_turns(session: ChatSession) -> List[ChatTurn]:
+    """Turns not yet folded into the session summary, oldest first."""
+    return ChatTurn.query.filter_by(session_id=session.id)\
+        .order_by(ChatTurn.id).offset(session.summarized_turns).all()
+
+
+def history_text(session: Optional[ChatSession]) -> str:
+    """Summary of older turns plus the recent turns verbatim."""
+    if session is None:
+        return ""
+    parts = []
+    if session.history_summary:
+        parts.append(f"(Earlier) {session.history_summary}")
+    transcript = _transcript(_open_turns(session))
+    if transcript:
+        parts.append(transcript)
+    return "\n".join(parts)
+
+
+def compact_history(session: ChatSession, model, window: int):
+    """
+    Once more than `window` turns are open, folds all but the newest half
+    of them into `history_summary` with one model call. Compacting in
+    batches keeps the summarization cost to one call every few turns.
+    """
+    turns = _open_turns(session)
+    if len(turns) <= window:
+        return
+    overflow = turns[:len(turns) - max(window // 2, 1)]
+    previous = f"Earlier summary: {session.history_summary}\n\n" if session.history_summary else ""
+    prompt = f"{HISTORY_SUMMARY_PROMPT}{previous}{_transcript(overflow)}"
+    session.history_summary = model.generate_content(prompt).text
+    session.summarized_turns += len(overflow)
+
+
+def record_exchange(session: ChatSession, question: str, answer: str, model):
+    """Stores one question/answer pair, compacts old turns and commits."""
+    try:
+        db.session.add(ChatTurn(session.id, ChatTurn.ROLE_USER, question))
+        db.session.add(ChatTurn(session.id, ChatTurn.ROLE_MODEL, answer))
+        session.updated_at = datetime.now(timezone.utc)
+        db.session.flush()
+        try:
+            compact_history(session, model, current_app.config.get("CHAT_HISTORY_WINDOW", 8))
+        except Exception as e:
+            # Keep the turns open; the next exchange retries the compaction
+            print(f"⚠️ Chat history compaction failed for session {session.id}: {e}")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Failed to record chat turn for session {session.id}: {e}")
+
+
+def delete_session(session: ChatSession):
+    """Deletes a session and its turns. Does not commit."""
+    ChatTurn.query.filter_by(session_id=session.id).delete(synchronize_session=False)
+    db.session.delete(session)
+    get_chat_context_cache().drop(session.id)
@@ -0,0 +1,130 @@
+# app/ai/chat_stream.py
+import json
+import time
+from typing import Callable, Iterator, List, Optional
+
+from flask import current_app
+
+CHAT_MODEL_NAME = "gemini-2.5-flash"
+
+
+# --------------------------------------------------------
+## 🧪 Fake Chat Model (offline / tests)
+# --------------------------------------------------------
+
+class _FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeChatModel:
+    """
+    Stand-in for genai.GenerativeModel with the same generate_content()
+    shape. Replies with a fixed answer that echoes the last text part, one
+    word per streamed chunk, with an optional delay between chunks.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls: List[list] = []
+
+    def _reply(self, contents) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        texts = [p for p in parts if isinstance(p, str)]
+        question = texts[-1].strip() if texts else ""
+        return f"Fake answer to: {question}"
+
+    def _stream(self, answer: str) -> Iterator[_FakeChunk]:
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                time.sleep(self.delay)
+            yield _FakeChunk(word if i == 0 else f" {word}")
+
+    def generate_content(self, contents, stream: bool = False):
+        self.calls.append(contents if isinstance(contents, list) else [contents])
+        answer = self._reply(contents)
+        return self._stream(answer) if stream else _FakeChunk(answer)
+
+
+# --------------------------------------------------------
+## 🏭 Factory
+# --------------------------------------------------------
+
+def get_chat_model():
+    """Returns the chat model chosen by CHAT_MODEL_BACKEND ('gemini' or 'fake')."""
+    if current_app.config.get("CHAT_MODEL_BACKEND", "gemini").lower() == "fake":
+        model = current_app.extensions.get("fake_chat_model")
+        if model is None:
+            model = current_app.extensions["fake_chat_model"] = FakeChatModel()
+        return model
+
+    from .gemini_client import get_gemini_client
+    # Interactive: short limiter wait and one quick retry, so a request never parks a worker
+    return get_gemini_client().model(CHAT_MODEL_NAME, interactive=True)
+
+
+# --------------------------------------------------------
+## 📡 Server-Sent Events
+# --------------------------------------------------------
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _cancel_upstream(response):
+    """Best-effort cancel of an in-flight streamed generation."""
+    # Gemini keeps the underlying gRPC/HTTP stream on `_iterator`
+    for target in (getattr(response, "_iterator", None), response):
+        cancel = getattr(target, "cancel", None) or getattr(target, "close", None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception:
+                pass
+            return
+
+
+def stream_answer(model, contents, on_done: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """
+    Yields the model's answer as SSE events: 'start' straight away, one
+    'token' per emitted chunk, then 'done' with the full text (or 'error').
+    `on_done` receives the full answer before 'done' is sent.
+
+    Quota errors on the opening request are retried by the Gemini client.
+    If the client disconnects, the WSGI server closes this generator and the
+    upstream stream is cancelled.
+    """
+    # Flush headers and a first byte before the model has produced anything
+    yield sse_event("start", {})
+
+    response = None
+    parts = []
+    try:
+        response = model.generate_content(contents, stream=True)
+        iterator = iter(response)
+        chunk = next(iterator, None)
+        while chunk is not None:
+            try:
+                text = chunk.text
+            except ValueError:  # e.g. a chunk that only carries safety metadata
+                text = ""
+            if text:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            chunk = next(iterator, None)
+
+        response = None
+        answer = "".join(parts)
+        if on_done:
+            on_done(answer)
+        yield sse_event("done", {"answer": answer})
+    except GeneratorExit:
+        print("🔌 DEBUG: Chat client disconnected; cancelling generation.")
+        raise
+    except Exception as e:
+        print(f"❌ CHAT STREAM ERROR: {e}")
+        yield sse_event("error", {"error": f"AI Chat failed: {str(e)}"})
+    finally:
+        if response is not None:
+            _cancel_upstream(response)
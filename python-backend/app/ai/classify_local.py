@@ -1,25 +1,25 @@
-import google.generativeai as genai
-import os
+from .gemini_client import get_gemini_client
+from .file_handles import call_with_uploaded_file
+from .result_cache import cached_ai_call, digest_file
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = "gemini-2.5-flash"
+TAG_PROMPT = "Analyze this image and return 3-5 comma-separated tags describing it. Do not write sentences, just tags."
 
-def classify_image(image_path: str) -> dict:
+def classify_image(image_path: str, use_cache: bool = True) -> dict:
     """
     Uses Gemini Flash (Cloud) instead of local PyTorch to save RAM.
     """
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        
-        # Upload the temp file to Gemini for analysis
-        myfile = genai.upload_file(image_path)
-        
-        response = model.generate_content([
-            myfile,
-            "Analyze this image and return 3-5 comma-separated tags describing it. Do not write sentences, just tags."
-        ])
-        
+    digest = digest_file(image_path)
+
+    def _generate():
+        # Shares one File API upload with the OCR and vision stages
+        response = call_with_uploaded_file(
+            image_path, None, lambda myfile: get_gemini_client().generate(MODEL_NAME, [myfile, TAG_PROMPT]), digest
+        )
         return {"label": response.text.strip()}
+
+    try:
+        return cached_ai_call("classify", MODEL_NAME, TAG_PROMPT, digest, _generate, use_cache)
     except Exception as e:
         print(f"Gemini Tagging Error: {e}")
-        return {"label": "AI Tagging Failed"}
\ No newline at end of file
+        return {"label": "AI Tagging Failed"}
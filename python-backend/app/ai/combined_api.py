@@ -0,0 +1,94 @@
+# app/ai/combined_api.py
+import json
+from typing import Optional
+
+from .gemini_client import get_gemini_client
+from .file_handles import call_with_uploaded_file
+from .result_cache import cached_ai_call, digest_file
+
+MODEL_NAME = "gemini-2.5-flash"
+COMBINED_PROMPT = (
+    "Analyze this image and fill every field of the JSON schema:\n"
+    "- tags: 3-5 short keywords describing the image\n"
+    "- ocr_text: all readable text in the image, verbatim (empty string if none)\n"
+    "- description: a brief explanation of the image\n"
+    "- summary: 3-5 concise bullet points summarizing the image and its text"
+)
+
+# Structured output schema (OpenAPI subset understood by Gemini)
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "ocr_text": {"type": "string"},
+        "description": {"type": "string"},
+        "summary": {"type": "string"},
+    },
+    "required": ["tags", "ocr_text", "description", "summary"],
+}
+
+
+class CombinedAnalysisError(Exception):
+    """Raised when the single-call response is missing or does not match the schema."""
+
+
+def parse_combined_response(text: str) -> dict:
+    """
+    Validates the model's JSON against COMBINED_SCHEMA.
+
+    Returns:
+        dict: {"tags": [str, ...], "ocr_text": str, "description": str, "summary": str}
+    Raises:
+        CombinedAnalysisError: on invalid JSON, missing fields or wrong types
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise CombinedAnalysisError(f"Response is not JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise CombinedAnalysisError("Response is not a JSON object")
+
+    missing = [field for field in COMBINED_SCHEMA["required"] if field not in data]
+    if missing:
+        raise CombinedAnalysisError(f"Response is missing fields: {', '.join(missing)}")
+
+    tags = data["tags"]
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        raise CombinedAnalysisError("'tags' must be a list of strings")
+    for field in ("ocr_text", "description", "summary"):
+        if not isinstance(data[field], str):
+            raise CombinedAnalysisError(f"'{field}' must be a string")
+    if not data["description"].strip():
+        raise CombinedAnalysisError("'description' is empty")
+
+    return {
+        "tags": [t.strip() for t in tags if t.strip()],
+        "ocr_text": data["ocr_text"].strip(),
+        "description": data["description"].strip(),
+        "summary": data["summary"].strip(),
+    }
+
+
+def analyze_image_combined(file_path: str, mime_type: Optional[str] = None, use_cache: bool = True) -> dict:
+    """
+    Gets tags, OCR text, description and summary for an image in one
+    structured-output call (instead of one call per stage).
+
+    Only validated results are cached. Raises CombinedAnalysisError (or the
+    Gemini error) so the caller can fall back to the per-stage path.
+    """
+    digest = digest_file(file_path)
+
+    def _generate():
+        response = call_with_uploaded_file(
+            file_path, mime_type,
+            lambda f: get_gemini_client().generate(MODEL_NAME, [f, COMBINED_PROMPT], generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": COMBINED_SCHEMA,
+            }),
+            digest
+        )
+        return parse_combined_response(response.text)
+
+    prompt_key = f"{mime_type}\n{COMBINED_PROMPT}\n{json.dumps(COMBINED_SCHEMA, sort_keys=True)}"
+    return cached_ai_call("combined", MODEL_NAME, prompt_key, digest, _generate, use_cache)
@@ -0,0 +1,350 @@
+# app/ai/file_handles.py
+import asyncio
+import mimetypes
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+from google.api_core.exceptions import NotFound, PermissionDenied
+
+from .gemini_client import get_gemini_client
+from .result_cache import ai_cache_path, digest_file
+
+# The File API deletes uploads 48h after creation; stop handing them out an hour early
+DEFAULT_FILE_TTL = 47 * 3600
+EXPIRY_MARGIN = 3600
+
+
+class GeminiFileFailed(Exception):
+    """Raised when the Gemini File API reports a FAILED state."""
+
+
+class GeminiFileTimeout(GeminiFileFailed):
+    """Raised when an upload is still PROCESSING at the wait deadline."""
+
+
+# --------------------------------------------------------
+## ⏱️ Processing Wait
+# --------------------------------------------------------
+
+class FileProcessingWait:
+    """
+    Waits for an uploaded file to leave PROCESSING, polling with exponential
+    backoff (`initial_delay` doubling up to `max_delay`) until `timeout`.
+
+    The wait is a sequence of steps: next_delay() says how long to sleep
+    before the next poll() (None once the file is ACTIVE), so the caller
+    decides how to wait. wait() blocks, wait_async() awaits on an event
+    loop, and a background job can store the handle and poll again later
+    instead of sleeping.
+    """
+
+    def __init__(self, handle, timeout: float = 90.0, initial_delay: float = 0.5, max_delay: float = 8.0):
+        self.handle = handle
+        self.timeout = timeout
+        self.max_delay = max_delay
+        self.polls = 0
+        self._delay = initial_delay
+        self._started = time.monotonic()
+
+    @property
+    def waited(self) -> float:
+        return time.monotonic() - self._started
+
+    def next_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before polling again, or None when the file is ready.
+
+        Raises:
+            GeminiFileFailed: the File API reports FAILED
+            GeminiFileTimeout: still PROCESSING and the deadline is reached
+        """
+        state = self.handle.state.name
+        if state == "FAILED":
+            raise GeminiFileFailed("Gemini failed to process this file.")
+        if state != "PROCESSING":
+            return None
+        remaining = self.timeout - self.waited
+        if remaining <= 0:
+            raise GeminiFileTimeout(
+                f"Gemini still processing {self.handle.name} after {self.waited:.0f}s ({self.polls} polls)"
+            )
+        delay = min(self._delay, remaining)
+        self._delay = min(self._delay * 2, self.max_delay)
+        return delay
+
+    def poll(self):
+        self.polls += 1
+        self.handle = get_gemini_client().get_file(self.handle.name)
+
+    def wait(self):
+        """Blocks until ready; returns the ACTIVE handle."""
+        delay = self.next_delay()
+        while delay is not None:
+            print(f"DEBUG: Waiting {delay:.1f}s for Gemini to process {self.handle.name}...")
+            time.sleep(delay)
+            self.poll()
+            delay = self.next_delay()
+        return self.handle
+
+    async def wait_async(self):
+        """Like wait(), but sleeps on the event loop and polls in its executor."""
+        loop = asyncio.get_running_loop()
+        delay = self.next_delay()
+        while delay is not None:
+            await asyncio.sleep(delay)
+            await loop.run_in_executor(None, self.poll)
+            delay = self.next_delay()
+        return self.handle
+
+
+# --------------------------------------------------------
+## 📎 Uploaded File Handle Cache
+# --------------------------------------------------------
+
+class UploadedFileCache:
+    """
+    Maps file content (SHA-256 + MIME type) to a Gemini File API upload, so
+    the tagging, OCR and vision stages of one file, later re-analyses and
+    chat turns all share a single upload.
+
+    Handles are kept in memory; their names also go to a SQLite table shared
+    by every worker on the host, so another process only needs a cheap
+    get_file() instead of a new upload. Entries expire ahead of the File API
+    deletion window; the memory tier is an LRU of at most `memory_items`
+    handles. Concurrent requests for the same content wait for one upload
+    instead of racing.
+    """
+
+    def __init__(self, path: Optional[str], processing_timeout: float = 90.0, memory_items: int = 1024):
+        self.path = path
+        self.processing_timeout = processing_timeout
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (handle, expires_at)
+        # Per-key upload lock and the number of threads holding or waiting for it
+        self._key_locks: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "uploads": 0, "invalidations": 0,
+                       "processing_polls": 0, "processing_wait_seconds": 0.0, "processing_timeouts": 0}
+
+        if self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS gemini_files ("
+                    " key TEXT PRIMARY KEY, name TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def make_key(content_digest: str, mime_type: Optional[str]) -> str:
+        return f"{content_digest}:{mime_type or ''}"
+
+    # --------------------------------------------------------
+    ## 📖 Lookup / Upload
+    # --------------------------------------------------------
+
+    def get_or_upload(self, file_path: str, mime_type: Optional[str] = None,
+                      content_digest: Optional[str] = None):
+        """Returns an ACTIVE File API handle for the file's content, uploading it at most once."""
+        # Normalize so stages that pass no MIME type share the upload of those that do
+        mime_type = mime_type or mimetypes.guess_type(file_path)[0]
+        key = self.make_key(content_digest or digest_file(file_path), mime_type)
+        with self._key_lock(key):
+            handle = self._memory_get(key) or self._disk_get(key)
+            if handle is not None:
+                return handle
+
+            client = get_gemini_client()
+            print(f"DEBUG: Uploading {mime_type or 'file'} to Gemini File API...")
+            handle = self._wait_active(client.upload_file(file_path, mime_type=mime_type))
+            print(f"DEBUG: File uploaded: {handle.name}")
+            expires_at = self._expires_at(handle)
+            self._memory_put(key, handle, expires_at)
+            with self._lock:
+                self._stats["uploads"] += 1
+            self._disk_put(key, handle.name, expires_at)
+            return handle
+
+    def call_with_file(self, file_path: str, mime_type: Optional[str], fn: Callable[[Any], Any],
+                       content_digest: Optional[str] = None) -> Any:
+        """
+        Runs `fn(handle)`. If Gemini no longer knows the cached upload
+        (deleted or expired early), uploads again and retries once.
+        """
+        digest = content_digest or digest_file(file_path)
+        mime_type = mime_type or mimetypes.guess_type(file_path)[0]
+        handle = self.get_or_upload(file_path, mime_type, digest)
+        try:
+            return fn(handle)
+        except (NotFound, PermissionDenied) as e:
+            print(f"⚠️ Cached Gemini file {handle.name} is gone ({e}); uploading again")
+            self.invalidate(self.make_key(digest, mime_type))
+            return fn(self.get_or_upload(file_path, mime_type, digest))
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._stats["invalidations"] += 1
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM gemini_files WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        stats["processing_wait_seconds"] = round(stats["processing_wait_seconds"], 3)
+        return stats
+
+    # --------------------------------------------------------
+    ## 🔧 Helpers
+    # --------------------------------------------------------
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        """Serializes uploads of one key; the lock is dropped once nobody holds or awaits it."""
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def _wait_active(self, handle):
+        wait = FileProcessingWait(handle, timeout=self.processing_timeout)
+        try:
+            return wait.wait()
+        except GeminiFileTimeout:
+            with self._lock:
+                self._stats["processing_timeouts"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["processing_polls"] += wait.polls
+                self._stats["processing_wait_seconds"] += wait.waited
+
+    @staticmethod
+    def _expires_at(handle) -> float:
+        expiration = getattr(handle, "expiration_time", None)
+        if expiration is not None and hasattr(expiration, "timestamp"):
+            return expiration.timestamp() - EXPIRY_MARGIN
+        return time.time() + DEFAULT_FILE_TTL
+
+    def _memory_get(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            handle, expires_at = entry
+            if time.time() >= expires_at:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return handle
+
+    def _memory_put(self, key: str, handle, expires_at: float):
+        """Stores a handle, dropping expired ones and then the least recently used past the cap."""
+        now = time.time()
+        with self._lock:
+            self._memory[key] = (handle, expires_at)
+            self._memory.move_to_end(key)
+            for stale in [k for k, (_, expiry) in self._memory.items() if expiry <= now]:
+                del self._memory[stale]
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str):
+        if not self.path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT name, expires_at FROM gemini_files WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if time.time() >= row[1]:
+                    conn.execute("DELETE FROM gemini_files WHERE key = ?", (key,))
+                    return None
+        except sqlite3.Error as e:
+            print(f"Gemini file cache read error: {e}")
+            return None
+
+        # Uploaded by another worker: fetch the handle instead of re-uploading
+        try:
+            handle = self._wait_active(get_gemini_client().get_file(row[0]))
+        except (NotFound, PermissionDenied, GeminiFileFailed):
+            self.invalidate(key)
+            return None
+        self._memory_put(key, handle, row[1])
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        return handle
+
+    def _disk_put(self, key: str, name: str, expires_at: float):
+        if not self.path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO gemini_files (key, name, expires_at) VALUES (?, ?, ?)",
+                    (key, name, expires_at)
+                )
+                conn.execute("DELETE FROM gemini_files WHERE expires_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"Gemini file cache write error: {e}")
+
+
+# --------------------------------------------------------
+## 🏭 Shared Instance
+# --------------------------------------------------------
+
+_files: Optional[UploadedFileCache] = None
+_files_lock = threading.Lock()
+
+
+def init_file_cache(app) -> UploadedFileCache:
+    """
+    Builds the process-wide handle cache from the app config; it shares the
+    AI_CACHE_PATH SQLite file with the result cache.
+    """
+    global _files
+    with _files_lock:
+        if _files is None:
+            config = app.config
+            _files = UploadedFileCache(
+                path=ai_cache_path(config),
+                processing_timeout=config.get("GEMINI_FILE_WAIT_TIMEOUT", 90),
+                memory_items=config.get("GEMINI_FILE_CACHE_ITEMS", 1024)
+            )
+    return _files
+
+
+def get_file_cache() -> UploadedFileCache:
+    """Returns the process-wide handle cache, building it from current_app's config on first use."""
+    return _files or init_file_cache(current_app._get_current_object())
+
+
+def call_with_uploaded_file(file_path: str, mime_type: Optional[str], fn: Callable[[Any], Any],
+                            content_digest: Optional[str] = None) -> Any:
+    """Shortcut for get_file_cache().call_with_file(...)."""
+    return get_file_cache().call_with_file(file_path, mime_type, fn, content_digest)
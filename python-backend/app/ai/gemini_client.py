@@ -0,0 +1,551 @@
+# app/ai/gemini_client.py
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import current_app
+from google.api_core.exceptions import (
+    DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+)
+
+# Errors worth retrying (and counted by the circuit breaker); anything else is
+# a bad request and is raised straight away
+RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError)
+
+
+class GeminiUnavailable(Exception):
+    """Raised when a call is refused locally: circuit open or rate-limit wait exceeded."""
+
+
+# --------------------------------------------------------
+## 🪣 Shared Token Bucket (AIMD)
+# --------------------------------------------------------
+
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in a SQLite file, so every worker process
+    on the host draws from the same request budget (an empty path keeps it
+    in-process).
+
+    The refill rate adapts: a quota error halves it (down to `min_rate`),
+    each success adds back 5% of `max_rate`. A burst of 429s therefore slows
+    every worker, not only the one that got them. The stored rate and tokens
+    are clamped to this process's `max_rate` and `burst`, so lowering
+    GEMINI_RPM takes effect on restart even though the file outlives it.
+    """
+
+    def __init__(self, path: Optional[str], max_rate: float, burst: float, min_rate: float = 0.05):
+        self.path = path
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._state = {"tokens": burst, "rate": max_rate, "updated_at": time.time()}
+        # Rate seen by this process's last transaction (spares on_success a read)
+        self._last_rate = max_rate
+
+        if self.path:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS gemini_bucket ("
+                    " id INTEGER PRIMARY KEY CHECK (id = 1), tokens REAL NOT NULL,"
+                    " rate REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO gemini_bucket (id, tokens, rate, updated_at) VALUES (1, ?, ?, ?)",
+                    (burst, max_rate, time.time())
+                )
+                conn.execute(
+                    "UPDATE gemini_bucket SET rate = MIN(rate, ?), tokens = MIN(tokens, ?) WHERE id = 1",
+                    (max_rate, burst)
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _transact(self, update: Callable[[dict, float], Any]) -> Any:
+        """Runs `update(state, now)` atomically against the shared state and saves it."""
+        now = time.time()
+        if not self.path:
+            with self._lock:
+                result = update(self._state, now)
+                self._last_rate = self._state["rate"]
+                return result
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, rate, updated_at = conn.execute(
+                "SELECT tokens, rate, updated_at FROM gemini_bucket WHERE id = 1"
+            ).fetchone()
+            state = {"tokens": tokens, "rate": rate, "updated_at": updated_at}
+            result = update(state, now)
+            conn.execute(
+                "UPDATE gemini_bucket SET tokens = ?, rate = ?, updated_at = ? WHERE id = 1",
+                (state["tokens"], state["rate"], state["updated_at"])
+            )
+            conn.execute("COMMIT")
+            self._last_rate = state["rate"]
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _refill(self, state: dict, now: float):
+        state["rate"] = min(state["rate"], self.max_rate)
+        elapsed = max(0.0, now - state["updated_at"])
+        state["tokens"] = min(self.burst, state["tokens"] + elapsed * state["rate"])
+        state["updated_at"] = now
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available. Returns 0, or the seconds until one will be."""
+        def _take(state, now):
+            self._refill(state, now)
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0.0
+            return (1 - state["tokens"]) / state["rate"]
+        return self._transact(_take)
+
+    def acquire(self, timeout: float) -> float:
+        """
+        Waits for a token for at most `timeout` seconds.
+
+        Returns:
+            float: seconds spent waiting
+        Raises:
+            GeminiUnavailable: if no token became available in time
+        """
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return time.monotonic() - start
+            if time.monotonic() - start + wait > timeout:
+                raise GeminiUnavailable(f"Gemini rate limit: no request slot within {timeout:.0f}s")
+            time.sleep(min(wait, 1.0))
+
+    def on_throttled(self):
+        def _decrease(state, now):
+            self._refill(state, now)
+            state["rate"] = max(self.min_rate, state["rate"] / 2)
+            state["tokens"] = min(state["tokens"], 0.0)
+        self._transact(_decrease)
+
+    def on_success(self):
+        if self._last_rate >= self.max_rate:
+            return
+        def _increase(state, now):
+            self._refill(state, now)
+            state["rate"] = min(self.max_rate, state["rate"] + self.max_rate * 0.05)
+        self._transact(_increase)
+
+    @property
+    def rate(self) -> float:
+        if not self.path:
+            return self._state["rate"]
+        return self._connect().execute("SELECT rate FROM gemini_bucket WHERE id = 1").fetchone()[0]
+
+
+# --------------------------------------------------------
+## 🔌 Circuit Breaker
+# --------------------------------------------------------
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive retryable failures and refuses calls
+    for `cooldown` seconds; then lets one trial call through (half-open) and
+    closes again if it succeeds.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def abandon_trial(self):
+        """The admitted call never reached Gemini; let the next one be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self.state != self.OPEN:
+                    print(f"🔌 Gemini circuit opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+
+# --------------------------------------------------------
+## ☁️ Backends
+# --------------------------------------------------------
+
+class GenaiBackend:
+    """google.generativeai, configured once, with one GenerativeModel per (model, system prompt)."""
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str]):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name: str, system_instruction: Optional[str] = None):
+        key = (model_name, system_instruction)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                kwargs = {"system_instruction": system_instruction} if system_instruction else {}
+                model = self._models[key] = self._genai.GenerativeModel(model_name, **kwargs)
+            return model
+
+    def upload_file(self, path: str, mime_type: Optional[str] = None):
+        return self._genai.upload_file(path, mime_type=mime_type)
+
+    def get_file(self, name: str):
+        return self._genai.get_file(name)
+
+    def embed_content(self, **kwargs):
+        return self._genai.embed_content(**kwargs)
+
+
+class _FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class _FakeResponse:
+    def __init__(self, text: str, usage: Optional[_FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+def _fake_for_schema(schema: dict):
+    """Smallest value matching a (Gemini-style) JSON schema, for structured-output calls."""
+    kind = str(schema.get("type", "string")).lower()
+    if kind == "object":
+        return {name: _fake_for_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_for_schema(schema.get("items", {}))]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return "fake"
+
+
+class _FakeState:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _FakeFile:
+    def __init__(self, name: str, mime_type: Optional[str]):
+        self.name = name
+        self.mime_type = mime_type
+        self.state = _FakeState("ACTIVE")
+
+
+class _FakeModel:
+    def __init__(self, backend: "FakeBackend", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False, generation_config=None, **kwargs):
+        self.backend._maybe_fail()
+        parts = contents if isinstance(contents, list) else [contents]
+        schema = (generation_config or {}).get("response_schema")
+        if schema:
+            text = json.dumps(_fake_for_schema(schema))
+        else:
+            digest = hashlib.sha256(repr([p if isinstance(p, str) else type(p).__name__ for p in parts])
+                                    .encode("utf-8")).hexdigest()[:12]
+            text = f"[fake {self.model_name} {digest}]"
+        # Rough token counts: ~4 characters per token, 258 per media part (Gemini's image rate)
+        usage = _FakeUsage(sum(len(p) // 4 if isinstance(p, str) else 258 for p in parts), len(text) // 4)
+        return iter([_FakeResponse(text, usage)]) if stream else _FakeResponse(text, usage)
+
+
+class FakeBackend:
+    """
+    Offline stand-in: deterministic text per prompt, instant uploads and
+    hash-based embeddings. `fail_next(n)` makes the next n calls raise
+    ResourceExhausted, to exercise backoff and the circuit breaker;
+    `latency` adds a fixed delay per call.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._failures_left = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def fail_next(self, n: int):
+        with self._lock:
+            self._failures_left = n
+
+    def _maybe_fail(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._failures_left > 0:
+                self._failures_left -= 1
+                raise ResourceExhausted("fake quota exceeded")
+
+    def get_model(self, model_name: str, system_instruction: Optional[str] = None):
+        return _FakeModel(self, model_name)
+
+    def upload_file(self, path: str, mime_type: Optional[str] = None):
+        self._maybe_fail()
+        with open(path, "rb") as f:
+            name = f"files/fake-{hashlib.sha256(f.read()).hexdigest()[:16]}"
+        with self._lock:
+            self._uploads[name] = _FakeFile(name, mime_type)
+            return self._uploads[name]
+
+    def get_file(self, name: str):
+        with self._lock:
+            return self._uploads[name]
+
+    def embed_content(self, model: str, content, **kwargs):
+        self._maybe_fail()
+        texts = content if isinstance(content, list) else [content]
+        vectors = [[b / 255.0 for b in hashlib.sha256(t.encode("utf-8")).digest()[:16]] for t in texts]
+        return {"embedding": vectors if isinstance(content, list) else vectors[0]}
+
+
+# --------------------------------------------------------
+## 🤝 Client
+# --------------------------------------------------------
+
+class ModelHandle:
+    """A cached model whose generate_content() goes through the client's limiter, retries and breaker."""
+
+    def __init__(self, client: "GeminiClient", model, interactive: bool):
+        self._client = client
+        self._model = model
+        self._interactive = interactive
+
+    def generate_content(self, contents, **kwargs):
+        response = self._client.call(lambda: self._model.generate_content(contents, **kwargs),
+                                     interactive=self._interactive)
+        if not kwargs.get("stream"):
+            self._client.count_usage(response)
+        return response
+
+
+class GeminiClient:
+    """
+    The one way the app talks to Gemini. Every call:
+      1. is refused at once while the circuit breaker is open,
+      2. waits for a slot in the shared token bucket,
+      3. is retried on quota / transient errors with exponential backoff and
+         full jitter (fewer retries and shorter waits for interactive calls,
+         so a chat request never parks a worker for long).
+    """
+
+    def __init__(self, backend, bucket: SharedTokenBucket, breaker: CircuitBreaker,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 20.0,
+                 acquire_timeout: float = 60.0, interactive_retries: int = 1,
+                 interactive_timeout: float = 10.0):
+        self.backend = backend
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.acquire_timeout = acquire_timeout
+        self.interactive_retries = interactive_retries
+        self.interactive_timeout = interactive_timeout
+
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "quota_errors": 0,
+                       "circuit_rejections": 0, "rate_limit_rejections": 0,
+                       "wait_seconds": 0.0, "call_seconds": 0.0, "prompt_tokens": 0, "output_tokens": 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    # --------------------------------------------------------
+    ## 📞 Calls
+    # --------------------------------------------------------
+
+    def call(self, fn: Callable[[], Any], interactive: bool = False) -> Any:
+        retries = self.interactive_retries if interactive else self.max_retries
+        timeout = self.interactive_timeout if interactive else self.acquire_timeout
+        self._count(calls=1)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count(circuit_rejections=1, failures=1)
+                raise GeminiUnavailable("Gemini is temporarily unavailable (circuit open)")
+            try:
+                waited = self.bucket.acquire(timeout)
+            except GeminiUnavailable:
+                self.breaker.abandon_trial()
+                self._count(rate_limit_rejections=1, failures=1)
+                raise
+            self._count(wait_seconds=waited)
+
+            start = time.monotonic()
+            try:
+                result = fn()
+            except RETRYABLE_ERRORS as e:
+                self._count(call_seconds=time.monotonic() - start)
+                self.breaker.record_failure()
+                if isinstance(e, ResourceExhausted):
+                    self._count(quota_errors=1)
+                    self.bucket.on_throttled()
+                if attempt >= retries:
+                    self._count(failures=1)
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                print(f"⏳ Gemini {type(e).__name__}; retry {attempt + 1}/{retries} in {delay:.1f}s")
+                attempt += 1
+                self._count(retries=1)
+                time.sleep(delay)
+                continue
+            except Exception:
+                # Gemini answered (e.g. a bad request): the service itself is up
+                self._count(call_seconds=time.monotonic() - start, failures=1)
+                self.breaker.record_success()
+                raise
+
+            self._count(call_seconds=time.monotonic() - start, successes=1)
+            self.breaker.record_success()
+            self.bucket.on_success()
+            return result
+
+    def count_usage(self, response):
+        """Adds a response's token usage (when the backend reports it) to the metrics."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self._count(prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+                        output_tokens=getattr(usage, "candidates_token_count", 0) or 0)
+
+    def model(self, model_name: str, system_instruction: Optional[str] = None,
+              interactive: bool = False) -> ModelHandle:
+        return ModelHandle(self, self.backend.get_model(model_name, system_instruction), interactive)
+
+    def generate(self, model_name: str, contents, **kwargs):
+        return self.model(model_name).generate_content(contents, **kwargs)
+
+    def upload_file(self, path: str, mime_type: Optional[str] = None):
+        return self.call(lambda: self.backend.upload_file(path, mime_type=mime_type))
+
+    def get_file(self, name: str):
+        return self.call(lambda: self.backend.get_file(name))
+
+    def embed_content(self, **kwargs):
+        return self.call(lambda: self.backend.embed_content(**kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["call_seconds"] = round(stats["call_seconds"], 3)
+        stats["backend"] = self.backend.name
+        stats["circuit"] = self.breaker.state
+        stats["rate_per_second"] = round(self.bucket.rate, 3)
+        return stats
+
+
+# --------------------------------------------------------
+## 🏭 Shared Instance
+# --------------------------------------------------------
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+
+
+def init_gemini_client(app) -> GeminiClient:
+    """
+    Builds the process-wide client from the app config (GEMINI_* keys, see
+    Config). It is a module global rather than an app extension because AI
+    stages call it from worker threads that run outside the app context.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = app.config
+            backend = FakeBackend(latency=config.get("GEMINI_FAKE_LATENCY", 0)) \
+                if config.get("GEMINI_BACKEND", "gemini").lower() == "fake" \
+                else GenaiBackend(config.get("GEMINI_API_KEY"))
+            # One fixed file per host so every worker shares the budget; empty = per process
+            limiter_path = config.get("GEMINI_LIMITER_PATH")
+            if limiter_path is None:
+                limiter_path = os.path.join(tempfile.gettempdir(), "ai-vault-gemini-limiter.db")
+            _client = GeminiClient(
+                backend=backend,
+                bucket=SharedTokenBucket(
+                    path=limiter_path or None,
+                    max_rate=config.get("GEMINI_RPM", 60) / 60.0,
+                    burst=config.get("GEMINI_BURST", 10)
+                ),
+                breaker=CircuitBreaker(
+                    threshold=config.get("GEMINI_BREAKER_THRESHOLD", 5),
+                    cooldown=config.get("GEMINI_BREAKER_COOLDOWN", 30)
+                ),
+                max_retries=config.get("GEMINI_MAX_RETRIES", 4),
+                base_delay=config.get("GEMINI_BACKOFF_BASE", 1.0),
+                max_delay=config.get("GEMINI_BACKOFF_MAX", 20.0)
+            )
+    return _client
+
+
+def get_gemini_client() -> GeminiClient:
+    """Returns the process-wide client, building it from current_app's config on first use."""
+    return _client or init_gemini_client(current_app._get_current_object())
+
+
+def reset_gemini_client():
+    """Drops the shared client (tests / config changes)."""
+    global _client
+    with _client_lock:
+        _client = None
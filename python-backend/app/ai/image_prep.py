@@ -0,0 +1,221 @@
+# app/ai/image_prep.py
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from flask import current_app
+
+from .result_cache import digest_file
+
+# Formats Gemini accepts as-is; anything else (AVIF, HEIC, TIFF, ...) is transcoded
+PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}
+OUTPUT_FORMATS = {"jpeg": ("JPEG", ".jpg", "image/jpeg"), "webp": ("WEBP", ".webp", "image/webp")}
+
+
+def _register_plugins():
+    """HEIC needs pillow-heif; AVIF is built into Pillow >= 11.3 (older ones use pillow-avif-plugin)."""
+    try:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+    except ImportError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin on import)
+    except ImportError:
+        pass
+
+
+_register_plugins()
+
+
+@dataclass
+class PreparedImage:
+    path: str
+    mime_type: Optional[str]
+    transformed: bool = False
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class ImagePreprocessor:
+    """
+    Shrinks images before they go to Gemini: applies the EXIF orientation,
+    downscales to `max_edge` pixels on the long side, and re-encodes as
+    JPEG or WebP at `quality` (AVIF/HEIC and other formats always are).
+
+    Variants are cached on disk by source content and settings, so every
+    stage, re-analysis and chat turn for a file reuses one encode. Images
+    that are already small, upright and in a Gemini-friendly format are
+    passed through untouched.
+
+    Pruning never deletes the variant just returned, or any variant used in
+    the last `min_age` seconds, because a caller may still be reading or
+    uploading it.
+    """
+
+    def __init__(self, cache_dir: str, max_edge: int = 1536, output_format: str = "jpeg",
+                 quality: int = 85, passthrough_bytes: int = 1024 * 1024,
+                 max_cache_bytes: int = 200 * 1024 * 1024, min_age: float = 600):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported image output format: {output_format}")
+        self.cache_dir = cache_dir
+        self.max_edge = max_edge
+        self.output_format = output_format
+        self.quality = quality
+        self.passthrough_bytes = passthrough_bytes
+        self.max_cache_bytes = max_cache_bytes
+        self.min_age = min_age
+        self._prune_lock = threading.Lock()
+        self._stats = {"hits": 0, "encoded": 0, "passthrough": 0, "failed": 0,
+                       "bytes_in": 0, "bytes_out": 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def prepare(self, file_path: str, mime_type: Optional[str] = None) -> PreparedImage:
+        """
+        Returns the variant to send to Gemini. On any decode/encode error the
+        original is returned, so preprocessing never blocks an analysis.
+        """
+        fmt, ext, out_mime = OUTPUT_FORMATS[self.output_format]
+        settings = f"{self.max_edge}:{self.output_format}:{self.quality}"
+        key = hashlib.sha256(f"{digest_file(file_path)}:{settings}".encode("utf-8")).hexdigest()[:32]
+        variant_path = os.path.join(self.cache_dir, key + ext)
+
+        if os.path.exists(variant_path):
+            os.utime(variant_path)  # LRU order for pruning (and in use for min_age)
+            self._count("hits")
+            return PreparedImage(variant_path, out_mime, transformed=True)
+
+        try:
+            from PIL import Image, ImageOps
+
+            with Image.open(file_path) as image:
+                size_in = os.path.getsize(file_path)
+                rotated = image.getexif().get(0x0112, 1) not in (0, 1)  # EXIF Orientation tag
+                if (image.format in PASSTHROUGH_FORMATS and not rotated
+                        and max(image.size) <= self.max_edge and size_in <= self.passthrough_bytes):
+                    self._count("passthrough")
+                    return PreparedImage(file_path, mime_type or Image.MIME.get(image.format, "image/jpeg"))
+
+                # JPEG can decode straight at a reduced scale, skipping most of the work
+                image.draft("RGB", (self.max_edge, self.max_edge))
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((self.max_edge, self.max_edge), Image.Resampling.LANCZOS)
+                image = self._flatten(image, keep_alpha=(fmt == "WEBP"))
+
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, fmt, quality=self.quality, optimize=True)
+                os.replace(tmp_path, variant_path)
+        except Exception as e:
+            print(f"⚠️ Image preprocessing failed, sending original: {e}")
+            self._count("failed")
+            return PreparedImage(file_path, mime_type)
+
+        size_out = os.path.getsize(variant_path)
+        with self._lock:
+            self._stats["encoded"] += 1
+            self._stats["bytes_in"] += size_in
+            self._stats["bytes_out"] += size_out
+        print(f"🖼️ DEBUG: Preprocessed image {size_in // 1024} KB -> {size_out // 1024} KB")
+        self._prune(keep=variant_path)
+        return PreparedImage(variant_path, out_mime, transformed=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    # --------------------------------------------------------
+    ## 🔧 Helpers
+    # --------------------------------------------------------
+
+    @staticmethod
+    def _flatten(image, keep_alpha: bool):
+        from PIL import Image
+
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha and keep_alpha:
+            return image.convert("RGBA")
+        if has_alpha:
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+            return background
+        return image.convert("RGB")
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _prune(self, keep: str):
+        """
+        Deletes least recently used variants once the cache exceeds its size
+        cap, sparing `keep` and variants used in the last `min_age` seconds.
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            in_use_after = time.time() - self.min_age
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".part"):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+                total += st.st_size
+
+            entries.sort()
+            for mtime, size, full in entries:
+                if total <= self.max_cache_bytes or mtime >= in_use_after:
+                    break
+                if full == keep:
+                    continue
+                try: os.remove(full)
+                except OSError: pass
+                total -= size
+        finally:
+            self._prune_lock.release()
+
+
+# --------------------------------------------------------
+## 🏭 Per-Process Instance
+# --------------------------------------------------------
+
+_preprocessor_lock = threading.Lock()
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """Returns the app's shared ImagePreprocessor, building it on first use."""
+    preprocessor = current_app.extensions.get("image_preprocessor")
+    if preprocessor is None:
+        with _preprocessor_lock:
+            preprocessor = current_app.extensions.get("image_preprocessor")
+            if preprocessor is None:
+                config = current_app.config
+                preprocessor = ImagePreprocessor(
+                    cache_dir=config.get("IMAGE_PREP_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ai-vault-images"),
+                    max_edge=config.get("IMAGE_PREP_MAX_EDGE", 1536),
+                    output_format=config.get("IMAGE_PREP_FORMAT", "jpeg").lower(),
+                    quality=config.get("IMAGE_PREP_QUALITY", 85),
+                    max_cache_bytes=config.get("IMAGE_PREP_CACHE_MAX_MB", 200) * 1024 * 1024,
+                    min_age=config.get("IMAGE_PREP_CACHE_MIN_AGE", 600)
+                )
+                current_app.extensions["image_preprocessor"] = preprocessor
+    return preprocessor
+
+
+def prepare_image(file_path: str, mime_type: Optional[str] = None) -> PreparedImage:
+    """Shortcut for get_image_preprocessor().prepare(...); a no-op when IMAGE_PREP_ENABLED is off."""
+    if not current_app.config.get("IMAGE_PREP_ENABLED", True):
+        return PreparedImage(file_path, mime_type)
+    return get_image_preprocessor().prepare(file_path, mime_type)
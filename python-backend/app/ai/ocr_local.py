@@ -1,22 +1,25 @@
-import google.generativeai as genai
-import os
+from .gemini_client import get_gemini_client
+from .file_handles import call_with_uploaded_file
+from .result_cache import cached_ai_call, digest_file
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = "gemini-2.5-flash"
+OCR_PROMPT = "Extract all readable text from this image strictly. Return only the text."
 
-def extract_text(image_path: str) -> str:
+def extract_text(image_path: str, use_cache: bool = True) -> str:
     """
     Uses Gemini Flash for OCR instead of Tesseract (saves RAM & setup).
     """
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        myfile = genai.upload_file(image_path)
-        
-        response = model.generate_content([
-            myfile,
-            "Extract all readable text from this image strictly. Return only the text."
-        ])
-        
+    digest = digest_file(image_path)
+
+    def _generate():
+        # Shares one File API upload with the tagging and vision stages
+        response = call_with_uploaded_file(
+            image_path, None, lambda myfile: get_gemini_client().generate(MODEL_NAME, [myfile, OCR_PROMPT]), digest
+        )
         return response.text.strip()
+
+    try:
+        return cached_ai_call("ocr", MODEL_NAME, OCR_PROMPT, digest, _generate, use_cache)
     except Exception as e:
         print(f"Gemini OCR Error: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -0,0 +1,267 @@
+# app/ai/result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from flask import current_app
+
+
+# --------------------------------------------------------
+## 🔑 Content Digests
+# --------------------------------------------------------
+
+def digest_bytes(data) -> str:
+    """SHA-256 hex digest of bytes or text."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def digest_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# --------------------------------------------------------
+## 🗄️ Two-Tier Result Cache
+# --------------------------------------------------------
+
+class ResultCache:
+    """
+    Caches Gemini results keyed by (kind, model, prompt, content digest).
+
+    Tier 1 is an in-process LRU bounded by entry count. Tier 2 is a SQLite
+    file shared by every worker process on the host with a row cap (least
+    recently used rows are evicted first). Both tiers expire entries `ttl`
+    seconds after they were stored. Values must be JSON-serializable.
+    """
+
+    def __init__(self, path: Optional[str], memory_items: int = 256, ttl: int = 7 * 24 * 3600,
+                 max_rows: int = 20000, enabled: bool = True):
+        self.path = path
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.enabled = enabled
+
+        # key -> (expires_at, value)
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "stores": 0, "evictions": 0, "bypassed": 0}
+
+        if self.enabled and self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_results ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_results_accessed ON ai_results (accessed_at)")
+
+    @staticmethod
+    def make_key(kind: str, model: str, prompt: str, content_digest: str) -> str:
+        return digest_bytes(f"{kind}\x00{model}\x00{prompt}\x00{content_digest}")
+
+    # --------------------------------------------------------
+    ## 📖 Lookup / Store
+    # --------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if time.time() < entry[0]:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+        found = self._disk_get(key)
+        with self._lock:
+            if found is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+        value, created_at = found
+        self._memory_put(key, value, created_at + self.ttl)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._memory_put(key, value, time.time() + self.ttl)
+        self._disk_put(key, value)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def get_or_compute(self, kind: str, model: str, prompt: str, content_digest: str,
+                       compute: Callable[[], Any], use_cache: bool = True) -> Any:
+        """
+        Returns the cached result, or calls `compute()` and stores what it
+        returns. Exceptions from `compute()` propagate and are never cached.
+        """
+        if not (self.enabled and use_cache):
+            with self._lock:
+                self._stats["bypassed"] += 1
+            return compute()
+
+        key = self.make_key(kind, model, prompt, content_digest)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        value = compute()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM ai_results")
+
+    # --------------------------------------------------------
+    ## 🧠 Memory Tier
+    # --------------------------------------------------------
+
+    def _memory_put(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    # --------------------------------------------------------
+    ## 💾 SQLite Tier
+    # --------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, created_at) of a live row."""
+        if not self.path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM ai_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                if now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM ai_results WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE ai_results SET accessed_at = ? WHERE key = ?", (now, key))
+                return json.loads(row[0]), row[1]
+        except sqlite3.Error as e:
+            print(f"AI cache read error: {e}")
+            return None
+
+    def _disk_put(self, key: str, value: Any):
+        if not self.path:
+            return
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+            with self._lock:
+                self._writes += 1
+                evict_now = self._writes % 100 == 0
+            if evict_now:
+                self._evict()
+        except sqlite3.Error as e:
+            print(f"AI cache write error: {e}")
+
+    def _evict(self):
+        """Drops expired rows, then the least recently used rows above `max_rows`."""
+        with self._connect() as conn:
+            expired = conn.execute(
+                "DELETE FROM ai_results WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            overflow = conn.execute(
+                "DELETE FROM ai_results WHERE key IN ("
+                " SELECT key FROM ai_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            ).rowcount
+        with self._lock:
+            self._stats["evictions"] += expired + overflow
+
+
+# --------------------------------------------------------
+## 🏭 Shared Instance
+# --------------------------------------------------------
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def ai_cache_path(config) -> Optional[str]:
+    """SQLite file of the AI caches: AI_CACHE_PATH, default <tmp>/ai-vault-ai-cache.db; empty = memory only."""
+    path = config.get("AI_CACHE_PATH")
+    if path is None:
+        return os.path.join(tempfile.gettempdir(), "ai-vault-ai-cache.db")
+    return path or None
+
+
+def init_result_cache(app) -> ResultCache:
+    """
+    Builds the process-wide cache from the app config. It is a module
+    global rather than an app extension because AI stages call it from
+    worker threads that run outside the app context.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = app.config
+            _cache = ResultCache(
+                path=ai_cache_path(config),
+                memory_items=config.get("AI_CACHE_MEMORY_ITEMS", 256),
+                ttl=config.get("AI_CACHE_TTL", 7 * 24 * 3600),
+                max_rows=config.get("AI_CACHE_MAX_ROWS", 20000),
+                enabled=config.get("AI_CACHE_ENABLED", True)
+            )
+    return _cache
+
+
+def get_result_cache() -> ResultCache:
+    """Returns the process-wide cache, building it from current_app's config on first use."""
+    return _cache or init_result_cache(current_app._get_current_object())
+
+
+def cached_ai_call(kind: str, model: str, prompt: str, content_digest: str,
+                   compute: Callable[[], Any], use_cache: bool = True) -> Any:
+    """Shortcut for get_result_cache().get_or_compute(...)."""
+    return get_result_cache().get_or_compute(kind, model, prompt, content_digest, compute, use_cache)
@@ -1,6 +1,7 @@
 # app/ai/routes_ai.py
 import os
-from flask import Blueprint, request, jsonify
+import time
+from flask import Blueprint, request, jsonify, current_app
 from app.auth.decorators import require_auth
 from app.utils.activity_logger import log_activity
 from .ai_utils import save_temp_file, guess_file_type, is_image, os
@@ -8,6 +9,13 @@ from .classify_local import classify_image
 from .ocr_local import extract_text
 from .summarize_api import summarize_text
 from .vision_api import analyze_file_bytes
+from .stage_graph import StageGraph
+from .analysis_pipeline import run_combined_image
+from .result_cache import get_result_cache
+from .gemini_client import get_gemini_client
+from .file_handles import get_file_cache
+from .image_prep import get_image_preprocessor, prepare_image
+from app.auth.role_required import require_role
 from typing import Any, Dict, Optional
 
 routes_ai = Blueprint("routes_ai", __name__)
@@ -35,31 +43,72 @@ def analyze_file(user_id: int):
         "filename": filename
     }
     temp_path: Optional[str] = None
+    # ?refresh=1 forces fresh Gemini calls instead of cached results
+    use_cache = request.args.get("refresh", "").lower() not in ["1", "true"]
+    # ?mode=combined asks for everything in one structured call (images only)
+    mode = (request.args.get("mode") or current_app.config.get("AI_ANALYSIS_MODE", "stages")).lower()
     
     try:
         # 1. Save file locally for local ML processing (classification/OCR)
         temp_path = save_temp_file(file)
 
-        # 2. Local Image Processing (Only if it's an image)
-        if is_image(file_type):
-            results["classification"] = classify_image(temp_path)
-            results["ocr_text"] = extract_text(temp_path)
-
-        # 3. Multimodal Analysis (Gemini Vision API)
-        # We need the raw bytes, so rewind the file stream, read, and then seek to 0 again
+        # 2. Read the raw bytes for the Vision API, then rewind in case the
+        #    file is processed elsewhere later
         file.seek(0)
         bytes_data = file.read()
-        
-        results["vision_ai"] = analyze_file_bytes(
-            bytes_data=bytes_data,
-            mime_type=file_type
+        file.seek(0)
+
+        # Images go to Gemini as a downscaled, upright, JPEG/WebP variant
+        image_path, image_type = temp_path, file_type
+        if is_image(file_type):
+            prepared = prepare_image(temp_path, file_type)
+            if prepared.transformed:
+                image_path, image_type, bytes_data = prepared.path, prepared.mime_type, prepared.read_bytes()
+
+        if mode == "combined" and is_image(file_type):
+            start = time.perf_counter()
+            combined = run_combined_image(image_path, image_type, use_cache)
+            if combined is not None:
+                elapsed = round(time.perf_counter() - start, 3)
+                results.update({
+                    "classification": {"label": ", ".join(combined["tags"])},
+                    "ocr_text": combined["ocr_text"],
+                    "vision_ai": combined["description"],
+                    "summary": combined["summary"],
+                    "timings": {"combined": elapsed, "total": elapsed},
+                    "mode": "combined"
+                })
+                log_activity(user_id, f"AI analyzed file {filename}", "/ai/analyze")
+                return jsonify({"analysis": results})
+
+        # 3. Build the stage graph: tagging, OCR and vision are independent
+        #    round trips and run concurrently; the summary waits for OCR.
+        graph = StageGraph(
+            max_workers=current_app.config.get("AI_STAGE_WORKERS", 4),
+            default_timeout=current_app.config.get("AI_STAGE_TIMEOUT", 90)
         )
-        file.seek(0) # Rewind again in case file is processed elsewhere later
-        
-        # 4. Summarization (If OCR or Vision extracted text)
-        ocr_text = results.get("ocr_text", "")
-        if ocr_text:
-            results["summary"] = summarize_text(ocr_text)
+        if is_image(file_type):
+            graph.add("classification", lambda _: classify_image(image_path, use_cache=use_cache))
+            graph.add("ocr_text", lambda _: extract_text(image_path, use_cache=use_cache))
+            # 4. Summarization (If OCR extracted text)
+            graph.add(
+                "summary",
+                lambda r: summarize_text(r["ocr_text"], use_cache=use_cache) if r["ocr_text"] else None,
+                depends_on=["ocr_text"]
+            )
+        # Images reuse the File API upload made for tagging/OCR instead of re-sending the bytes
+        vision_path = image_path if is_image(file_type) else None
+        graph.add("vision_ai", lambda _: analyze_file_bytes(bytes_data=bytes_data, mime_type=image_type,
+                                                            use_cache=use_cache, file_path=vision_path))
+
+        run = graph.run()
+        for name, value in run.results.items():
+            if value is not None:
+                results[name] = value
+        if run.errors:
+            results["errors"] = run.errors
+        results["timings"] = run.timings
+        results["mode"] = "stages"
 
         # Log and return success
         log_activity(user_id, f"AI analyzed file {filename}", "/ai/analyze")
@@ -73,4 +122,23 @@ def analyze_file(user_id: int):
     finally:
         # 5. Cleanup: Delete the temporary file
         if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
\ No newline at end of file
+            os.remove(temp_path)
+
+
+# --------------------------------------------------------
+## 📊 Result Cache & Gemini Client Stats (Admin)
+# --------------------------------------------------------
+
+@routes_ai.route("/cache/stats", methods=["GET"])
+@require_role("admin")
+def cache_stats(user_id: int):
+    """Hit/miss counters for the Gemini result cache of this worker process."""
+    return jsonify({"cache": get_result_cache().stats()})
+
+
+@routes_ai.route("/client/stats", methods=["GET"])
+@require_role("admin")
+def client_stats(user_id: int):
+    """Call, retry, quota and circuit-breaker counters of the Gemini client (plus file/image caches) in this worker process."""
+    return jsonify({"client": get_gemini_client().stats(), "files": get_file_cache().stats(),
+                    "images": get_image_preprocessor().stats()})
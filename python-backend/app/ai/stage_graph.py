@@ -0,0 +1,132 @@
+# app/ai/stage_graph.py
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+# --------------------------------------------------------
+## 🧩 Stage Definitions
+# --------------------------------------------------------
+
+@dataclass
+class Stage:
+    """One unit of work in a StageGraph."""
+    name: str
+    # Called with a dict of {dependency_name: result}
+    func: Callable[[Dict[str, Any]], Any]
+    depends_on: tuple = ()
+    timeout: Optional[float] = None
+
+
+@dataclass
+class StageRun:
+    """Outcome of StageGraph.run()."""
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # Seconds per stage, plus "total" for the whole graph
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+
+def _timed_call(func, inputs):
+    """Runs `func` on a worker thread and returns (result, seconds)."""
+    start = time.perf_counter()
+    result = func(inputs)
+    return result, time.perf_counter() - start
+
+
+# --------------------------------------------------------
+## ⚡ Executor
+# --------------------------------------------------------
+
+class StageGraph:
+    """
+    Runs AI stages on a thread pool, starting each stage as soon as all of its
+    dependencies have finished. Independent stages (e.g. tagging, OCR and the
+    vision call) run concurrently, so the wall-clock time is roughly the
+    slowest dependency chain instead of the sum of all calls.
+
+    A stage that raises or times out is recorded in `errors`; stages that
+    depend on it are skipped. A timed-out thread cannot be killed, but the
+    graph stops waiting for it.
+
+        graph = StageGraph()
+        graph.add("vision", lambda r: analyze_file_bytes(data, mime))
+        graph.add("summary", lambda r: summarize_text(r["vision"]), depends_on=["vision"])
+        run = graph.run()
+    """
+
+    def __init__(self, max_workers: int = 4, default_timeout: Optional[float] = None):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any],
+            depends_on: Iterable[str] = (), timeout: Optional[float] = None) -> "StageGraph":
+        deps = tuple(depends_on)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = Stage(name, func, deps, timeout or self.default_timeout)
+        return self
+
+    def run(self) -> StageRun:
+        run = StageRun()
+        pending = dict(self._stages)
+        running = {}  # future -> (stage, started_at)
+        graph_start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ai-stage")
+        try:
+            while pending or running:
+                # 1. Skip stages whose dependencies failed
+                for name, stage in list(pending.items()):
+                    if any(dep in run.errors for dep in stage.depends_on):
+                        run.errors[name] = "skipped: dependency failed"
+                        del pending[name]
+
+                # 2. Start every stage whose dependencies are satisfied
+                for name, stage in list(pending.items()):
+                    if all(dep in run.results for dep in stage.depends_on):
+                        inputs = {dep: run.results[dep] for dep in stage.depends_on}
+                        future = executor.submit(_timed_call, stage.func, inputs)
+                        running[future] = (stage, time.perf_counter())
+                        del pending[name]
+
+                if not running:
+                    break
+
+                # 3. Wait for the next completion or the nearest deadline
+                now = time.perf_counter()
+                deadlines = [started + stage.timeout - now
+                             for stage, started in running.values() if stage.timeout]
+                wait_for = max(min(deadlines), 0) if deadlines else None
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                now = time.perf_counter()
+                for future in done:
+                    stage, started = running.pop(future)
+                    try:
+                        run.results[stage.name], elapsed = future.result()
+                    except Exception as e:
+                        print(f"❌ Stage '{stage.name}' failed: {e}")
+                        run.errors[stage.name] = str(e)
+                        elapsed = now - started
+                    run.timings[stage.name] = round(elapsed, 3)
+
+                for future, (stage, started) in list(running.items()):
+                    if stage.timeout and now - started >= stage.timeout:
+                        print(f"⏳ Stage '{stage.name}' timed out after {stage.timeout}s")
+                        running.pop(future)
+                        future.cancel()
+                        run.timings[stage.name] = round(now - started, 3)
+                        run.errors[stage.name] = f"timeout after {stage.timeout}s"
+        finally:
+            # Do not block on timed-out stages
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        run.timings["total"] = round(time.perf_counter() - graph_start, 3)
+        return run
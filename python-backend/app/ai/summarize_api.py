@@ -1,33 +1,135 @@
 
 # app/ai/summarize_api.py
-import google.generativeai as genai
-import os
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
-# Configure the Gemini API client using the environment variable
-# NOTE: The environment variable GEMINI_API_KEY must be set
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))    # type: ignore
+from .gemini_client import get_gemini_client
+from .result_cache import cached_ai_call, digest_bytes
 
+# Use the specific model name "gemini-2.5-flash" if the "pro" model is too slow or costly
+MODEL_NAME = "gemini-2.5-flash"
+SUMMARY_PROMPT = "Summarize this text in 3-5 concise bullet points:\n\n"
+CHUNK_PROMPT = (
+    "Summarize this section of a longer document. Keep every key fact, name, "
+    "number and conclusion; be concise:\n\n"
+)
+MERGE_PROMPT = "Combine these section summaries of one document into a single concise summary:\n\n"
 
-def summarize_text(content: str) -> str:
+# No tokenizer call per chunk: ~4 characters per token is close enough for English text
+CHARS_PER_TOKEN = 4
+
+
+def summarize_text(content: str, use_cache: bool = True) -> str:
     """
     Uses the Gemini API (gemini-2.5-flash) to generate a bulleted summary of text content.
 
     Args:
         content (str): The large block of text to be summarized.
+        use_cache (bool): Set to False to bypass the result cache.
 
     Returns:
         str: The summary text from the model.
     """
     # Use a descriptive prompt for the desired format (3-5 bullet points)
-    prompt = f"Summarize this text in 3-5 concise bullet points:\n\n{content}"
-    
-    # Call the model
-    # Use the specific model name "gemini-2.5-flash" if the "pro" model is too slow or costly
-    model = genai.GenerativeModel("gemini-2.5-flash") # type: ignore
-    
+    prompt = f"{SUMMARY_PROMPT}{content}"
+
+    def _generate():
+        # Call the model (shared handle, rate-limited with retries)
+        return get_gemini_client().generate(MODEL_NAME, prompt).text
+
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return cached_ai_call("summary", MODEL_NAME, SUMMARY_PROMPT, digest_bytes(content), _generate, use_cache)
+    except Exception as e:
+        print(f"Gemini Summarization API error: {e}")
+        return "Error: Could not generate summary."
+
+
+# --------------------------------------------------------
+## 🧩 Map-Reduce Summary (long documents)
+# --------------------------------------------------------
+
+def _hard_split(paragraph: str, max_chars: int) -> List[str]:
+    return [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)]
+
+
+def split_for_summary(text: str, max_tokens: int = 3000) -> List[str]:
+    """
+    Splits text into chunks of at most `max_tokens` (estimated) on paragraph
+    boundaries.
+
+    Past half the budget, a chunk also ends after any paragraph whose hash
+    picks it as a cut point. Cuts therefore depend on content, not on
+    position, so an edit only changes the chunks around it and the cached
+    summaries of the others still match.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if paragraph:
+            paragraphs.extend(_hard_split(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph])
+
+    chunks, current = [], []
+    size = 0
+    for paragraph in paragraphs:
+        if current and size + len(paragraph) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 2
+        if size >= max_chars // 2 and hashlib.sha1(paragraph.encode("utf-8")).digest()[0] % 4 == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _summarize_part(kind: str, instruction: str, content: str, use_cache: bool) -> str:
+    """One cached summary call; raises on failure so a partial result is never cached."""
+    prompt = f"{instruction}{content}"
+    return cached_ai_call(
+        kind, MODEL_NAME, instruction, digest_bytes(content),
+        lambda: get_gemini_client().generate(MODEL_NAME, prompt).text, use_cache
+    )
+
+
+def summarize_document(content: str, use_cache: bool = True,
+                       max_chunk_tokens: int = 3000, fan_out: int = 4) -> str:
+    """
+    Summarizes text of any length. Text that fits one chunk gets a single
+    summarize_text() call; longer text is split (split_for_summary), the
+    chunks are summarized concurrently (at most `fan_out` in flight), and
+    the partial summaries are merged, level by level, into one summary.
+
+    Every chunk summary is cached by its content, so re-analysing an edited
+    document only pays for the chunks that changed plus the merge.
+
+    Returns:
+        str: The summary, or an error string like summarize_text().
+    """
+    chunks = split_for_summary(content, max_chunk_tokens)
+    if len(chunks) <= 1:
+        return summarize_text(content, use_cache=use_cache)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, fan_out), thread_name_prefix="summary") as pool:
+            partials = list(pool.map(
+                lambda chunk: _summarize_part("summary_chunk", CHUNK_PROMPT, chunk, use_cache), chunks
+            ))
+            print(f"🧩 DEBUG: Summarized {len(chunks)} chunks")
+
+            # Reduce: merge groups of partials until they fit one final call
+            while True:
+                groups = split_for_summary("\n\n".join(partials), max_chunk_tokens)
+                if len(groups) <= 1 or len(groups) >= len(partials):
+                    break
+                partials = list(pool.map(
+                    lambda group: _summarize_part("summary_merge", MERGE_PROMPT, group, use_cache), groups
+                ))
+        return _summarize_part("summary", SUMMARY_PROMPT, "\n\n".join(partials), use_cache)
     except Exception as e:
         print(f"Gemini Summarization API error: {e}")
-        return "Error: Could not generate summary."
\ No newline at end of file
+        return "Error: Could not generate summary."
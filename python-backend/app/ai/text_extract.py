@@ -0,0 +1,185 @@
+# app/ai/text_extract.py
+import codecs
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+# A page with fewer non-whitespace characters than this is treated as scanned
+MIN_PAGE_CHARS = 20
+
+
+@dataclass
+class PageText:
+    number: int  # 1-based
+    text: str
+
+    @property
+    def has_text(self) -> bool:
+        return len("".join(self.text.split())) >= MIN_PAGE_CHARS
+
+
+@dataclass
+class ExtractedDocument:
+    """Text pulled out locally, plus the pages that still need the model (scans, images)."""
+    page_count: int = 0
+    # Text of the pages that have a text layer, in page order
+    page_texts: List[str] = field(default_factory=list)
+    pages_without_text: List[int] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.page_texts)
+
+    @property
+    def is_text_native(self) -> bool:
+        return self.page_count > 0 and not self.pages_without_text
+
+
+# --------------------------------------------------------
+## 📕 PDF Text Layer
+# --------------------------------------------------------
+
+def iter_pdf_pages(file_path: str) -> Iterator[PageText]:
+    """
+    Yields the embedded text layer one page at a time (pypdf parses pages
+    lazily, so only the current page's content stream is decoded).
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    for index, page in enumerate(reader.pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:  # a broken content stream only loses that page
+            print(f"⚠️ PDF page {index + 1} text extraction failed: {e}")
+            text = ""
+        yield PageText(index + 1, text.strip())
+
+
+def extract_pdf(file_path: str) -> Optional[ExtractedDocument]:
+    """
+    Returns the PDF's text layer, or None if the PDF cannot be read locally.
+    Pages are consumed as they are parsed: only the text of pages that have
+    a text layer and the numbers of those that don't are kept. `.text`
+    joins the kept pages into the one string the analysis stores.
+    """
+    try:
+        document = ExtractedDocument()
+        for page in iter_pdf_pages(file_path):
+            document.page_count += 1
+            if page.has_text:
+                document.page_texts.append(page.text)
+            else:
+                document.pages_without_text.append(page.number)
+        return document
+    except ImportError:
+        print("⚠️ pypdf is not installed; PDFs go to Gemini whole")
+        return None
+    except Exception as e:
+        print(f"⚠️ Local PDF extraction failed: {e}")
+        return None
+
+
+def write_pdf_subset(file_path: str, page_numbers: List[int], out_path: str) -> str:
+    """Writes only `page_numbers` (1-based) of a PDF to `out_path`, for sending scanned pages alone."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number - 1])
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return out_path
+
+
+# --------------------------------------------------------
+## 📘 DOCX (paragraphs, tables, headers/footers)
+# --------------------------------------------------------
+
+def _table_lines(table) -> List[str]:
+    lines = []
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            text = cell.text.strip()
+            # Merged cells repeat the same cell object across the span
+            if text and (not cells or cells[-1] != text):
+                cells.append(text)
+        if cells:
+            lines.append(" | ".join(cells))
+    return lines
+
+
+def _block_lines(container) -> List[str]:
+    """Paragraphs and tables of a body/header/footer in document order."""
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    lines = []
+    for child in container._element.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            text = Paragraph(child, container).text.strip()
+            if text:
+                lines.append(text)
+        elif tag == "tbl":
+            lines.extend(_table_lines(Table(child, container)))
+    return lines
+
+
+def extract_docx(file_path: str) -> str:
+    """
+    Text of a .docx: body paragraphs and tables in reading order, with
+    headers and footers (once each, since sections usually repeat them).
+    """
+    import docx
+
+    doc = docx.Document(file_path)
+    header_lines, footer_lines = [], []
+    for section in doc.sections:
+        for part, bucket in ((section.header, header_lines), (section.footer, footer_lines)):
+            if part.is_linked_to_previous:
+                continue
+            for line in _block_lines(part):
+                if line not in bucket:
+                    bucket.append(line)
+
+    body = _block_lines(doc._body)
+    return "\n".join(header_lines + body + footer_lines)
+
+
+# --------------------------------------------------------
+## 📄 Plain Text (encoding detection)
+# --------------------------------------------------------
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(data: bytes) -> str:
+    """BOM, then strict UTF-8, then charset_normalizer (if installed), then cp1252."""
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+    try:
+        data.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(data[:256 * 1024]).best()
+        if best is not None:
+            return best.encoding
+    except ImportError:
+        pass
+    return "cp1252"
+
+
+def decode_text(data: bytes) -> str:
+    return data.decode(detect_encoding(data), errors="replace")
@@ -1,57 +1,93 @@
 # app/ai/vision_api.py
-import google.generativeai as genai
-import os
-import time
+from typing import Optional
+from .gemini_client import get_gemini_client
+from .file_handles import call_with_uploaded_file, GeminiFileFailed
+from .result_cache import cached_ai_call, digest_bytes, digest_file
 
-# Configure the Gemini API client
-genai.configure(api_key=os.getenv("GEMINI_API_KEY")) 
+# Use the model you confirmed works (gemini-2.5-flash)
+MODEL_NAME = "gemini-2.5-flash"
+VISION_PROMPT = "Explain this image briefly and extract tags/keywords."
+DOCUMENT_PROMPT = "Summarize this document in detail. Extract key points and 3-5 tags."
+TRANSCRIBE_PROMPT = (
+    "Transcribe all readable text in this document verbatim, page by page. "
+    "Return only the text, no commentary."
+)
 
-def analyze_file_bytes(bytes_data: bytes, mime_type: str) -> str:
+
+def analyze_file_bytes(bytes_data: bytes, mime_type: str, use_cache: bool = True,
+                       file_path: Optional[str] = None) -> str:
     """
-    For Images: Sends raw bytes directly to Gemini.
+    For Images: Sends raw bytes directly to Gemini, or, when the file is on
+    disk (`file_path`), reuses the File API upload shared with tagging/OCR.
     """
-    # Use the model you confirmed works (gemini-2.5-flash)
-    model = genai.GenerativeModel("gemini-2.5-flash") 
-    prompt = "Explain this image briefly and extract tags/keywords."
-    
-    try:
-        response = model.generate_content([
-            {"mime_type": mime_type, "data": bytes_data},
-            prompt
-        ])
+    digest = digest_bytes(bytes_data)
+
+    def _generate():
+        client = get_gemini_client()
+        if file_path:
+            response = call_with_uploaded_file(
+                file_path, mime_type, lambda f: client.generate(MODEL_NAME, [f, VISION_PROMPT]), digest
+            )
+        else:
+            response = client.generate(MODEL_NAME, [
+                {"mime_type": mime_type, "data": bytes_data},
+                VISION_PROMPT
+            ])
         return response.text
+
+    try:
+        return cached_ai_call("vision", MODEL_NAME, f"{mime_type}\n{VISION_PROMPT}",
+                              digest, _generate, use_cache)
     except Exception as e:
         print(f"Gemini Vision API error: {e}")
         return f"Error: {str(e)}"
 
 
-def analyze_via_upload(file_path: str, mime_type: str) -> str:
+def analyze_via_upload(file_path: str, mime_type: str, use_cache: bool = True) -> str:
     """
-    For PDFs/Docs: Uploads file to Gemini's temp storage first.
+    For PDFs/Docs: Uploads file to Gemini's temp storage first. The wait for
+    processing is bounded by GEMINI_FILE_WAIT_TIMEOUT; a stuck file returns
+    an error string instead of pinning the worker.
     """
-    print(f"DEBUG: Uploading {mime_type} to Gemini File API...")
-    try:
-        # 1. Upload to Google
-        uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
-        print(f"DEBUG: File uploaded: {uploaded_file.name}")
-        
-        # 2. Wait for processing
-        while uploaded_file.state.name == "PROCESSING":
-            print("DEBUG: Waiting for Gemini to process file...")
-            time.sleep(1)
-            uploaded_file = genai.get_file(uploaded_file.name)
-
-        if uploaded_file.state.name == "FAILED":
-             return "Error: Gemini failed to process this file."
-
-        # 3. Generate Content
-        model = genai.GenerativeModel("gemini-2.5-flash") 
-        prompt = "Summarize this document in detail. Extract key points and 3-5 tags."
-        
-        response = model.generate_content([uploaded_file, prompt])
-        
+    digest = digest_file(file_path)
+
+    def _generate():
+        # Upload once (reused while the File API keeps it), wait until ACTIVE, then generate
+        response = call_with_uploaded_file(
+            file_path, mime_type,
+            lambda uploaded_file: get_gemini_client().generate(MODEL_NAME, [uploaded_file, DOCUMENT_PROMPT]),
+            digest
+        )
         return response.text
-        
+
+    try:
+        return cached_ai_call("document", MODEL_NAME, f"{mime_type}\n{DOCUMENT_PROMPT}",
+                              digest, _generate, use_cache)
+    except GeminiFileFailed as e:
+        return f"Error: {e}"
     except Exception as e:
         print(f"Gemini Upload API error: {e}")
-        return f"Error analyzing document: {str(e)}"
\ No newline at end of file
+        return f"Error analyzing document: {str(e)}"
+
+
+def transcribe_via_upload(file_path: str, mime_type: str, use_cache: bool = True) -> str:
+    """
+    For scanned pages: asks Gemini for the verbatim text of an uploaded
+    document (the pages without a text layer). Returns "" on failure.
+    """
+    digest = digest_file(file_path)
+
+    def _generate():
+        response = call_with_uploaded_file(
+            file_path, mime_type,
+            lambda uploaded_file: get_gemini_client().generate(MODEL_NAME, [uploaded_file, TRANSCRIBE_PROMPT]),
+            digest
+        )
+        return response.text
+
+    try:
+        return cached_ai_call("transcribe", MODEL_NAME, f"{mime_type}\n{TRANSCRIBE_PROMPT}",
+                              digest, _generate, use_cache)
+    except Exception as e:
+        print(f"Gemini transcription error: {e}")
+        return ""
@@ -1,40 +1,50 @@
 # app/auth/auth_helpers.py
-from flask import request
+from dataclasses import dataclass
+from flask import request, g
 from typing import Optional
 
-# NOTE: Assuming app.auth.utils is available for token verification
-from app.auth.utils import verify_token
+from app.auth.utils import decode_token
 
 
 # --------------------------------------------------------
 ## 🔐 Authentication Helpers
 # --------------------------------------------------------
 
-def get_current_user_id() -> Optional[int]:
+@dataclass(frozen=True)
+class AuthContext:
+    """The verified identity behind the current request's Bearer token."""
+    user_id: int
+    # Role claim of the token (None for tokens issued before roles were embedded)
+    role: Optional[str]
+
+
+def get_auth_context() -> Optional[AuthContext]:
     """
-    Reads the Authorization header, extracts the Bearer token, 
-    verifies the token's signature, and returns the authenticated 
-    user_id if valid; otherwise, returns None.
+    Reads the Authorization header and verifies the Bearer token, once per
+    request: the rate limiter key, require_auth and require_role all share
+    the result. Returns None when there is no valid token.
     """
-    
-    # 1. Get the Authorization header
-    token_header = request.headers.get("Authorization")
-    if not token_header:
-        return None
-    
-    token = token_header
-    
-    # 2. Strip "Bearer " prefix if present
+    if "auth_context" in g:
+        return g.auth_context
+
+    context = None
+    # 1. Get the Authorization header; only Bearer tokens are checked
+    # (a bare JWT in the header is accepted too, as before)
+    token = request.headers.get("Authorization", "")
     if token.startswith("Bearer "):
-        # Split into two parts and take the second part (the token itself)
         token = token.split(" ", 1)[1]
 
-    # 3. Verify the token and return the user ID
-    # The verify_token function is expected to return the user_id (int) 
-    # or raise an exception/return None if verification fails.
-    try:
-        user_id = verify_token(token)
-        return user_id
-    except Exception:
-        # Catch exceptions (e.g., JWT decode error, expired token)
-        return None
\ No newline at end of file
+    # 2. Verify the token (signature, expiry, not a password-reset token)
+    if token.count(".") == 2:
+        payload = decode_token(token)
+        if payload is not None:
+            context = AuthContext(user_id=payload["user_id"], role=payload.get("role"))
+
+    g.auth_context = context
+    return context
+
+
+def get_current_user_id() -> Optional[int]:
+    """Returns the authenticated user_id if the request carries a valid token; otherwise None."""
+    context = get_auth_context()
+    return context.user_id if context else None
@@ -1,26 +1,35 @@
 from functools import wraps
 from flask import request
-from .utils import verify_token
-from ..models import User
+from app.auth.auth_helpers import get_auth_context
+from app.auth.user_cache import get_user_cache
 
 def require_role(required_role):
+    """
+    Ensures the user is authenticated and has `required_role`, and injects
+    user_id like require_auth.
+
+    The decision uses the user's current role from the per-process
+    UserCache, never the token's role claim alone. A claim can be out of
+    date: a newly promoted admin gets in without logging in again, and a
+    demoted one is refused before the token expires.
+
+    Trade-off: a cache hit costs no query, and a miss costs one lookup per
+    user per AUTH_USER_CACHE_TTL seconds. assign-role invalidates the entry
+    in the worker that served it. Other workers see a role change only
+    once their entry expires, so for up to AUTH_USER_CACHE_TTL seconds.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
 
-            token = request.headers.get("Authorization")
-
-            if not token:
+            if not request.headers.get("Authorization"):
                 return {"error": "Missing token"}, 401
 
-            if token.startswith("Bearer "):
-                token = token.split(" ", 1)[1]
-
-            user_id = verify_token(token)
-            if not user_id:
+            context = get_auth_context()
+            if context is None:
                 return {"error": "Invalid token"}, 401
 
-            requester = User.query.get(user_id)
+            requester = get_user_cache().get(context.user_id)
             if requester is None:
                 return {"error": "User not found"}, 404
 
@@ -29,7 +38,7 @@ def require_role(required_role):
                 return {"error": "Forbidden: insufficient role"}, 403
 
             # pass user_id to the route
-            return func(user_id, *args, **kwargs)
+            return func(context.user_id, *args, **kwargs)
 
         return wrapper
     return decorator
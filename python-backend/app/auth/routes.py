@@ -1,6 +1,8 @@
 from flask import request, jsonify
 from . import auth
 from .role_required import require_role
+from .auth_helpers import get_current_user_id
+from .user_cache import invalidate_user
 from app.utils.activity_logger import log_activity
 from app import limiter  # Global rate limiter instance
 from datetime import datetime
@@ -14,8 +16,7 @@ from app.auth.utils import (
     verify_password_reset_token,
     hash_password,
     verify_password,
-    create_token,
-    verify_token
+    create_token
 )
 
 # --------------------------------------------------------
@@ -63,6 +64,7 @@ def signup():
 
     db.session.add(new_user)
     db.session.commit()
+    invalidate_user(new_user.id)  # in case a reused id was cached as missing
 
     # Log activity
     log_activity(new_user.id, "User signed up", route="/auth/signup")
@@ -94,7 +96,7 @@ def login():
         # Avoid revealing if email exists for security
         return jsonify({"error": "Invalid credentials"}), 401
 
-    token = create_token(user.id)
+    token = create_token(user.id, role=user.role)
     log_activity(user.id, "User logged in", route="/auth/login")
 
     return jsonify({
@@ -112,17 +114,11 @@ def get_me():
     """Retrieves the profile of the authenticated user."""
     from ..models import User
 
-    token_header = request.headers.get("Authorization")
-    if not token_header:
+    if not request.headers.get("Authorization"):
         return jsonify({"error": "Missing token"}), 401
 
-    # Extract clean token
-    token = token_header
-    if token.startswith("Bearer "):
-        token = token.split(" ", 1)[1]
-
     # Verify Token
-    user_id = verify_token(token)
+    user_id = get_current_user_id()
     
     if not user_id:
         return jsonify({"error": "Invalid or expired token"}), 401
@@ -144,12 +140,7 @@ def change_password():
     from ..models import User
     from app import db
 
-    token_header = request.headers.get("Authorization", "")
-    token = token_header
-    if token.startswith("Bearer "):
-        token = token.split(" ")[1]
-
-    user_id = verify_token(token)
+    user_id = get_current_user_id()
     if not user_id:
         return jsonify({"error": "Invalid or missing token"}), 401
 
@@ -197,6 +188,8 @@ def assign_role(admin_user_id: int, user_id_param: int):
 
     user.role = new_role
     db.session.commit()
+    # Tokens still carry the old role; the role check now sees the new one
+    invalidate_user(user_id_param)
 
     log_activity(
         admin_user_id,
@@ -0,0 +1,91 @@
+# app/auth/user_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from flask import current_app
+
+from app import db
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    role: str
+
+
+class UserCache:
+    """
+    Per-process TTL cache of the user fields authorization needs (id, role),
+    so role checks don't query the users table on every admin request.
+    Missing users are cached too. invalidate() drops an entry at once (role
+    change, deletion); other workers pick the change up within `ttl` seconds.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return None if entry[1] is self._MISSING else entry[1]
+            self._stats["misses"] += 1
+
+        from app.models import User
+        row = db.session.query(User.id, User.role).filter(User.id == user_id).first()
+        user = CachedUser(row.id, row.role) if row else None
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, user if user else self._MISSING)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+
+# --------------------------------------------------------
+## 🏭 Per-Process Instance
+# --------------------------------------------------------
+
+_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> UserCache:
+    """Returns the app's shared UserCache, building it on first use."""
+    cache = current_app.extensions.get("user_cache")
+    if cache is None:
+        with _cache_lock:
+            cache = current_app.extensions.get("user_cache")
+            if cache is None:
+                cache = UserCache(
+                    ttl=current_app.config.get("AUTH_USER_CACHE_TTL", 60),
+                    max_entries=current_app.config.get("AUTH_USER_CACHE_SIZE", 10000)
+                )
+                current_app.extensions["user_cache"] = cache
+    return cache
+
+
+def invalidate_user(user_id: int):
+    """Call after changing a user's role or deleting them."""
+    get_user_cache().invalidate(user_id)
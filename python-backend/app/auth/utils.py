@@ -24,27 +24,39 @@ def verify_password(password: str, hashed: str) -> bool:
 ## 🔑 Authentication Token (JWT)
 # --------------------------------------------------------
 
-def create_token(user_id: int) -> str:
-    """Creates a standard JWT for user authentication (valid for 24 hours)."""
+def create_token(user_id: int, role: Optional[str] = None) -> str:
+    """
+    Creates a standard JWT for user authentication (valid for 24 hours).
+    The role claim lets require_role authorize without loading the user.
+    """
     # print("CREATING TOKEN FOR USER:", user_id)
     payload = {
         "user_id": user_id,
         "exp": datetime.now(timezone.utc) + timedelta(hours=24)
     }
+    if role:
+        payload["role"] = role
     token = jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
     return token
 
 
-def verify_token(token: str) -> Optional[int]:
-    """Decodes and verifies a standard JWT."""
+def decode_token(token: str) -> Optional[dict]:
+    """Decodes and verifies a standard JWT; returns its claims, or None if invalid."""
     try:
         payload = jwt.decode(token, current_app.config["SECRET_KEY"], algorithms=["HS256"])
-        if "user_id" in payload:
-            return payload["user_id"]
-        return None
     except Exception as e:
         print("TOKEN ERROR:", e)
         return None
+    # Password reset tokens are signed with the same key but must not authenticate
+    if "user_id" not in payload or payload.get("purpose"):
+        return None
+    return payload
+
+
+def verify_token(token: str) -> Optional[int]:
+    """Decodes and verifies a standard JWT; returns its user_id."""
+    payload = decode_token(token)
+    return payload["user_id"] if payload else None
 
 
 # --------------------------------------------------------
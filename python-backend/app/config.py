@@ -32,10 +32,157 @@ class Config:
 
     # Storage driver setting (options: 'cloudinary', 'local', 's3')
     STORAGE_DRIVER = os.getenv("STORAGE_DRIVER", "cloudinary")
+    # HTTP connections the S3 client keeps alive (shared across requests); Cloudinary
+    # uploads go through the SDK's own module-level pool
+    STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", 10))
     
     # Maximum size of incoming request data (for file uploads)
-    # 20 MB = 20 * 1024 * 1024 bytes
-    MAX_CONTENT_LENGTH = 20 * 1024 * 1024
+    # Default 20 MB. Uploads above 500 KB are spooled to disk by werkzeug and
+    # streamed to S3 in parts, so this can be raised for large documents.
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH_MB", 20)) * 1024 * 1024
+
+    # --- Download Service (analysis / chat fetch stored files through it) ---
+    # On-disk blob cache keyed by URL (+ ETag); default <tmp>/ai-vault-blobs
+    DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR")
+    DOWNLOAD_CACHE_MAX_MB = int(os.getenv("DOWNLOAD_CACHE_MAX_MB", 500))
+    # Entries younger than this are served without revalidating with the origin
+    DOWNLOAD_CACHE_FRESH_SECONDS = int(os.getenv("DOWNLOAD_CACHE_FRESH_SECONDS", 300))
+    # Blobs fetched within this many seconds are never pruned (an analysis may still be
+    # reading them); keep it above the longest analysis job
+    DOWNLOAD_CACHE_MIN_AGE = int(os.getenv("DOWNLOAD_CACHE_MIN_AGE", 600))
+    DOWNLOAD_POOL_SIZE = int(os.getenv("DOWNLOAD_POOL_SIZE", 10))
+    DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", 5))
+    DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", 60))
+
+    # Thumbnails (long edge, px) stored next to uploads; PDFs get a first-page render (needs PyMuPDF).
+    # Made at upload time when DERIVATIVES_ON_UPLOAD is on, else on the first /files/<id>/thumbnails
+    DERIVATIVE_SIZES = os.getenv("DERIVATIVE_SIZES", "128,512")
+    PROFILE_DERIVATIVE_SIZES = os.getenv("PROFILE_DERIVATIVE_SIZES", "64,256")
+    DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", 80))
+    DERIVATIVES_ON_UPLOAD = os.getenv('DERIVATIVES_ON_UPLOAD', 'True').lower() in ['true', 'on', '1']
+
+    # AWS S3 credentials (only needed when STORAGE_DRIVER='s3')
+    AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
+    AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+    AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+    AWS_REGION = os.getenv("AWS_REGION", "")
+    # Custom endpoint for S3-compatible stores or a local stand-in (moto, MinIO)
+    AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
+
+    # S3 multipart upload tuning (sizes in MB)
+    S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", 8))
+    S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", 8))
+    S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 4))
+
+    # --- Activity Log ---
+    # Events are queued in-process and bulk-inserted by a background thread every
+    # ACTIVITY_LOG_FLUSH_INTERVAL seconds or ACTIVITY_LOG_BATCH_SIZE events.
+    # When the queue is full: 'drop' the event or 'block' the request briefly, then drop
+    ACTIVITY_LOG_ASYNC = os.getenv('ACTIVITY_LOG_ASYNC', 'True').lower() in ['true', 'on', '1']
+    ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", 10000))
+    ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 200))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", 2))
+    ACTIVITY_LOG_OVERFLOW = os.getenv("ACTIVITY_LOG_OVERFLOW", "drop")
+    # Rows older than this move to monthly archive tables (activity_logs_YYYYMM) and
+    # daily counts; the job runs every ACTIVITY_ARCHIVE_INTERVAL seconds (0 = never)
+    ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", 90))
+    ACTIVITY_ARCHIVE_INTERVAL = float(os.getenv("ACTIVITY_ARCHIVE_INTERVAL", 3600))
+    ACTIVITY_ARCHIVE_BATCH_SIZE = int(os.getenv("ACTIVITY_ARCHIVE_BATCH_SIZE", 5000))
+
+    # --- Background Analysis Jobs ---
+    # Worker threads per process for /files/<id>/analyze (0 = run inline in the request)
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))
+    # Seconds an idle worker sleeps before re-checking the job table
+    ANALYSIS_POLL_INTERVAL = float(os.getenv("ANALYSIS_POLL_INTERVAL", 5))
+    # 'running' jobs older than this are assumed orphaned by a dead worker (e.g. one killed
+    # by the gunicorn timeout) and requeued; workers sweep for them while the process lives.
+    # Default 4 x AI_STAGE_TIMEOUT: a job runs a few stage levels, each bounded by that timeout
+    ANALYSIS_JOB_STALE_SECONDS = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", 0)) or None
+    ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", 2))
+    # Concurrent AI stages per analysis (tagging / OCR / vision) and per-stage timeout in seconds
+    AI_STAGE_WORKERS = int(os.getenv("AI_STAGE_WORKERS", 4))
+    AI_STAGE_TIMEOUT = float(os.getenv("AI_STAGE_TIMEOUT", 90))
+    # Image analysis: 'stages' (tagging / OCR / vision / summary calls) or 'combined'
+    # (one structured-output call; falls back to stages if its response is invalid)
+    AI_ANALYSIS_MODE = os.getenv("AI_ANALYSIS_MODE", "stages")
+    # Long documents are summarized map-reduce: chunks of ~this many tokens, this many in flight
+    SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+    SUMMARY_FAN_OUT = int(os.getenv("SUMMARY_FAN_OUT", 4))
+    # Images sent to Gemini are EXIF-rotated, downscaled to this long edge and re-encoded
+    # ('jpeg' or 'webp'); variants are cached per file content in IMAGE_PREP_CACHE_DIR
+    IMAGE_PREP_ENABLED = os.getenv('IMAGE_PREP_ENABLED', 'True').lower() in ['true', 'on', '1']
+    IMAGE_PREP_MAX_EDGE = int(os.getenv("IMAGE_PREP_MAX_EDGE", 1536))
+    IMAGE_PREP_FORMAT = os.getenv("IMAGE_PREP_FORMAT", "jpeg")
+    IMAGE_PREP_QUALITY = int(os.getenv("IMAGE_PREP_QUALITY", 85))
+    IMAGE_PREP_CACHE_DIR = os.getenv("IMAGE_PREP_CACHE_DIR")  # default <tmp>/ai-vault-images
+    IMAGE_PREP_CACHE_MAX_MB = int(os.getenv("IMAGE_PREP_CACHE_MAX_MB", 200))
+    # Variants used within this many seconds are never pruned (a stage may still be sending them)
+    IMAGE_PREP_CACHE_MIN_AGE = int(os.getenv("IMAGE_PREP_CACHE_MIN_AGE", 600))
+    # Analysis text (file_analyses) is zstd-compressed from this size up ('zstd' or 'none';
+    # needs the zstandard package, otherwise stored as plain UTF-8)
+    ANALYSIS_COMPRESSION = os.getenv("ANALYSIS_COMPRESSION", "zstd")
+    ANALYSIS_COMPRESS_MIN_BYTES = int(os.getenv("ANALYSIS_COMPRESS_MIN_BYTES", 4096))
+    ANALYSIS_ZSTD_LEVEL = int(os.getenv("ANALYSIS_ZSTD_LEVEL", 3))
+
+    # --- Gemini Client ---
+    # Backend: 'gemini' or 'fake' (canned replies, offline/tests; GEMINI_FAKE_LATENCY s per call)
+    GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "gemini")
+    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    GEMINI_FAKE_LATENCY = float(os.getenv("GEMINI_FAKE_LATENCY", 0))
+    # Request budget shared by the host's workers through a SQLite token bucket
+    # (default <tmp>/ai-vault-gemini-limiter.db; set GEMINI_LIMITER_PATH empty for per-process)
+    GEMINI_RPM = float(os.getenv("GEMINI_RPM", 60))
+    GEMINI_BURST = float(os.getenv("GEMINI_BURST", 10))
+    GEMINI_LIMITER_PATH = os.getenv("GEMINI_LIMITER_PATH")
+    # Retries with exponential backoff (seconds), and a circuit breaker that opens after
+    # GEMINI_BREAKER_THRESHOLD consecutive failures for GEMINI_BREAKER_COOLDOWN seconds
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 4))
+    GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", 1.0))
+    GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", 20.0))
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5))
+    GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", 30))
+
+    # --- AI Result Cache ---
+    # Gemini results keyed by prompt + content: an in-process LRU of AI_CACHE_MEMORY_ITEMS
+    # entries over a SQLite file shared by the host's workers (AI_CACHE_MAX_ROWS rows).
+    # Default file <tmp>/ai-vault-ai-cache.db; set AI_CACHE_PATH empty for memory only
+    AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', 'True').lower() in ['true', 'on', '1']
+    AI_CACHE_PATH = os.getenv("AI_CACHE_PATH")
+    AI_CACHE_MEMORY_ITEMS = int(os.getenv("AI_CACHE_MEMORY_ITEMS", 256))
+    AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", 7 * 24 * 3600))  # seconds, both tiers
+    AI_CACHE_MAX_ROWS = int(os.getenv("AI_CACHE_MAX_ROWS", 20000))
+    # Gemini File API uploads are reused by content (handles kept in memory and in AI_CACHE_PATH);
+    # seconds to wait for an upload to leave PROCESSING, and handles kept in memory
+    GEMINI_FILE_WAIT_TIMEOUT = float(os.getenv("GEMINI_FILE_WAIT_TIMEOUT", 90))
+    GEMINI_FILE_CACHE_ITEMS = int(os.getenv("GEMINI_FILE_CACHE_ITEMS", 1024))
+
+    # --- Semantic Search ---
+    # Embedding model: 'gemini' (text-embedding API) or 'local' (deterministic hashing, offline/tests)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/text-embedding-004")
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", 256))  # local backend only
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 50))
+    # Vector store: 'numpy' (flat/IVF index cached on disk) or 'pgvector' (Postgres only)
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR")  # default <tmp>/ai-vault-vectors
+    # Users with at least this many chunks get an IVF layout instead of a full scan
+    VECTOR_IVF_MIN_ROWS = int(os.getenv("VECTOR_IVF_MIN_ROWS", 5000))
+    VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", 8))
+    # File chat sends only this many best-matching chunks of the document text
+    CHAT_CONTEXT_CHUNKS = int(os.getenv("CHAT_CONTEXT_CHUNKS", 6))
+    # File chat model: 'gemini' or 'fake' (scripted word-by-word replies, offline/tests)
+    CHAT_MODEL_BACKEND = os.getenv("CHAT_MODEL_BACKEND", "gemini")
+    # Chat sessions: turns re-sent verbatim before older ones are summarized
+    CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", 8))
+    # Per-session cache of the static prompt prefix and image handle
+    CHAT_CONTEXT_CACHE_SIZE = int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", 256))
+    CHAT_CONTEXT_TTL = int(os.getenv("CHAT_CONTEXT_TTL", 1800))
+
+    # --- Auth ---
+    # require_role reads users' current roles from a per-process cache: seconds an entry
+    # lives (role changes made by other workers show up within this) and max entries
+    AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 60))
+    AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
 
     # --- Rate Limiting Settings (Flask-Limiter) ---
     # Default rate limit applied to unauthenticated endpoints or users
@@ -0,0 +1,5 @@
+# app/jobs/__init__.py
+# simple convenience exports
+from .job_queue import AnalysisJobQueue, init_job_queue, get_job_queue
+
+__all__ = ["AnalysisJobQueue", "init_job_queue", "get_job_queue"]
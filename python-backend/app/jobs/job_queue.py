@@ -0,0 +1,237 @@
+# app/jobs/job_queue.py
+import atexit
+import logging
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask import current_app
+
+from app import db
+from app.models import AnalysisJob, UploadedFile
+from app.search import get_search_index, index_file_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisJobQueue:
+    """
+    In-process worker pool backed by the `analysis_jobs` table.
+
+    The database row is the source of truth: every gunicorn worker runs its own
+    pool, and a job is claimed with a conditional UPDATE (queued -> running), so
+    only one thread across all processes ever runs a given job. No external
+    broker is needed; SQLite and Postgres both work.
+
+    Jobs left 'running' by a killed process are requeued by a sweep that the
+    workers run every `stale_after / 4` seconds, not only at startup.
+    """
+
+    def __init__(self, app, max_workers: int = 2, poll_interval: float = 5.0,
+                 stale_after: float = 360, max_attempts: int = 2):
+        self.app = app
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.sweep_interval = max(poll_interval, stale_after / 4)
+
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    # --------------------------------------------------------
+    ## ▶️ Lifecycle
+    # --------------------------------------------------------
+
+    def start(self):
+        """Requeues stale jobs and spawns the worker threads."""
+        if self._threads or self.max_workers <= 0:
+            return
+        self._sweep_if_due()
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker_loop, name=f"analysis-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    # --------------------------------------------------------
+    ## 📥 Producer API
+    # --------------------------------------------------------
+
+    def enqueue(self, file_record: UploadedFile, user_id: int, use_cache: bool = True) -> AnalysisJob:
+        """
+        Creates a job for `file_record`, or returns the job that is already
+        queued/running for it so repeated clicks do not pile up work.
+        `use_cache=False` makes the job bypass the AI result cache.
+        """
+        job = AnalysisJob.query.filter(
+            AnalysisJob.file_id == file_record.id,
+            AnalysisJob.status.in_([AnalysisJob.STATUS_QUEUED, AnalysisJob.STATUS_RUNNING])
+        ).order_by(AnalysisJob.id.desc()).first()
+        if job:
+            return job
+
+        job = AnalysisJob(file_id=file_record.id, user_id=user_id, use_cache=use_cache)
+        db.session.add(job)
+        db.session.commit()
+
+        if self.max_workers <= 0:
+            # Inline mode (no worker threads): run the job in the request.
+            if self._claim(job.id):
+                self._run(job.id)
+            db.session.refresh(job)
+        else:
+            self._wakeup.set()
+        return job
+
+    # --------------------------------------------------------
+    ## 🧵 Worker Side
+    # --------------------------------------------------------
+
+    def _worker_loop(self):
+        while not self._stopped.is_set():
+            job_id = None
+            try:
+                with self.app.app_context():
+                    self._sweep_if_due()
+                    job_id = self._claim_next()
+                    if job_id is not None:
+                        self._run(job_id)
+            except Exception:
+                logger.exception("Analysis worker loop error")
+            finally:
+                if job_id is None:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+
+    def _claim_next(self) -> Optional[int]:
+        """Claims the oldest queued job, or returns None when the queue is empty."""
+        candidates = db.session.query(AnalysisJob.id)\
+            .filter(AnalysisJob.status == AnalysisJob.STATUS_QUEUED)\
+            .order_by(AnalysisJob.id.asc()).limit(self.max_workers).all()
+        for (job_id,) in candidates:
+            if self._claim(job_id):
+                return job_id
+        return None
+
+    def _claim(self, job_id: int) -> bool:
+        claimed = AnalysisJob.query.filter_by(id=job_id, status=AnalysisJob.STATUS_QUEUED).update({
+            "status": AnalysisJob.STATUS_RUNNING,
+            "started_at": datetime.now(timezone.utc),
+            "attempts": AnalysisJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id: int):
+        from app.ai.analysis_pipeline import run_file_analysis
+
+        job = db.session.get(AnalysisJob, job_id)
+        if job is None:
+            return
+        file_record = db.session.get(UploadedFile, job.file_id)
+
+        print(f"\n🔍 DEBUG: Starting Analysis Job {job.id} for File ID {job.file_id}")
+        try:
+            if file_record is None:
+                raise LookupError("File not found")
+            job.stage_timings = run_file_analysis(file_record, use_cache=job.use_cache)
+            get_search_index().index_file(file_record)
+            self._index_embeddings(file_record)
+            job.status = AnalysisJob.STATUS_DONE
+            job.error = None
+        except Exception as e:
+            print("\n❌ CRITICAL ERROR DURING EXECUTION:")
+            traceback.print_exc()
+            db.session.rollback()
+            job = db.session.get(AnalysisJob, job_id)
+            job.status = AnalysisJob.STATUS_FAILED
+            job.error = str(e)
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+        print(f"✅ DEBUG: Job {job_id} finished with status '{job.status}'.")
+
+    def _index_embeddings(self, file_record):
+        # Semantic search is best-effort: an embedding outage must not fail the analysis
+        try:
+            count = index_file_embeddings(file_record)
+            print(f"🧩 DEBUG: Embedded {count} chunks for File ID {file_record.id}")
+        except Exception as e:
+            print(f"⚠️ Embedding failed for File ID {file_record.id}: {e}")
+
+    def _sweep_if_due(self):
+        """Runs requeue_stale_jobs() at most once per `sweep_interval` across this process's threads."""
+        with self._sweep_lock:
+            now = time.monotonic()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        self.requeue_stale_jobs()
+
+    def requeue_stale_jobs(self) -> int:
+        """
+        Puts jobs that were left 'running' by a killed process back in the
+        queue (or fails them once they ran out of attempts). The updates are
+        conditional on the row still being 'running' and stale, so a job
+        that finishes meanwhile is left alone. Returns the number recovered.
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=self.stale_after)
+        with self.app.app_context():
+            stale = AnalysisJob.query.filter(
+                AnalysisJob.status == AnalysisJob.STATUS_RUNNING,
+                AnalysisJob.started_at < cutoff
+            )
+            failed = stale.filter(AnalysisJob.attempts >= self.max_attempts).update({
+                "status": AnalysisJob.STATUS_FAILED,
+                "error": "Worker stopped before the job finished",
+                "finished_at": now
+            }, synchronize_session=False)
+            requeued = stale.filter(AnalysisJob.attempts < self.max_attempts).update(
+                {"status": AnalysisJob.STATUS_QUEUED}, synchronize_session=False
+            )
+            db.session.commit()
+            if failed or requeued:
+                logger.warning(f"Recovered {failed + requeued} stale analysis job(s)")
+                if requeued:
+                    self._wakeup.set()
+            return failed + requeued
+
+
+# --------------------------------------------------------
+## 🏭 Factory Helpers
+# --------------------------------------------------------
+
+def init_job_queue(app) -> AnalysisJobQueue:
+    """Creates the per-process analysis queue and starts its workers."""
+    queue = AnalysisJobQueue(
+        app,
+        max_workers=app.config.get("ANALYSIS_WORKERS", 2),
+        poll_interval=app.config.get("ANALYSIS_POLL_INTERVAL", 5.0),
+        stale_after=app.config.get("ANALYSIS_JOB_STALE_SECONDS")
+                    or 4 * app.config.get("AI_STAGE_TIMEOUT", 90),
+        max_attempts=app.config.get("ANALYSIS_JOB_MAX_ATTEMPTS", 2)
+    )
+    queue.start()
+    app.extensions["analysis_queue"] = queue
+    return queue
+
+
+def get_job_queue() -> AnalysisJobQueue:
+    """Returns the analysis queue of the current app."""
+    queue = current_app.extensions.get("analysis_queue")
+    if queue is None:
+        raise RuntimeError("Analysis job queue is not initialized; call init_job_queue(app)")
+    return queue
@@ -1,5 +1,6 @@
 # app/models.py
 from app import db
+from app.utils.compressed_text import CompressedText
 from datetime import datetime, timezone
 from typing import Optional, Any
 
@@ -29,6 +30,11 @@ class User(db.Model):
 
     # 4. Profile
     profile_picture = db.Column(db.String(500), nullable=True)
+    # Resized copies of the profile picture (see FileDerivative)
+    profile_derivatives = db.relationship(
+        "FileDerivative", primaryjoin="foreign(FileDerivative.source_url) == User.profile_picture",
+        viewonly=True, lazy="select"
+    )
 
     def __init__(self, email, password, full_name, dob=None, role="user"):
         self.email = email
@@ -50,7 +56,8 @@ class User(db.Model):
             "full_name": self.full_name,
             "dob": self.dob.isoformat() if self.dob else None,
             "role": self.role,
-            "profile_picture": self.profile_picture
+            "profile_picture": self.profile_picture,
+            "profile_thumbnails": {d.kind: d.url for d in self.profile_derivatives} if self.profile_picture else {}
         }
 
 
@@ -58,19 +65,38 @@ class User(db.Model):
 ## 📜 Activity Log Model
 # --------------------------------------------------------
 class ActivityLog(db.Model):
-    """Logs user actions and system events."""
+    """
+    Logs user actions and system events. Rows older than the retention
+    window are moved to monthly archive tables (see activity_archive).
+    """
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # History: one user's events of some types, newest first
+        db.Index("ix_activity_user_event_time", "user_id", "event_type", "timestamp"),
+        # Retention scans by age
+        db.Index("ix_activity_timestamp", "timestamp"),
+    )
+
+    EVENT_FILE_UPLOAD = "file_upload"
+    EVENT_FILE_DELETE = "file_delete"
+    EVENT_FILE_ANALYZE = "file_analyze"
+    EVENT_AUTH = "auth"
+    EVENT_ACCOUNT = "account"
+    EVENT_ADMIN = "admin"
+    EVENT_OTHER = "other"
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(32), nullable=False, default=EVENT_OTHER)
     action = db.Column(db.String(200), nullable=False)
     route = db.Column(db.String(200), nullable=False)
     # Timestamp defaults to the current time in UTC
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     def __init__(self, user_id: int, action: str, route: str = "/unknown",
-                 timestamp: Optional[datetime] = None):
+                 timestamp: Optional[datetime] = None, event_type: str = EVENT_OTHER):
         self.user_id = user_id
+        self.event_type = event_type
         self.action = action
         self.route = route
         self.timestamp = timestamp or datetime.now(timezone.utc)
@@ -80,18 +106,110 @@ class ActivityLog(db.Model):
         return {
             "id": self.id,
             "user_id": self.user_id,
+            "event_type": self.event_type,
             "action": self.action,
             "route": self.route,
             "timestamp": self.timestamp.isoformat()
         }
 
 
+class ActivityDailyCount(db.Model):
+    """Per-day event counts, rolled up from activity rows as they are archived."""
+    __tablename__ = "activity_daily_counts"
+    __table_args__ = (db.UniqueConstraint("day", "user_id", "event_type", name="uq_activity_daily"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, day, user_id: int, event_type: str, count: int = 0):
+        self.day = day
+        self.user_id = user_id
+        self.event_type = event_type
+        self.count = count
+
+
+# --------------------------------------------------------
+## 🧠 File Analysis Model
+# --------------------------------------------------------
+class FileAnalysis(db.Model):
+    """
+    One AI analysis of a file: its tags and text, which model and prompt set
+    produced them, and a version number per file. Re-analysis adds a row;
+    UploadedFile.analysis_id points at the current one. The text columns are
+    zstd-compressed past ANALYSIS_COMPRESS_MIN_BYTES (see CompressedText).
+    """
+    __tablename__ = "file_analyses"
+    __table_args__ = (db.UniqueConstraint("file_id", "version", name="uq_file_analysis_version"),)
+
+    SUMMARY_PREVIEW_CHARS = 200
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    model = db.Column(db.String(100), nullable=False)
+    # Fingerprint of the prompts the pipeline ran with (see analysis_store.PROMPT_VERSION)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    ai_tags = db.Column(db.String(500), nullable=True)
+    # Loaded together on first access, so version listings never read them
+    summary = db.deferred(db.Column(CompressedText, nullable=True), group="text")
+    ocr_text = db.deferred(db.Column(CompressedText, nullable=True), group="text")
+    vision_analysis = db.deferred(db.Column(CompressedText, nullable=True), group="text")
+    # Uncompressed start of the summary, for list cards and the ILIKE search fallback
+    summary_preview = db.Column(db.String(SUMMARY_PREVIEW_CHARS), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, file_id: int, version: int, model: str, prompt_version: str,
+                 ai_tags: Optional[str] = None, summary: Optional[str] = None,
+                 ocr_text: Optional[str] = None, vision_analysis: Optional[str] = None):
+        self.file_id = file_id
+        self.version = version
+        self.model = model
+        self.prompt_version = prompt_version
+        self.ai_tags = ai_tags
+        self.summary = summary
+        self.ocr_text = ocr_text
+        self.vision_analysis = vision_analysis
+        self.summary_preview = summary[:self.SUMMARY_PREVIEW_CHARS] if summary else None
+        self.created_at = datetime.now(timezone.utc)
+
+    def to_dict(self, include_text: bool = False) -> dict[str, Any]:
+        data = {
+            "id": self.id,
+            "file_id": self.file_id,
+            "version": self.version,
+            "model": self.model,
+            "prompt_version": self.prompt_version,
+            "ai_tags": self.ai_tags,
+            "summary_preview": self.summary_preview,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+        if include_text:
+            data.update(summary=self.summary, ocr_text=self.ocr_text, vision_analysis=self.vision_analysis)
+        return data
+
+
 # --------------------------------------------------------
 ## 📁 Uploaded File Model
 # --------------------------------------------------------
 class UploadedFile(db.Model):
-    """Stores metadata for files uploaded by users."""
+    """
+    Stores metadata for files uploaded by users. The AI text lives in
+    FileAnalysis rows; `summary`, `ocr_text` and `vision_analysis` read the
+    current one (loaded on first access).
+    """
     __tablename__ = "uploaded_files"
+    __table_args__ = (
+        # /files/list: one user's files, newest first (keyset pages)
+        db.Index("ix_uploaded_files_user_uploaded", "user_id", "uploaded_at"),
+    )
+
+    # Columns /files/list returns by default (no multi-KB AI text)
+    LIST_FIELDS = ("id", "user_id", "filename", "url", "file_type", "uploaded_at", "ai_tags",
+                   "is_analyzed", "content_hash", "summary_preview", "thumbnails")
+    TEXT_FIELDS = ("summary", "ocr_text", "vision_analysis")
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, nullable=False)
@@ -101,12 +219,29 @@ class UploadedFile(db.Model):
     file_type = db.Column(db.String(100), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
-    # ✅ AI Fields (You already had these, keep them!)
-    summary = db.Column(db.Text, nullable=True)
-    ocr_text = db.Column(db.Text, nullable=True)
+    # ✅ AI Fields
     ai_tags = db.Column(db.String(500), nullable=True) # Store as comma-separated string
-    vision_analysis = db.Column(db.Text, nullable=True)
     is_analyzed = db.Column(db.Boolean, default=False)
+    # Current FileAnalysis (older versions stay in file_analyses)
+    analysis_id = db.Column(db.Integer, nullable=True)
+    analysis = db.relationship(
+        "FileAnalysis", primaryjoin="foreign(UploadedFile.analysis_id) == FileAnalysis.id", lazy="select"
+    )
+    # Summary preview of the current analysis, for list cards
+    summary_preview = db.column_property(
+        db.select(FileAnalysis.summary_preview).where(FileAnalysis.id == analysis_id).scalar_subquery(),
+        deferred=True
+    )
+
+    # SHA-256 of the file content; identical uploads share one StoredBlob
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+
+    # Thumbnails / first-page previews; keyed by URL, so deduplicated uploads share them.
+    # selectin: a page of files loads all its derivatives in one extra query
+    derivatives = db.relationship(
+        "FileDerivative", primaryjoin="foreign(FileDerivative.source_url) == UploadedFile.url",
+        viewonly=True, lazy="selectin"
+    )
 
     def __init__(self, user_id: int, filename: str, url: str, file_type: str):
         self.user_id = user_id
@@ -114,6 +249,18 @@ class UploadedFile(db.Model):
         self.url = url
         self.file_type = file_type
 
+    @property
+    def summary(self) -> Optional[str]:
+        return self.analysis.summary if self.analysis else None
+
+    @property
+    def ocr_text(self) -> Optional[str]:
+        return self.analysis.ocr_text if self.analysis else None
+
+    @property
+    def vision_analysis(self) -> Optional[str]:
+        return self.analysis.vision_analysis if self.analysis else None
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "id": self.id,
@@ -128,5 +275,241 @@ class UploadedFile(db.Model):
             "ocr_text": self.ocr_text,
             "ai_tags": self.ai_tags,
             "vision_analysis": self.vision_analysis,
-            "is_analyzed": self.is_analyzed
-        }
\ No newline at end of file
+            "is_analyzed": self.is_analyzed,
+            "analysis_version": self.analysis.version if self.analysis else None,
+            "content_hash": self.content_hash,
+            "thumbnails": {d.kind: d.url for d in self.derivatives}
+        }
+
+    def to_list_dict(self, fields=LIST_FIELDS) -> dict[str, Any]:
+        """Only the requested fields, so unrequested deferred columns stay unloaded."""
+        data: dict[str, Any] = {}
+        for field in fields:
+            if field == "uploaded_at":
+                data[field] = self.uploaded_at.isoformat()
+            elif field == "thumbnails":
+                data[field] = {d.kind: d.url for d in self.derivatives}
+            else:
+                data[field] = getattr(self, field)
+        return data
+
+# --------------------------------------------------------
+## 🧱 Stored Blob Model
+# --------------------------------------------------------
+class StoredBlob(db.Model):
+    """
+    One physical object in the storage backend, shared by every UploadedFile
+    with the same content hash. Deleted from storage when ref_count hits 0.
+    """
+    __tablename__ = "stored_blobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    url = db.Column(db.String(1000), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, content_hash: str, url: str, size: int = 0):
+        self.content_hash = content_hash
+        self.url = url
+        self.size = size
+        self.ref_count = 1
+        self.created_at = datetime.now(timezone.utc)
+
+
+# --------------------------------------------------------
+## 🖼️ File Derivative Model (thumbnails)
+# --------------------------------------------------------
+class FileDerivative(db.Model):
+    """
+    A small rendition of a stored object (uploaded file or profile picture):
+    a resized image, or for PDFs a render of the first page. Stored through
+    the active storage driver; `kind` is e.g. "thumb_256".
+    """
+    __tablename__ = "file_derivatives"
+    __table_args__ = (db.UniqueConstraint("source_url", "kind", name="uq_derivative_source_kind"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    source_url = db.Column(db.String(1000), nullable=False, index=True)
+    kind = db.Column(db.String(32), nullable=False)
+    url = db.Column(db.String(1000), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, source_url: str, kind: str, url: str, width: int, height: int, size: int = 0):
+        self.source_url = source_url
+        self.kind = kind
+        self.url = url
+        self.width = width
+        self.height = height
+        self.size = size
+        self.created_at = datetime.now(timezone.utc)
+
+
+# --------------------------------------------------------
+## 🧩 File Chunk Model (semantic search)
+# --------------------------------------------------------
+class FileChunk(db.Model):
+    """
+    One embedded passage of a file's AI text (OCR, summary or vision
+    analysis). Embeddings are stored as raw float32 bytes.
+    """
+    __tablename__ = "file_chunks"
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    # Which text the chunk came from: 'ocr_text', 'summary' or 'vision_analysis'
+    source = db.Column(db.String(32), nullable=False)
+    chunk_index = db.Column(db.Integer, nullable=False, default=0)
+    text = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=False)
+    # Vectors from different models are not comparable; searches filter on this
+    embedding_model = db.Column(db.String(100), nullable=False)
+
+    def __init__(self, file_id: int, user_id: int, source: str, chunk_index: int,
+                 text: str, embedding: bytes, embedding_model: str):
+        self.file_id = file_id
+        self.user_id = user_id
+        self.source = source
+        self.chunk_index = chunk_index
+        self.text = text
+        self.embedding = embedding
+        self.embedding_model = embedding_model
+
+
+class VectorIndexVersion(db.Model):
+    """
+    Per-user counter bumped whenever the user's chunks change. Chunk ids can
+    be reused after a delete (SQLite rowids), so cached vector matrices are
+    keyed by this version as well as by row count and max id.
+    """
+    __tablename__ = "vector_index_versions"
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, user_id: int, version: int = 0):
+        self.user_id = user_id
+        self.version = version
+
+
+# --------------------------------------------------------
+## 💬 Chat Session Models
+# --------------------------------------------------------
+class ChatSession(db.Model):
+    """
+    Server-side conversation about one file. Only the most recent turns are
+    re-sent to the model; older ones are folded into `history_summary`.
+    """
+    __tablename__ = "chat_sessions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    # Running summary of turns that fell out of the window
+    history_summary = db.Column(db.Text, nullable=True)
+    # Number of leading turns already folded into history_summary
+    summarized_turns = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, file_id: int, user_id: int):
+        self.file_id = file_id
+        self.user_id = user_id
+        self.summarized_turns = 0
+        self.created_at = self.updated_at = datetime.now(timezone.utc)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "file_id": self.file_id,
+            "history_summary": self.history_summary,
+            "summarized_turns": self.summarized_turns,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class ChatTurn(db.Model):
+    """One message in a ChatSession ('user' question or 'model' answer)."""
+    __tablename__ = "chat_turns"
+
+    ROLE_USER = "user"
+    ROLE_MODEL = "model"
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    role = db.Column(db.String(10), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, session_id: int, role: str, text: str):
+        self.session_id = session_id
+        self.role = role
+        self.text = text
+        self.created_at = datetime.now(timezone.utc)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "role": self.role,
+            "text": self.text,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# --------------------------------------------------------
+## ⚙️ Analysis Job Model
+# --------------------------------------------------------
+class AnalysisJob(db.Model):
+    """Persisted background job for `/files/<id>/analyze`."""
+    __tablename__ = "analysis_jobs"
+
+    # Job lifecycle: queued -> running -> done | failed
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # False = bypass the AI result cache (forced re-analysis)
+    use_cache = db.Column(db.Boolean, nullable=False, default=True)
+    error = db.Column(db.Text, nullable=True)
+    # Seconds spent per AI stage, e.g. {"vision": 4.2, "ocr": 3.1, "total": 4.9}
+    stage_timings = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, file_id: int, user_id: int, use_cache: bool = True):
+        self.file_id = file_id
+        self.user_id = user_id
+        self.use_cache = use_cache
+        self.status = self.STATUS_QUEUED
+        self.attempts = 0
+        self.created_at = datetime.now(timezone.utc)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "file_id": self.file_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "stage_timings": self.stage_timings,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
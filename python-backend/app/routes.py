@@ -3,6 +3,7 @@ from flask import Blueprint, request
 from app import db
 from app.auth.decorators import require_auth
 from app.auth.role_required import require_role
+from app.auth.user_cache import invalidate_user
 from app.utils.activity_logger import log_activity
 
 routes = Blueprint("routes", __name__)
@@ -99,12 +100,25 @@ def delete_user(user_id, user_id_param):
 
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id_param)
 
     log_activity(user_id, f"Deleted user {user_id_param}", request.path)
 
     return {"message": "User deleted", "id": user_id_param}
 
 
+@routes.route("/admin/activity-log/stats")
+@require_role("admin")
+def activity_log_stats(user_id):
+    """
+    Admin: Queue depth, write and drop counters of this worker's activity log writer
+    """
+    from flask import current_app
+
+    writer = current_app.extensions.get("activity_writer")
+    return {"activity_log": writer.stats() if writer else None}
+
+
 @routes.route("/users/search")
 @require_auth
 def search_users(user_id):
@@ -1,29 +1,34 @@
 # app/routes_files.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app import db
 from app.auth.decorators import require_auth
 from app.utils.activity_logger import log_activity
+from app.utils.activity_archive import history_page
 from app.storage.storage_loader import get_storage
-from app.models import UploadedFile, ActivityLog, User
-from sqlalchemy import or_
+from app.storage.blob_store import store_upload, release_blob
+from app.storage.derivatives import create_derivatives, delete_derivatives, missing_sizes, can_render
+from app.storage.downloader import fetch_uploaded_file, DownloadError
+from app.models import UploadedFile, FileAnalysis, ActivityLog, User, AnalysisJob, ChatSession, ChatTurn
+from app.jobs import get_job_queue
+from app.ai.chat_stream import get_chat_model, stream_answer, sse_event
+from app.ai.analysis_store import copy_analysis, delete_analyses, list_analyses
+from app.ai.chat_sessions import get_chat_context, history_text, record_exchange, delete_session
+from app.search import get_search_index, semantic_search, copy_file_embeddings, remove_file_embeddings, \
+    retrieve_file_chunks
+from app.utils.pagination import encode_cursor, decode_cursor, parse_limit
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only, noload, selectinload
 import mimetypes
-import requests
-import os
 import traceback
 
-# AI Utilities
-from app.ai.ai_utils import guess_file_type, is_image, extract_text_from_docx
-from app.ai.classify_local import classify_image
-from app.ai.ocr_local import extract_text
-from app.ai.summarize_api import summarize_text
+routes_files = Blueprint("routes_files", __name__)
 
-# Try importing vision API functions (Safe import)
-try:
-    from app.ai.vision_api import analyze_file_bytes, analyze_via_upload
-except ImportError:
-    pass
+# Keep proxies (nginx) from buffering the token stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-routes_files = Blueprint("routes_files", __name__)
+# Full to_dict() for many files: current analyses (with their text) in one extra query
+FULL_RECORD = (selectinload(UploadedFile.analysis).undefer_group("text"),)
 
 
 # ------------------------------------------------------------
@@ -37,17 +42,40 @@ def upload_file(user_id: int):
     file_obj = request.files["file"]
     filename = file_obj.filename or "unnamed_file"
     
-    storage = get_storage()
-    url = storage.upload_file(file_obj, folder="files") or ""
+    url, content_hash, deduplicated = store_upload(file_obj, folder="files")
+    if not url: return jsonify({"error": "Storage upload failed"}), 500
     
     guessed_type, _ = mimetypes.guess_type(filename)
     file_type = guessed_type or "unknown"
     
     record = UploadedFile(user_id=user_id, filename=filename, url=url, file_type=file_type)
+    record.content_hash = content_hash
+    if deduplicated:
+        # Same bytes were analyzed for this user before: reuse the results instead of
+        # re-running AI (never another user's, their analysis is theirs)
+        analyzed = UploadedFile.query.filter_by(content_hash=content_hash, is_analyzed=True,
+                                                user_id=user_id).first()
+        if analyzed:
+            record.ai_tags = analyzed.ai_tags
+            record.is_analyzed = True
     db.session.add(record)
+    db.session.flush()
+    if record.is_analyzed:
+        copy_analysis(analyzed, record)
+    get_search_index().index_file(record)
+    if record.is_analyzed:
+        copy_file_embeddings(analyzed.id, record)
     db.session.commit()
+
+    if current_app.config.get("DERIVATIVES_ON_UPLOAD", True):
+        # Thumbnails from the spooled upload; deduplicated content already has them
+        try:
+            create_derivatives(file_obj.stream, url, file_type, filename)
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Thumbnail generation failed for {filename}: {e}")
     
-    log_activity(user_id, f"Uploaded file {filename}", request.path)
+    log_activity(user_id, f"Uploaded file {filename}", request.path, ActivityLog.EVENT_FILE_UPLOAD)
     return jsonify({"message": "File uploaded", "file": record.to_dict()}), 201
 
 
@@ -57,8 +85,90 @@ def upload_file(user_id: int):
 @routes_files.route("/list", methods=["GET"])
 @require_auth
 def list_files(user_id: int):
-    files = UploadedFile.query.filter_by(user_id=user_id).all()
-    return jsonify({"count": len(files), "files": [f.to_dict() for f in files]})
+    """
+    The user's files, newest first, one page at a time. Pass the returned
+    `next_cursor` as ?cursor= for the next page. ?fields=a,b,... picks the
+    fields (default UploadedFile.LIST_FIELDS; summary/ocr_text/vision_analysis
+    on request). Full records come from GET /files/<id>.
+    """
+    allowed = set(UploadedFile.LIST_FIELDS) | set(UploadedFile.TEXT_FIELDS)
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] \
+        or list(UploadedFile.LIST_FIELDS)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown: return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    limit = parse_limit(request.args.get("limit"), default=50, maximum=200)
+    try:
+        after = decode_cursor(request.args.get("cursor"))
+        if after:
+            after = (datetime.fromisoformat(after[0]), int(after[1]))
+    except (ValueError, TypeError, IndexError):
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    # Load only the listed columns (+ the keyset and the join keys of thumbnails / AI text)
+    text_fields = [f for f in fields if f in UploadedFile.TEXT_FIELDS]
+    columns = {"id", "uploaded_at"} | {f for f in fields if f not in text_fields and f != "thumbnails"}
+    if "thumbnails" in fields:
+        columns.add("url")
+    if text_fields:
+        columns.add("analysis_id")
+    options = [load_only(*(getattr(UploadedFile, c) for c in columns), raiseload=True)]
+    if "thumbnails" not in fields:
+        options.append(noload(UploadedFile.derivatives))
+    if text_fields:
+        options.append(selectinload(UploadedFile.analysis).undefer_group("text"))
+
+    query = UploadedFile.query.filter(UploadedFile.user_id == user_id).options(*options)
+    if after:
+        query = query.filter(or_(
+            UploadedFile.uploaded_at < after[0],
+            and_(UploadedFile.uploaded_at == after[0], UploadedFile.id < after[1])
+        ))
+    files = query.order_by(UploadedFile.uploaded_at.desc(), UploadedFile.id.desc()).limit(limit).all()
+    last = [files[-1].uploaded_at.isoformat(), files[-1].id] if len(files) == limit else None
+
+    return jsonify({
+        "count": len(files),
+        "files": [f.to_list_dict(fields) for f in files],
+        "next_cursor": encode_cursor(last) if last else None
+    })
+
+
+@routes_files.route("/<int:file_id>", methods=["GET"])
+@require_auth
+def get_file(user_id: int, file_id: int):
+    """Full record of one file, including its AI text."""
+    file_record = UploadedFile.query.options(*FULL_RECORD).get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"file": file_record.to_dict()})
+
+
+@routes_files.route("/<int:file_id>/analyses", methods=["GET"])
+@require_auth
+def list_file_analyses(user_id: int, file_id: int):
+    """Every analysis of a file, newest first: version, model, prompt set and summary preview."""
+    file_record = UploadedFile.query.get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
+
+    analyses = list_analyses(file_id)
+    current = next((a.version for a in analyses if a.id == file_record.analysis_id), None)
+    return jsonify({"file_id": file_id, "current_version": current, "count": len(analyses),
+                    "analyses": [a.to_dict() for a in analyses]})
+
+
+@routes_files.route("/<int:file_id>/analyses/<int:version>", methods=["GET"])
+@require_auth
+def get_file_analysis(user_id: int, file_id: int, version: int):
+    """One analysis version of a file, with its full text."""
+    file_record = UploadedFile.query.get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
+
+    analysis = FileAnalysis.query.filter_by(file_id=file_id, version=version).first()
+    if not analysis: return jsonify({"error": "Analysis version not found"}), 404
+    return jsonify({"analysis": analysis.to_dict(include_text=True)})
 
 
 # ------------------------------------------------------------
@@ -71,12 +181,19 @@ def delete_file(user_id: int, file_id: int):
     if not file_record: return jsonify({"error": "File not found"}), 404
     if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
 
-    storage = get_storage()
-    storage.delete_file(file_record.url)
-    
+    url, content_hash = file_record.url, file_record.content_hash
     db.session.delete(file_record)
+    delete_analyses(file_id)
+    get_search_index().remove_file(file_id)
+    remove_file_embeddings(file_id)
+    for session in ChatSession.query.filter_by(file_id=file_id).all():
+        delete_session(session)
     db.session.commit()
-    log_activity(user_id, f"Deleted file {file_record.filename}", request.path)
+    if release_blob(url, content_hash):
+        # Last file using this object: its thumbnails go too
+        delete_derivatives(url)
+        db.session.commit()
+    log_activity(user_id, f"Deleted file {file_record.filename}", request.path, ActivityLog.EVENT_FILE_DELETE)
     
     return jsonify({"message": "File deleted", "deleted_file_id": file_id})
 
@@ -87,10 +204,23 @@ def delete_file(user_id: int, file_id: int):
 @routes_files.route("/history", methods=["GET"])
 @require_auth
 def file_history(user_id: int):
-    history = ActivityLog.query.filter(ActivityLog.user_id == user_id)\
-        .filter(or_(ActivityLog.action.ilike("Uploaded%"), ActivityLog.action.ilike("Deleted%")))\
-        .order_by(ActivityLog.timestamp.desc()).all()
-    return jsonify({"count": len(history), "history": [h.to_dict() for h in history]})
+    """
+    Upload/delete events, newest first. Pass the returned `next_cursor` as
+    ?cursor= to fetch the next page.
+    """
+    limit = parse_limit(request.args.get("limit"), default=50, maximum=200)
+    try:
+        history, last = history_page(
+            user_id, [ActivityLog.EVENT_FILE_UPLOAD, ActivityLog.EVENT_FILE_DELETE],
+            limit, decode_cursor(request.args.get("cursor"))
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify({
+        "count": len(history),
+        "history": [h.to_dict() for h in history],
+        "next_cursor": encode_cursor(last) if last else None
+    })
 
 
 # ------------------------------------------------------------
@@ -121,6 +251,7 @@ def upload_profile_picture(user_id: int):
             print(f"🗑️ DEBUG: Deleting old image: {user.profile_picture}")
             try:
                 storage.delete_file(user.profile_picture)
+                delete_derivatives(user.profile_picture)
             except Exception as e:
                 print(f"⚠️ DEBUG: Failed to delete old image (ignoring): {e}")
 
@@ -138,7 +269,17 @@ def upload_profile_picture(user_id: int):
         db.session.commit()
         print("💾 DEBUG: Database updated.")
 
-        return jsonify({"message": "Profile picture updated", "url": url})
+        thumbnails = {}
+        try:
+            derivatives = create_derivatives(image.stream, url, image.mimetype or "image", image.filename or "",
+                                             sizes=current_app.config.get("PROFILE_DERIVATIVE_SIZES", "64,256"),
+                                             folder="profile_pics")
+            thumbnails = {d.kind: d.url for d in derivatives}
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ DEBUG: Profile thumbnails failed (ignoring): {e}")
+
+        return jsonify({"message": "Profile picture updated", "url": url, "thumbnails": thumbnails})
 
     except Exception as e:
         import traceback
@@ -147,162 +288,238 @@ def upload_profile_picture(user_id: int):
         return jsonify({"error": f"Upload crashed: {str(e)}"}), 500
 
 
+# ------------------------------------------------------------
+## 5b. 🖼️ THUMBNAILS
+# ------------------------------------------------------------
+@routes_files.route("/<int:file_id>/thumbnails", methods=["GET"])
+@require_auth
+def file_thumbnails(user_id: int, file_id: int):
+    """
+    Returns the file's thumbnail URLs, generating any missing sizes on the
+    first request (files uploaded before derivatives existed, or with
+    DERIVATIVES_ON_UPLOAD off).
+    """
+    file_record = UploadedFile.query.get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
+
+    derivatives = file_record.derivatives
+    if not missing_sizes(derivatives) or not can_render(file_record.file_type, file_record.filename):
+        return jsonify({"file_id": file_id, "thumbnails": {d.kind: d.url for d in derivatives}})
+
+    try:
+        local_path = fetch_uploaded_file(file_record)
+        derivatives = create_derivatives(local_path, file_record.url, file_record.file_type, file_record.filename)
+    except DownloadError as e:
+        return jsonify({"error": f"Could not fetch file: {e}"}), 502
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        return jsonify({"error": f"Thumbnail generation failed: {str(e)}"}), 500
+
+    return jsonify({"file_id": file_id, "thumbnails": {d.kind: d.url for d in derivatives}})
+
+
 # ------------------------------------------------------------
 ## 6. 🔎 SEARCH
 # ------------------------------------------------------------
 @routes_files.route("/search", methods=["GET"])
 @require_auth
 def search_files(user_id: int):
+    """
+    Ranked full-text search over filename, tags, summary and extracted text.
+    Pass the returned `next_cursor` as ?cursor= to fetch the next page.
+    """
     query = request.args.get("q", "").strip()
     if not query: return jsonify({"error": "Missing query parameter 'q'"}), 400
-    
-    results = UploadedFile.query.filter(
-        UploadedFile.user_id == user_id,
-        or_(
-            UploadedFile.filename.ilike(f"%{query}%"),
-            UploadedFile.ocr_text.ilike(f"%{query}%"),
-            UploadedFile.summary.ilike(f"%{query}%"),
-            UploadedFile.ai_tags.ilike(f"%{query}%")
-        )
-    ).all()
-    return jsonify({"count": len(results), "files": [f.to_dict() for f in results]})
+
+    limit = parse_limit(request.args.get("limit"))
+    try:
+        after = decode_cursor(request.args.get("cursor"))
+        if after:
+            after = [float(after[0]), int(after[1])]  # (rank, file id) of the last hit
+    except (ValueError, TypeError, IndexError):
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    hits, last = get_search_index().search(user_id, query, limit, after)
+
+    files_by_id = {}
+    if hits:
+        rows = UploadedFile.query.options(*FULL_RECORD)\
+            .filter(UploadedFile.id.in_([h.file_id for h in hits])).all()
+        files_by_id = {f.id: f for f in rows}
+
+    results = []
+    for hit in hits:
+        record = files_by_id.get(hit.file_id)
+        if record is None: continue
+        item = record.to_dict()
+        item["rank"] = hit.rank
+        item["snippet"] = hit.snippet
+        results.append(item)
+
+    return jsonify({
+        "count": len(results),
+        "files": results,
+        "next_cursor": encode_cursor(last) if last else None
+    })
+
+
+# ------------------------------------------------------------
+## 6b. 🧠 SEMANTIC SEARCH
+# ------------------------------------------------------------
+@routes_files.route("/semantic-search", methods=["GET", "POST"])
+@require_auth
+def semantic_search_files(user_id: int):
+    """
+    Finds files by meaning rather than exact words, using embeddings of their
+    OCR text, summary and vision analysis.
+
+    GET  ?q=<text>&k=<n>                   -> one result list
+    POST {"queries": ["...", ...], "k": n} -> one result list per query,
+                                              all queries embedded in one batch
+    """
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        queries = data.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({"error": "'queries' must be a list of non-empty strings"}), 400
+        if len(queries) > 20: return jsonify({"error": "At most 20 queries per request"}), 400
+        raw_k = data.get("k")
+    else:
+        query = request.args.get("q", "").strip()
+        if not query: return jsonify({"error": "Missing query parameter 'q'"}), 400
+        queries = [query]
+        raw_k = request.args.get("k")
+
+    k = parse_limit(raw_k, default=10, maximum=50)
+    try:
+        per_query = semantic_search(user_id, [q.strip() for q in queries], k)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": f"Semantic search failed: {str(e)}"}), 502
+
+    file_ids = {hit["file_id"] for hits in per_query for hit in hits}
+    files_by_id = {}
+    if file_ids:
+        rows = UploadedFile.query.options(*FULL_RECORD)\
+            .filter(UploadedFile.id.in_(file_ids), UploadedFile.user_id == user_id).all()
+        files_by_id = {f.id: f for f in rows}
+
+    results = []
+    for query, hits in zip(queries, per_query):
+        files = []
+        for hit in hits:
+            record = files_by_id.get(hit["file_id"])
+            if record is None: continue
+            item = record.to_dict()
+            item["score"] = hit["score"]
+            item["matched_chunk"] = hit["chunk"]
+            files.append(item)
+        results.append({"query": query, "count": len(files), "files": files})
+
+    if request.method == "GET":
+        return jsonify(results[0])
+    return jsonify({"results": results})
 
 
 # ------------------------------------------------------------
-## 7. 🤖 SMART ANALYZE ROUTE
+## 7. 🤖 SMART ANALYZE ROUTE (Background Job)
 # ------------------------------------------------------------
 @routes_files.route("/<int:file_id>/analyze", methods=["POST"])
 @require_auth
 def analyze_existing_file(user_id: int, file_id: int):
-    print(f"\n🔍 DEBUG: Starting Analysis for File ID {file_id}")
+    file_record = UploadedFile.query.get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
 
-    # 1. Check Imports inside the function (Safe Mode)
-    try:
-        import requests
-        import traceback
-        from app.ai.vision_api import analyze_file_bytes, analyze_via_upload
-        from app.ai.classify_local import classify_image
-        from app.ai.ocr_local import extract_text
-        from app.ai.summarize_api import summarize_text
-        print("✅ DEBUG: All AI modules imported successfully.")
-    except ImportError as e:
-        print(f"❌ CRITICAL IMPORT ERROR: {e}")
-        return jsonify({"error": f"Server Missing Library: {e}"}), 500
-
-    # 2. Get File Record
+    # ?refresh=1 forces fresh Gemini calls instead of cached results
+    use_cache = request.args.get("refresh", "").lower() not in ["1", "true"]
+    job = get_job_queue().enqueue(file_record, user_id, use_cache=use_cache)
+    print(f"📥 DEBUG: Analysis job {job.id} is '{job.status}' for File ID {file_id}")
+
+    if job.is_active:
+        return jsonify({"message": "Analysis queued", "job": job.to_dict()}), 202
+    if job.status == AnalysisJob.STATUS_FAILED:
+        return jsonify({"error": f"Analysis Crashed: {job.error}", "job": job.to_dict()}), 500
+    return jsonify({"message": "Analysis complete", "job": job.to_dict(), "file": file_record.to_dict()})
+
+
+@routes_files.route("/<int:file_id>/analyze/status", methods=["GET"])
+@require_auth
+def analyze_status(user_id: int, file_id: int):
     file_record = UploadedFile.query.get(file_id)
     if not file_record: return jsonify({"error": "File not found"}), 404
     if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
 
-    temp_path = None
-    file_bytes = None
-    
+    job = AnalysisJob.query.filter_by(file_id=file_id).order_by(AnalysisJob.id.desc()).first()
+    if not job: return jsonify({"error": "No analysis job for this file"}), 404
+
+    payload = {"job": job.to_dict()}
+    if job.status == AnalysisJob.STATUS_DONE:
+        payload["file"] = file_record.to_dict()
+    return jsonify(payload)
+
+
+def _chat_excerpts(file_record, question: str) -> str:
+    """
+    Picks the chunks of the file's extracted text that best match the
+    question, so the prompt stays small and text past any cutoff is still
+    answerable. Falls back to the leading text if retrieval fails.
+    """
+    # The summary goes into the prompt whole; skip columns that just repeat it
+    sources = [s for s in ("ocr_text", "vision_analysis")
+               if getattr(file_record, s) and getattr(file_record, s) != file_record.summary]
+    if not sources:
+        return ""
     try:
-        # 3. Download File
-        print(f"⬇️ DEBUG: Downloading from {file_record.url[:30]}...")
-        
-        if file_record.url.startswith("http"):
-            # Fake Headers to bypass Cloudinary 401
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-            response = requests.get(file_record.url, headers=headers)
-            
-            if response.status_code != 200: 
-                print(f"❌ DOWNLOAD FAILED: Status {response.status_code}")
-                return jsonify({"error": "Failed to download file"}), 500
-            file_bytes = response.content
-            
-            import tempfile
-            # Force correct extension for PDF/DOCX
-            ext = os.path.splitext(file_record.filename)[1].lower()
-            suffix = ext if ext else ".tmp"
-            if file_record.filename.lower().endswith(".pdf"): suffix = ".pdf"
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(file_bytes)
-                temp_path = tmp.name
-            print(f"✅ DEBUG: Downloaded to temp file: {temp_path}")
-        
-        elif file_record.url.startswith("file://"):
-            local_path = file_record.url.replace("file://", "")
-            temp_path = local_path
-            with open(local_path, "rb") as f: file_bytes = f.read()
-            print("✅ DEBUG: Local file read.")
-
-        # 4. AI Logic
-        print("🧠 DEBUG: Entering AI Logic Switch...")
-
-        # SCENARIO: PDF
-        if file_record.file_type == "application/pdf" or file_record.filename.lower().endswith(".pdf"):
-            print("👉 DEBUG: Processing as PDF")
-            file_record.ai_tags = "PDF Document"
-            if temp_path:
-                file_record.vision_analysis = analyze_via_upload(temp_path, "application/pdf")
-                file_record.summary = file_record.vision_analysis
-                print("✅ DEBUG: PDF Analysis returned.")
-
-        # SCENARIO: WORD DOCX
-        elif file_record.filename.lower().endswith(".docx"):
-             print("👉 DEBUG: Processing as DOCX")
-             file_record.ai_tags = "Word Document"
-             if temp_path:
-                 doc_text = extract_text_from_docx(temp_path)
-                 if doc_text:
-                     file_record.ocr_text = doc_text[:5000]
-                     print("⏳ DEBUG: Summarizing Word Doc...")
-                     file_record.summary = summarize_text(doc_text[:10000])
-                     print("✅ DEBUG: DOCX Analysis Success")
-                 else:
-                     print("❌ DEBUG: Failed to extract text from DOCX")
-
-        # SCENARIO: TEXT
-        elif file_record.file_type.startswith("text") or file_record.filename.lower().endswith(('.txt', '.md', '.csv', '.py')):
-            print("👉 DEBUG: Processing as TEXT")
-            file_record.ai_tags = "Text File"
-            text = file_bytes.decode("utf-8", errors="ignore")
-            file_record.ocr_text = text[:5000]
-            print("⏳ DEBUG: Summarizing text...")
-            file_record.summary = summarize_text(text[:10000])
-            print("✅ DEBUG: Summary created.")
-
-        # SCENARIO: IMAGE
-        elif is_image(file_record.file_type) or file_record.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.avif')):
-            print("👉 DEBUG: Processing as IMAGE")
-            if temp_path:
-                try:
-                    cls = classify_image(temp_path)
-                    file_record.ai_tags = cls.get("label", "")
-                    file_record.ocr_text = extract_text(temp_path)
-                except Exception as e: print(f"Local AI Error: {e}")
-            
-            if file_bytes:
-                # Get vision analysis
-                vision_text = analyze_file_bytes(file_bytes, file_record.file_type)
-                file_record.vision_analysis = vision_text
-                
-                # ✨ FIX: For images, use the vision text as the summary!
-                # (Or summarize it if it's too long)
-                if not file_record.summary:
-                    file_record.summary = summarize_text(vision_text) if len(vision_text) > 500 else vision_text
-
-        # 5. Save
-        print("💾 DEBUG: Saving to Database...")
-        file_record.is_analyzed = True
-        db.session.commit()
-        print("✅ DEBUG: Commit successful.")
-
+        k = current_app.config.get("CHAT_CONTEXT_CHUNKS", 6)
+        chunks = retrieve_file_chunks(file_record, question, k=k, sources=sources)
+        db.session.commit()  # keeps chunks indexed lazily for older files
+        return "\n\n---\n\n".join(c.text for c in chunks)
     except Exception as e:
-        print("\n❌ CRITICAL ERROR DURING EXECUTION:")
-        traceback.print_exc()
-        return jsonify({"error": f"Analysis Crashed: {str(e)}"}), 500
-        
-    finally:
-        if file_record.url.startswith("http") and temp_path and os.path.exists(temp_path):
-            try: os.remove(temp_path)
-            except: pass
-
-    return jsonify({"message": "Analysis complete", "file": file_record.to_dict()})
+        db.session.rollback()
+        print(f"⚠️ Chunk retrieval failed for File ID {file_record.id}: {e}")
+        return getattr(file_record, sources[0])[:15000]
+
+
+def _chat_reply(model, contents, stream: bool, session: ChatSession = None, question: str = ""):
+    """
+    Answers in one JSON body, or as an SSE token stream when `stream` is set.
+    With a session, the exchange is appended to its history.
+    """
+    def _record(answer: str):
+        if session is not None:
+            record_exchange(session, question, answer, model)
+
+    if stream:
+        return Response(stream_with_context(stream_answer(model, contents, on_done=_record)),
+                        mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    # Quota errors are retried with backoff inside the Gemini client
+    response = model.generate_content(contents)
+    _record(response.text)
+    payload = {"answer": response.text}
+    if session is not None:
+        payload["session_id"] = session.id
+    return jsonify(payload)
+
+
+def _chat_static_reply(answer: str, stream: bool):
+    if stream:
+        body = sse_event("start", {}) + sse_event("done", {"answer": answer})
+        return Response(body, mimetype="text/event-stream", headers=SSE_HEADERS)
+    return jsonify({"answer": answer})
+
+
+def _get_chat_session(user_id: int, file_id: int, session_id):
+    """Returns (session, error_response)."""
+    session = ChatSession.query.get(session_id)
+    if not session or session.file_id != file_id:
+        return None, (jsonify({"error": "Chat session not found"}), 404)
+    if session.user_id != user_id:
+        return None, (jsonify({"error": "Forbidden"}), 403)
+    return session, None
 
 
 # ------------------------------------------------------------
@@ -311,6 +528,11 @@ def analyze_existing_file(user_id: int, file_id: int):
 @routes_files.route("/<int:file_id>/chat", methods=["POST"])
 @require_auth
 def chat_with_file(user_id: int, file_id: int):
+    """
+    Answers a question about one file. Pass "session_id" (from
+    POST /<id>/chat/sessions) to keep the conversation server-side: earlier
+    turns are sent as context and the file context is reused between turns.
+    """
     print(f"💬 DEBUG: Chat request for File {file_id}")
     
     file_record = UploadedFile.query.get(file_id)
@@ -321,89 +543,63 @@ def chat_with_file(user_id: int, file_id: int):
     question = data.get("question")
     if not question: return jsonify({"error": "No question provided"}), 400
 
-    try:
-        # Imports needed for AI and Retry Logic
-        import google.generativeai as genai
-        import os
-        from PIL import Image
-        import io
-        import requests
-        import time
-        from google.api_core.exceptions import ResourceExhausted
-
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        
-        # ⚠️ FIX: Use "gemini-1.5-flash" (2.5 does not exist yet)
-        model = genai.GenerativeModel("gemini-2.5-flash") 
+    session = None
+    if data.get("session_id") is not None:
+        session, error = _get_chat_session(user_id, file_id, data["session_id"])
+        if error: return error
 
-        # === PATH A: IT IS AN IMAGE (Send actual pixels) ===
-        image_extensions = ['.jpg', '.jpeg', '.png', '.webp', '.heic', '.avif']
-        is_image_file = any(file_record.filename.lower().endswith(ext) for ext in image_extensions)
+    # ?stream=1 (or Accept: text/event-stream) sends tokens as Server-Sent Events
+    stream = request.args.get("stream", "").lower() in ["1", "true"] \
+        or "text/event-stream" in request.headers.get("Accept", "")
 
-        if is_image_file:
-            print("📷 DEBUG: Detected Image. Downloading for Vision API...")
-            
-            # 1. Download image to memory (RAM)
-            headers = {"User-Agent": "Mozilla/5.0"}
-            img_response = requests.get(file_record.url, headers=headers)
-            
-            if img_response.status_code == 200:
-                # 2. Convert raw bytes to PIL Image
-                image_data = Image.open(io.BytesIO(img_response.content))
-                
-                # 3. Create a Concise Assistant Persona
-                system_prompt = (
-                    "You are a helpful visual assistant. "
-                    "Answer the user's question based on the image in a concise, conversational way. "
-                    "If the user asks for advice/improvements, give exactly 3 short, actionable bullet points. "
-                    "Do not write long paragraphs or formal reports."
-                )
-                
-                # 4. Send Image + Prompts to Gemini (With Retry Logic)
-                try:
-                    response = model.generate_content([system_prompt, question, image_data])
-                except ResourceExhausted:
-                    print("⏳ 429 Quota Exceeded. Sleeping for 10 seconds...")
-                    time.sleep(10)
-                    # Try one more time
-                    response = model.generate_content([system_prompt, question, image_data])
-                
-                return jsonify({"answer": response.text})
-            else:
-                print(f"❌ Error downloading image: {img_response.status_code}")
-                # Fallback to text context if download fails
-                pass
-
-        # === PATH B: TEXT/DOC/PDF (Use RAG Context) ===
-        # (This runs if it's NOT an image OR if image download failed)
-        
-        context = ""
-        if file_record.ocr_text:
-            context += f"Document Text:\n{file_record.ocr_text[:15000]}\n\n"
-        if file_record.summary:
-            context += f"Summary:\n{file_record.summary}\n\n"
-        
-        if not context:
-            return jsonify({"answer": "I can't see this file yet. Please click 'Analyze' first!"})
-
-        prompt = f"""
-        You are an AI assistant analyzing a file.
-        CONTEXT: {context}
-        USER QUESTION: {question}
-        INSTRUCTIONS: Answer based ONLY on the context. Use Markdown.
-        """
-        
-        # Retry logic for Text Chat as well
-        try:
-            response = model.generate_content(prompt)
-        except ResourceExhausted:
-            print("⏳ 429 Quota Exceeded (Text). Sleeping for 10 seconds...")
-            time.sleep(10)
-            response = model.generate_content(prompt)
+    try:
+        model = get_chat_model()
 
-        return jsonify({"answer": response.text})
+        # Images send the picture itself (falls back to text if it can't be fetched);
+        # everything else sends the summary plus the chunks relevant to this question
+        context = get_chat_context(file_record, session)
+        if context is None:
+            return _chat_static_reply("I can't see this file yet. Please click 'Analyze' first!", stream)
+
+        excerpts = "" if context.is_image else _chat_excerpts(file_record, question)
+        contents = context.contents(question, history=history_text(session), excerpts=excerpts)
+        return _chat_reply(model, contents, stream, session=session, question=question)
 
     except Exception as e:
         print(f"❌ CHAT ERROR: {e}")
         traceback.print_exc()
-        return jsonify({"error": f"AI Chat failed: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"AI Chat failed: {str(e)}"}), 500
+
+
+@routes_files.route("/<int:file_id>/chat/sessions", methods=["POST"])
+@require_auth
+def create_chat_session(user_id: int, file_id: int):
+    file_record = UploadedFile.query.get(file_id)
+    if not file_record: return jsonify({"error": "File not found"}), 404
+    if file_record.user_id != user_id: return jsonify({"error": "Forbidden"}), 403
+
+    session = ChatSession(file_id=file_id, user_id=user_id)
+    db.session.add(session)
+    db.session.commit()
+    return jsonify({"message": "Chat session created", "session": session.to_dict()}), 201
+
+
+@routes_files.route("/<int:file_id>/chat/sessions/<int:session_id>", methods=["GET"])
+@require_auth
+def get_chat_session(user_id: int, file_id: int, session_id: int):
+    session, error = _get_chat_session(user_id, file_id, session_id)
+    if error: return error
+
+    turns = ChatTurn.query.filter_by(session_id=session.id).order_by(ChatTurn.id).all()
+    return jsonify({"session": session.to_dict(), "turns": [t.to_dict() for t in turns]})
+
+
+@routes_files.route("/<int:file_id>/chat/sessions/<int:session_id>", methods=["DELETE"])
+@require_auth
+def end_chat_session(user_id: int, file_id: int, session_id: int):
+    session, error = _get_chat_session(user_id, file_id, session_id)
+    if error: return error
+
+    delete_session(session)
+    db.session.commit()
+    return jsonify({"message": "Chat session deleted", "deleted_session_id": session_id})
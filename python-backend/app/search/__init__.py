@@ -0,0 +1,13 @@
+# app/search/__init__.py
+# simple convenience exports
+from .fulltext import init_search_index, get_search_index
+from .vector_index import init_vector_index, get_vector_index
+from .semantic import index_file_embeddings, copy_file_embeddings, remove_file_embeddings, semantic_search, \
+    retrieve_file_chunks
+
+__all__ = [
+    "init_search_index", "get_search_index",
+    "init_vector_index", "get_vector_index",
+    "index_file_embeddings", "copy_file_embeddings", "remove_file_embeddings", "semantic_search",
+    "retrieve_file_chunks",
+]
@@ -0,0 +1,40 @@
+# app/search/chunking.py
+import re
+from typing import List
+
+
+def chunk_text(text: str, max_chars: int = 1200, overlap: int = 200) -> List[str]:
+    """
+    Splits text into chunks of at most `max_chars`, breaking on paragraph or
+    sentence boundaries where possible. Consecutive chunks share roughly
+    `overlap` characters so an answer spanning a boundary stays retrievable.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    # Sentence-ish pieces; very long pieces are hard-split
+    pieces = []
+    for piece in re.split(r"(?<=[.!?])\s+|\n{2,}", text):
+        piece = piece.strip()
+        while len(piece) > max_chars:
+            pieces.append(piece[:max_chars])
+            piece = piece[max_chars - overlap:]
+        if piece:
+            pieces.append(piece)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            # Carry the tail of the previous chunk over as overlap
+            tail = current[-overlap:] if overlap else ""
+            current = f"{tail} {piece}".strip() if len(tail) + 1 + len(piece) <= max_chars else piece
+        else:
+            current = f"{current} {piece}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,96 @@
+# app/search/embeddings.py
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from flask import current_app
+
+
+# --------------------------------------------------------
+## 🧮 Local Deterministic Embedder (offline / tests)
+# --------------------------------------------------------
+
+class HashingEmbedder:
+    """
+    Feature-hashing bag of words + bigrams, L2-normalized. No network, no
+    model download and fully deterministic, so results are reproducible in
+    tests and offline development. Captures lexical overlap only.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model_name = f"local-hashing-{dim}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vec[bucket] += sign
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed_documents(texts)
+
+
+# --------------------------------------------------------
+## ☁️ Gemini Embedder
+# --------------------------------------------------------
+
+class GeminiEmbedder:
+    """Gemini text embeddings, sent in batches of `batch_size` texts per call."""
+
+    def __init__(self, model_name: str = "models/text-embedding-004", batch_size: int = 50):
+        from app.ai.gemini_client import get_gemini_client
+        self._client = get_gemini_client()
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str], task_type: str) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            result = self._client.embed_content(model=self.model_name, content=batch, task_type=task_type)
+            vectors.extend(result["embedding"])
+        matrix = np.asarray(vectors, dtype=np.float32)
+        # Normalize so cosine similarity is a plain dot product
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self._embed(texts, "retrieval_document")
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self._embed(texts, "retrieval_query")
+
+
+# --------------------------------------------------------
+## 🏭 Factory
+# --------------------------------------------------------
+
+EMBEDDERS = {
+    "local": lambda config: HashingEmbedder(dim=config.get("EMBEDDING_DIM", 256)),
+    "gemini": lambda config: GeminiEmbedder(
+        model_name=config.get("EMBEDDING_MODEL", "models/text-embedding-004"),
+        batch_size=config.get("EMBEDDING_BATCH_SIZE", 50)
+    ),
+}
+
+
+def get_embedder():
+    """Returns the app's embedder, chosen by EMBEDDING_BACKEND ('gemini' or 'local')."""
+    embedder = current_app.extensions.get("embedder")
+    if embedder is None:
+        backend = current_app.config.get("EMBEDDING_BACKEND", "gemini").lower()
+        embedder = EMBEDDERS.get(backend, EMBEDDERS["gemini"])(current_app.config)
+        current_app.extensions["embedder"] = embedder
+    return embedder
@@ -0,0 +1,255 @@
+# app/search/fulltext.py
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import text, or_
+from sqlalchemy.orm import selectinload, undefer
+
+from app import db
+
+
+@dataclass
+class SearchHit:
+    file_id: int
+    rank: float
+    snippet: str
+
+
+# Ranked results plus the sort key of the last hit (for the next cursor)
+SearchPage = Tuple[List[SearchHit], Optional[list]]
+
+
+def _terms(query: str) -> List[str]:
+    """Splits a free-text query into plain word tokens (drops search syntax)."""
+    return re.findall(r"\w+", query.lower())
+
+
+def _backfill(index, indexed_ids_sql: str, batch_size: int = 200):
+    """Indexes files stored before the index existed (their AI text is decoded in Python)."""
+    from app.models import UploadedFile
+
+    after = 0
+    while True:
+        rows = UploadedFile.query.options(selectinload(UploadedFile.analysis).undefer_group("text"))\
+            .filter(UploadedFile.id > after, text(f"uploaded_files.id NOT IN ({indexed_ids_sql})"))\
+            .order_by(UploadedFile.id).limit(batch_size).all()
+        if not rows:
+            break
+        for file_record in rows:
+            index.index_file(file_record)
+        db.session.commit()
+        after = rows[-1].id
+
+
+# --------------------------------------------------------
+## 🪶 SQLite FTS5 Backend
+# --------------------------------------------------------
+
+class SqliteFtsIndex:
+    """
+    FTS5 virtual table keyed by rowid = uploaded_files.id. Ranked with bm25,
+    weighting filename/tags above summary above the extracted text.
+    """
+    name = "sqlite-fts5"
+
+    # bm25 column weights: filename, ai_tags, summary, ocr_text
+    RANK_SQL = "bm25(file_search_fts, 10.0, 8.0, 4.0, 1.0)"
+
+    def ensure_schema(self):
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS file_search_fts USING fts5("
+            " filename, ai_tags, summary, ocr_text, user_id UNINDEXED,"
+            " tokenize = 'porter unicode61')"
+        ))
+        db.session.commit()
+        _backfill(self, "SELECT rowid FROM file_search_fts")
+
+    def index_file(self, file_record):
+        self.remove_file(file_record.id)
+        db.session.execute(text(
+            "INSERT INTO file_search_fts (rowid, filename, ai_tags, summary, ocr_text, user_id)"
+            " VALUES (:id, :filename, :ai_tags, :summary, :ocr_text, :user_id)"
+        ), {
+            "id": file_record.id,
+            "filename": file_record.filename or "",
+            "ai_tags": file_record.ai_tags or "",
+            "summary": file_record.summary or "",
+            "ocr_text": file_record.ocr_text or "",
+            "user_id": file_record.user_id
+        })
+
+    def remove_file(self, file_id: int):
+        db.session.execute(text("DELETE FROM file_search_fts WHERE rowid = :id"), {"id": file_id})
+
+    def search(self, user_id: int, query: str, limit: int, after: Optional[list]) -> SearchPage:
+        terms = _terms(query)
+        if not terms:
+            return [], None
+        # Every term must match; each is a quoted prefix query so input can't inject FTS syntax
+        match = " ".join(f'"{t}"*' for t in terms)
+
+        sql = (
+            f"SELECT rowid, {self.RANK_SQL} AS rank,"
+            " snippet(file_search_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet"
+            " FROM file_search_fts WHERE file_search_fts MATCH :match AND user_id = :user_id"
+        )
+        params = {"match": match, "user_id": user_id, "limit": limit}
+        if after:
+            # bm25: lower is better, so the next page continues upward
+            sql += f" AND ({self.RANK_SQL} > :after_rank OR ({self.RANK_SQL} = :after_rank AND rowid > :after_id))"
+            params.update(after_rank=after[0], after_id=after[1])
+        sql += " ORDER BY rank ASC, rowid ASC LIMIT :limit"
+
+        rows = db.session.execute(text(sql), params).fetchall()
+        hits = [SearchHit(file_id=r[0], rank=r[1], snippet=r[2]) for r in rows]
+        last = [rows[-1][1], rows[-1][0]] if len(rows) == limit else None
+        return hits, last
+
+
+# --------------------------------------------------------
+## 🐘 Postgres tsvector Backend
+# --------------------------------------------------------
+
+class PostgresFtsIndex:
+    """
+    Weighted tsvector per file in `file_search_index`, with a GIN index.
+    Ranked with ts_rank_cd; snippets come from ts_headline.
+    """
+    name = "postgres-tsvector"
+
+    DOCUMENT_SQL = (
+        "setweight(to_tsvector('english', coalesce(:filename, '')), 'A') ||"
+        " setweight(to_tsvector('english', coalesce(:ai_tags, '')), 'A') ||"
+        " setweight(to_tsvector('english', coalesce(:summary, '')), 'B') ||"
+        " setweight(to_tsvector('english', coalesce(:ocr_text, '')), 'C')"
+    )
+
+    def ensure_schema(self):
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS file_search_index ("
+            " file_id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_file_search_index_document ON file_search_index USING GIN (document)"
+        ))
+        db.session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_file_search_index_user ON file_search_index (user_id)"
+        ))
+        # Text for ts_headline snippets (the AI text itself is stored compressed)
+        db.session.execute(text("ALTER TABLE file_search_index ADD COLUMN IF NOT EXISTS content TEXT"))
+        db.session.commit()
+        _backfill(self, "SELECT file_id FROM file_search_index WHERE content IS NOT NULL")
+
+    def index_file(self, file_record):
+        db.session.execute(text(
+            f"INSERT INTO file_search_index (file_id, user_id, document, content)"
+            f" VALUES (:id, :user_id, {self.DOCUMENT_SQL}, :content)"
+            f" ON CONFLICT (file_id) DO UPDATE SET document = EXCLUDED.document, user_id = EXCLUDED.user_id,"
+            f" content = EXCLUDED.content"
+        ), {
+            "id": file_record.id,
+            "user_id": file_record.user_id,
+            "filename": file_record.filename,
+            "ai_tags": file_record.ai_tags,
+            "summary": file_record.summary,
+            "ocr_text": file_record.ocr_text,
+            "content": f"{file_record.summary or ''} {file_record.ocr_text or ''}"
+        })
+
+    def remove_file(self, file_id: int):
+        db.session.execute(text("DELETE FROM file_search_index WHERE file_id = :id"), {"id": file_id})
+
+    def search(self, user_id: int, query: str, limit: int, after: Optional[list]) -> SearchPage:
+        terms = _terms(query)
+        if not terms:
+            return [], None
+        # Prefix match on every term, e.g. "inv & 2024" -> 'inv':* & '2024':*
+        tsquery = " & ".join(f"{t}:*" for t in terms)
+
+        sql = (
+            "SELECT i.file_id, ts_rank_cd(i.document, q)::float8 AS rank,"
+            " ts_headline('english', coalesce(i.content, ''), q,"
+            "  'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5') AS snippet"
+            " FROM file_search_index i, to_tsquery('english', :tsquery) q"
+            " WHERE i.user_id = :user_id AND i.document @@ q"
+        )
+        params = {"tsquery": tsquery, "user_id": user_id, "limit": limit}
+        if after:
+            sql += (" AND (ts_rank_cd(i.document, q)::float8 < :after_rank"
+                    " OR (ts_rank_cd(i.document, q)::float8 = :after_rank AND i.file_id > :after_id))")
+            params.update(after_rank=after[0], after_id=after[1])
+        sql += " ORDER BY rank DESC, i.file_id ASC LIMIT :limit"
+
+        rows = db.session.execute(text(sql), params).fetchall()
+        hits = [SearchHit(file_id=r[0], rank=r[1], snippet=r[2]) for r in rows]
+        last = [rows[-1][1], rows[-1][0]] if len(rows) == limit else None
+        return hits, last
+
+
+# --------------------------------------------------------
+## 🐢 Fallback (no FTS available)
+# --------------------------------------------------------
+
+class LikeFallbackIndex:
+    """
+    The original ILIKE scan, kept for databases without FTS support. The AI
+    text is stored compressed, so only the summary preview is matched.
+    """
+    name = "like-fallback"
+
+    def ensure_schema(self):
+        pass
+
+    def index_file(self, file_record):
+        pass
+
+    def remove_file(self, file_id: int):
+        pass
+
+    def search(self, user_id: int, query: str, limit: int, after: Optional[list]) -> SearchPage:
+        from app.models import UploadedFile
+
+        q = UploadedFile.query.options(undefer(UploadedFile.summary_preview)).filter(
+            UploadedFile.user_id == user_id,
+            or_(
+                UploadedFile.filename.ilike(f"%{query}%"),
+                UploadedFile.summary_preview.ilike(f"%{query}%"),
+                UploadedFile.ai_tags.ilike(f"%{query}%")
+            )
+        )
+        if after:
+            q = q.filter(UploadedFile.id > after[1])
+        rows = q.order_by(UploadedFile.id.asc()).limit(limit).all()
+        hits = [SearchHit(file_id=f.id, rank=0.0, snippet=f.summary_preview or "") for f in rows]
+        last = [0.0, rows[-1].id] if len(rows) == limit else None
+        return hits, last
+
+
+# --------------------------------------------------------
+## 🏭 Backend Selection
+# --------------------------------------------------------
+
+def init_search_index(app):
+    """Picks the backend for the app's database and creates/backfills its schema."""
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        index = LikeFallbackIndex()
+        try:
+            if dialect == "postgresql":
+                index = PostgresFtsIndex()
+            elif dialect == "sqlite":
+                index = SqliteFtsIndex()
+            index.ensure_schema()
+        except Exception as e:
+            # e.g. SQLite built without FTS5
+            db.session.rollback()
+            print(f"⚠️ Full-text index unavailable ({e}); falling back to ILIKE search")
+            index = LikeFallbackIndex()
+    app.extensions["search_index"] = index
+    return index
+
+
+def get_search_index():
+    return current_app.extensions.get("search_index") or LikeFallbackIndex()
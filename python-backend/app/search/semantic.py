@@ -0,0 +1,165 @@
+# app/search/semantic.py
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app import db
+from app.models import FileChunk
+from .chunking import chunk_text
+from .embeddings import get_embedder
+from .vector_index import get_vector_index
+
+
+# AI text columns that get embedded, in result-preference order
+EMBEDDED_SOURCES = ("summary", "vision_analysis", "ocr_text")
+
+
+# --------------------------------------------------------
+## 🧩 Indexing
+# --------------------------------------------------------
+
+def index_file_embeddings(file_record) -> int:
+    """
+    Chunks a file's AI text, embeds all chunks in one batched call and
+    replaces the file's previous chunks. Does not commit.
+
+    Returns:
+        int: number of chunks stored
+    """
+    texts, sources = [], []
+    for source in EMBEDDED_SOURCES:
+        for piece in chunk_text(getattr(file_record, source, None) or ""):
+            texts.append(piece)
+            sources.append(source)
+
+    # Embed before touching the table so a failed call leaves the old chunks in place
+    embedder = get_embedder()
+    vectors = embedder.embed_documents(texts) if texts else []
+
+    remove_file_embeddings(file_record.id)
+    if not texts:
+        return 0
+
+    chunks = []
+    counters: Dict[str, int] = {}
+    for text, source, vector in zip(texts, sources, vectors):
+        index = counters.get(source, 0)
+        counters[source] = index + 1
+        chunks.append(FileChunk(
+            file_id=file_record.id,
+            user_id=file_record.user_id,
+            source=source,
+            chunk_index=index,
+            text=text,
+            embedding=np.asarray(vector, dtype=np.float32).tobytes(),
+            embedding_model=embedder.model_name
+        ))
+    db.session.add_all(chunks)
+    db.session.flush()
+    get_vector_index().upsert(chunks)
+    return len(chunks)
+
+
+def copy_file_embeddings(source_file_id: int, file_record) -> int:
+    """Gives a deduplicated upload the chunks of its already-analyzed twin (no re-embedding). Does not commit."""
+    originals = FileChunk.query.filter_by(file_id=source_file_id).order_by(FileChunk.id).all()
+    chunks = [FileChunk(
+        file_id=file_record.id,
+        user_id=file_record.user_id,
+        source=c.source,
+        chunk_index=c.chunk_index,
+        text=c.text,
+        embedding=c.embedding,
+        embedding_model=c.embedding_model
+    ) for c in originals]
+    if chunks:
+        db.session.add_all(chunks)
+        db.session.flush()
+        get_vector_index().upsert(chunks)
+    return len(chunks)
+
+
+def remove_file_embeddings(file_id: int):
+    """Deletes a file's chunks from the vector index and the table. Does not commit."""
+    get_vector_index().remove_file(file_id)
+    FileChunk.query.filter_by(file_id=file_id).delete(synchronize_session=False)
+
+
+# --------------------------------------------------------
+## 📎 Per-File Retrieval (chat context)
+# --------------------------------------------------------
+
+def retrieve_file_chunks(file_record, question: str, k: int = 6,
+                         sources: Optional[Sequence[str]] = None) -> List[FileChunk]:
+    """
+    Returns the `k` chunks of one file that best match `question`, in
+    document order. A file analyzed before chunking existed is indexed on
+    first use; the caller commits.
+
+    Args:
+        sources: limit to these AI text columns (default: all embedded ones)
+    """
+    embedder = get_embedder()
+
+    def _load():
+        query = FileChunk.query.filter_by(file_id=file_record.id, embedding_model=embedder.model_name)
+        if sources:
+            query = query.filter(FileChunk.source.in_(list(sources)))
+        return query.all()
+
+    chunks = _load()
+    if not chunks and any(getattr(file_record, s, None) for s in EMBEDDED_SOURCES):
+        index_file_embeddings(file_record)
+        chunks = _load()
+    if not chunks:
+        return []
+
+    # A file has few chunks, so a full scan beats a trip through the user-wide index
+    matrix = np.vstack([np.frombuffer(c.embedding, dtype=np.float32) for c in chunks])
+    scores = matrix @ embedder.embed_queries([question])[0]
+    top = np.argsort(-scores)[:k]
+    return sorted((chunks[i] for i in top), key=lambda c: (EMBEDDED_SOURCES.index(c.source), c.chunk_index))
+
+
+# --------------------------------------------------------
+## 🔎 Search
+# --------------------------------------------------------
+
+def semantic_search(user_id: int, queries: List[str], k: int = 10) -> List[List[dict]]:
+    """
+    Embeds every query in one batched call and returns, per query, the top-k
+    files ranked by their best-matching chunk.
+
+    Returns:
+        list: one list per query of {"file_id", "score", "chunk": {...}}
+    """
+    if not queries:
+        return []
+    embedder = get_embedder()
+    query_vectors = embedder.embed_queries(queries)
+
+    # Several chunks can belong to one file, so over-fetch before grouping
+    chunk_hits = get_vector_index().search(user_id, embedder.model_name, query_vectors, k * 4)
+
+    chunk_ids = {h.chunk_id for hits in chunk_hits for h in hits}
+    chunks_by_id = {}
+    if chunk_ids:
+        rows = FileChunk.query.filter(FileChunk.id.in_(chunk_ids)).all()
+        chunks_by_id = {c.id: c for c in rows}
+
+    results = []
+    for hits in chunk_hits:
+        best = {}
+        for hit in hits:  # already sorted best-first
+            chunk = chunks_by_id.get(hit.chunk_id)
+            if chunk is None or hit.file_id in best:
+                continue
+            best[hit.file_id] = {
+                "file_id": hit.file_id,
+                "score": round(hit.score, 4),
+                "chunk": {"source": chunk.source, "index": chunk.chunk_index, "text": chunk.text}
+            }
+            if len(best) == k:
+                break
+        results.append(list(best.values()))
+    return results
@@ -0,0 +1,317 @@
+# app/search/vector_index.py
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import text, func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import FileChunk, VectorIndexVersion
+
+
+@dataclass
+class VectorHit:
+    chunk_id: int
+    file_id: int
+    score: float
+
+
+# --------------------------------------------------------
+## 🧮 Flat / IVF Index (NumPy, cached on disk)
+# --------------------------------------------------------
+
+class _UserMatrix:
+    """All chunk vectors of one user for one embedding model, plus an optional IVF layout."""
+
+    def __init__(self, stamp: tuple, ids: np.ndarray, file_ids: np.ndarray, matrix: np.ndarray,
+                 centroids: Optional[np.ndarray] = None, assignments: Optional[np.ndarray] = None):
+        self.stamp = stamp
+        self.ids = ids
+        self.file_ids = file_ids
+        self.matrix = matrix
+        self.centroids = centroids
+        self.assignments = assignments
+
+
+class FlatVectorIndex:
+    """
+    Cosine search over each user's chunk embeddings with NumPy.
+
+    FileChunk rows are the source of truth. A user's vectors are loaded into
+    one float32 matrix and kept in memory (LRU) and on disk as an `.npz`
+    file in `index_dir`; both are keyed by a (row count, max chunk id, index
+    version) stamp. upsert() and remove_file() bump the user's version in
+    the same transaction as the chunk change, so a delete followed by an
+    insert that reuses the chunk ids still invalidates them.
+
+    Small collections are scanned exhaustively (a single matrix product per
+    query batch). Above `ivf_min_rows` vectors an IVF layout is built: rows
+    are clustered with k-means and a query only scores the rows of its
+    `nprobe` nearest clusters.
+    """
+    name = "numpy-flat"
+
+    def __init__(self, index_dir: str, max_users_in_memory: int = 64,
+                 ivf_min_rows: int = 5000, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.max_users_in_memory = max_users_in_memory
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def upsert(self, chunks: List[FileChunk]):
+        self._bump_versions({c.user_id for c in chunks})
+
+    def remove_file(self, file_id: int):
+        """Call before the file's chunks are deleted (their rows name the owner)."""
+        user_ids = db.session.query(FileChunk.user_id).filter(FileChunk.file_id == file_id).distinct()
+        self._bump_versions({row[0] for row in user_ids})
+
+    def search(self, user_id: int, model: str, queries: np.ndarray, k: int) -> List[List[VectorHit]]:
+        user = self._load(user_id, model)
+        if user is None or not len(user.ids):
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        if user.centroids is None:
+            scores = queries @ user.matrix.T  # (queries, rows) in one call
+            for row in scores:
+                results.append(self._top_k(user, np.arange(len(row)), row, k))
+        else:
+            probe = min(self.nprobe, len(user.centroids))
+            centroid_scores = queries @ user.centroids.T
+            for query, c_scores in zip(queries, centroid_scores):
+                lists = np.argpartition(-c_scores, probe - 1)[:probe]
+                candidates = np.flatnonzero(np.isin(user.assignments, lists))
+                results.append(self._top_k(user, candidates, user.matrix[candidates] @ query, k))
+        return results
+
+    def _top_k(self, user: _UserMatrix, rows: np.ndarray, scores: np.ndarray, k: int) -> List[VectorHit]:
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [VectorHit(int(user.ids[rows[i]]), int(user.file_ids[rows[i]]), float(scores[i])) for i in top]
+
+    # --------------------------------------------------------
+    ## 🗂️ Loading / Caching
+    # --------------------------------------------------------
+
+    def _bump_versions(self, user_ids):
+        """Increments each user's index version. Does not commit."""
+        for user_id in user_ids:
+            updated = VectorIndexVersion.query.filter_by(user_id=user_id).update(
+                {"version": VectorIndexVersion.version + 1}, synchronize_session=False
+            )
+            if updated:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(VectorIndexVersion(user_id, version=1))
+            except IntegrityError:
+                # Another request created the row first
+                VectorIndexVersion.query.filter_by(user_id=user_id).update(
+                    {"version": VectorIndexVersion.version + 1}, synchronize_session=False
+                )
+
+    def _stamp(self, user_id: int, model: str) -> tuple:
+        count, max_id = db.session.query(func.count(FileChunk.id), func.max(FileChunk.id))\
+            .filter(FileChunk.user_id == user_id, FileChunk.embedding_model == model).one()
+        version = db.session.query(VectorIndexVersion.version).filter_by(user_id=user_id).scalar()
+        return int(count or 0), int(max_id or 0), int(version or 0)
+
+    def _disk_path(self, user_id: int, model: str) -> str:
+        safe_model = "".join(c if c.isalnum() else "_" for c in model)
+        return os.path.join(self.index_dir, f"user_{user_id}_{safe_model}.npz")
+
+    def _load(self, user_id: int, model: str) -> Optional[_UserMatrix]:
+        stamp = self._stamp(user_id, model)
+        key = (user_id, model)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached.stamp == stamp:
+                self._cache.move_to_end(key)
+                return cached
+
+        user = self._read_disk(user_id, model, stamp) or self._build(user_id, model, stamp)
+        with self._lock:
+            self._cache[key] = user
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_users_in_memory:
+                self._cache.popitem(last=False)
+        return user
+
+    def _read_disk(self, user_id: int, model: str, stamp: tuple) -> Optional[_UserMatrix]:
+        try:
+            with np.load(self._disk_path(user_id, model)) as data:
+                if tuple(data["stamp"].tolist()) != stamp:
+                    return None
+                centroids = data["centroids"] if "centroids" in data else None
+                assignments = data["assignments"] if "assignments" in data else None
+                return _UserMatrix(stamp, data["ids"], data["file_ids"], data["matrix"], centroids, assignments)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _build(self, user_id: int, model: str, stamp: tuple) -> _UserMatrix:
+        rows = db.session.query(FileChunk.id, FileChunk.file_id, FileChunk.embedding)\
+            .filter(FileChunk.user_id == user_id, FileChunk.embedding_model == model)\
+            .order_by(FileChunk.id).all()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        file_ids = np.array([r[1] for r in rows], dtype=np.int64)
+        matrix = np.vstack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) if rows \
+            else np.zeros((0, 0), dtype=np.float32)
+
+        centroids = assignments = None
+        if len(rows) >= self.ivf_min_rows:
+            centroids, assignments = _kmeans(matrix, n_lists=int(np.sqrt(len(rows))))
+
+        user = _UserMatrix(stamp, ids, file_ids, matrix, centroids, assignments)
+        self._write_disk(user_id, model, user)
+        return user
+
+    def _write_disk(self, user_id: int, model: str, user: _UserMatrix):
+        arrays = {"stamp": np.array(user.stamp), "ids": user.ids, "file_ids": user.file_ids, "matrix": user.matrix}
+        if user.centroids is not None:
+            arrays.update(centroids=user.centroids, assignments=user.assignments)
+        fd, tmp = tempfile.mkstemp(dir=self.index_dir, suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self._disk_path(user_id, model))
+        except OSError as e:
+            print(f"⚠️ Could not persist vector index for user {user_id}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _kmeans(matrix: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means (vectors are unit length, so similarity is a dot product)."""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), size=n_lists, replace=False)].copy()
+    assignments = np.zeros(len(matrix), dtype=np.int64)
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = matrix[assignments == c]
+            if len(members):
+                mean = members.mean(axis=0)
+                norm = np.linalg.norm(mean)
+                centroids[c] = mean / norm if norm else mean
+    return centroids.astype(np.float32), assignments
+
+
+# --------------------------------------------------------
+## 🐘 pgvector Backend
+# --------------------------------------------------------
+
+class PgVectorIndex:
+    """
+    Mirrors chunk embeddings into a pgvector table (one per dimension, since
+    a vector column has a fixed size) with an HNSW cosine index, and lets
+    Postgres do the nearest-neighbour search.
+    """
+    name = "pgvector"
+
+    def ensure_schema(self):
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        db.session.commit()
+
+    def _table(self, dim: int) -> str:
+        return f"file_chunk_vectors_{int(dim)}"
+
+    def _ensure_table(self, dim: int):
+        table = self._table(dim)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f" chunk_id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL, user_id INTEGER NOT NULL,"
+            f" model VARCHAR(100) NOT NULL, embedding vector({int(dim)}) NOT NULL)"
+        ))
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_embedding ON {table} USING hnsw (embedding vector_cosine_ops)"
+        ))
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_user ON {table} (user_id, model)"))
+
+    def upsert(self, chunks: List[FileChunk]):
+        if not chunks:
+            return
+        dim = len(chunks[0].embedding) // 4
+        self._ensure_table(dim)
+        db.session.execute(text(
+            f"INSERT INTO {self._table(dim)} (chunk_id, file_id, user_id, model, embedding)"
+            f" VALUES (:chunk_id, :file_id, :user_id, :model, CAST(:embedding AS vector))"
+            f" ON CONFLICT (chunk_id) DO UPDATE SET embedding = EXCLUDED.embedding"
+        ), [{
+            "chunk_id": c.id,
+            "file_id": c.file_id,
+            "user_id": c.user_id,
+            "model": c.embedding_model,
+            "embedding": _vector_literal(np.frombuffer(c.embedding, dtype=np.float32))
+        } for c in chunks])
+
+    def remove_file(self, file_id: int):
+        tables = db.session.execute(text(
+            "SELECT tablename FROM pg_tables WHERE tablename LIKE 'file_chunk_vectors_%'"
+        )).scalars().all()
+        for table in tables:
+            db.session.execute(text(f"DELETE FROM {table} WHERE file_id = :id"), {"id": file_id})
+
+    def search(self, user_id: int, model: str, queries: np.ndarray, k: int) -> List[List[VectorHit]]:
+        if not len(queries):
+            return []
+        table = self._table(queries.shape[1])
+        exists = db.session.execute(text("SELECT to_regclass(:t)"), {"t": table}).scalar()
+        if not exists:
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        for query in queries:
+            rows = db.session.execute(text(
+                f"SELECT chunk_id, file_id, 1 - (embedding <=> CAST(:q AS vector)) AS score FROM {table}"
+                f" WHERE user_id = :user_id AND model = :model"
+                f" ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"
+            ), {"q": _vector_literal(query), "user_id": user_id, "model": model, "k": k}).fetchall()
+            results.append([VectorHit(r[0], r[1], float(r[2])) for r in rows])
+        return results
+
+
+def _vector_literal(vec: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vec.tolist()) + "]"
+
+
+# --------------------------------------------------------
+## 🏭 Backend Selection
+# --------------------------------------------------------
+
+def init_vector_index(app):
+    """Uses pgvector when asked for (VECTOR_BACKEND=pgvector on Postgres), else the NumPy index."""
+    config = app.config
+    flat = FlatVectorIndex(
+        index_dir=config.get("VECTOR_INDEX_DIR") or os.path.join(tempfile.gettempdir(), "ai-vault-vectors"),
+        ivf_min_rows=config.get("VECTOR_IVF_MIN_ROWS", 5000),
+        nprobe=config.get("VECTOR_IVF_NPROBE", 8)
+    )
+    index = flat
+    with app.app_context():
+        if config.get("VECTOR_BACKEND", "numpy").lower() == "pgvector" and db.engine.dialect.name == "postgresql":
+            try:
+                index = PgVectorIndex()
+                index.ensure_schema()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ pgvector unavailable ({e}); falling back to the NumPy vector index")
+                index = flat
+    app.extensions["vector_index"] = index
+    return index
+
+
+def get_vector_index():
+    return current_app.extensions.get("vector_index") or init_vector_index(current_app._get_current_object())
@@ -1,8 +1,8 @@
 # app/storage/__init__.py
 # simple convenience exports
-from .storage_loader import get_storage
+from .storage_loader import get_storage, reset_storage_registry
 from .storage_local import LocalStorage
 from .storage_cloudinary import CloudinaryStorage
 from .storage_s3 import S3Storage
 
-__all__ = ["get_storage", "LocalStorage", "CloudinaryStorage", "S3Storage"]
+__all__ = ["get_storage", "reset_storage_registry", "LocalStorage", "CloudinaryStorage", "S3Storage"]
@@ -0,0 +1,131 @@
+# app/storage/blob_store.py
+import hashlib
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import StoredBlob
+from .storage_loader import get_storage
+
+
+# --------------------------------------------------------
+## 🧱 Schema Upgrade
+# --------------------------------------------------------
+
+def ensure_blob_schema():
+    """Adds uploaded_files.content_hash to databases created before deduplication."""
+    columns = {c["name"] for c in inspect(db.engine).get_columns("uploaded_files")}
+    if "content_hash" not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE uploaded_files ADD COLUMN content_hash VARCHAR(64)"))
+
+
+# --------------------------------------------------------
+## 🔑 Streaming Digest
+# --------------------------------------------------------
+
+def hash_upload(file_obj, chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """
+    Computes the SHA-256 and size of an uploaded FileStorage by streaming it
+    in chunks (werkzeug already spooled large uploads to disk), then rewinds
+    the stream so the storage driver can read it again.
+
+    Returns:
+        tuple: (hex digest, size in bytes)
+    """
+    h = hashlib.sha256()
+    size = 0
+    stream = file_obj.stream
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        h.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return h.hexdigest(), size
+
+
+# --------------------------------------------------------
+## 🧱 Deduplicated Store / Release
+# --------------------------------------------------------
+
+def store_upload(file_obj, folder: str = "files") -> Tuple[Optional[str], str, bool]:
+    """
+    Stores an upload once per distinct content.
+
+    If a blob with the same SHA-256 already exists its reference count is
+    bumped and its URL reused, so nothing is sent to the storage backend.
+    Otherwise the file is uploaded under a content-addressed name.
+
+    Returns:
+        tuple: (url, content_hash, deduplicated)
+    """
+    digest, size = hash_upload(file_obj)
+    ext = os.path.splitext(file_obj.filename or "")[1].lower()
+
+    for _ in range(3):
+        blob = StoredBlob.query.filter_by(content_hash=digest).first()
+        # 0 rows updated: a concurrent release_blob removed it after the lookup, so upload anew
+        if blob and _add_ref(blob.id, 1):
+            return blob.url, digest, True
+
+        file_obj.stream.seek(0)
+        url = get_storage().upload_file(file_obj, folder=folder, name=f"{digest}{ext}")
+        if not url:
+            return None, digest, False
+        try:
+            db.session.add(StoredBlob(content_hash=digest, url=url, size=size))
+            db.session.commit()
+            return url, digest, False
+        except IntegrityError:
+            # A concurrent request stored the same content first; share its blob.
+            # Our upload used the same content-addressed name, so nothing leaks.
+            db.session.rollback()
+
+    return None, digest, False
+
+
+def release_blob(url: str, content_hash: Optional[str]) -> bool:
+    """
+    Drops one reference to the blob behind a deleted file and removes the
+    stored object when no file uses it any more. Files uploaded before
+    hashing existed (no content_hash) are deleted directly.
+
+    The decrement, the row removal and the storage delete share one
+    transaction. The row stays locked until the object is gone, so a
+    concurrent store_upload of the same content waits. It then finds no row
+    and uploads again, and never takes a reference to an object that is
+    being deleted.
+
+    Returns:
+        bool: True if the object was deleted from storage.
+    """
+    blob = StoredBlob.query.filter_by(content_hash=content_hash).first() if content_hash else None
+    if blob is None:
+        return get_storage().delete_file(url)
+
+    blob_id, blob_url = blob.id, blob.url
+    try:
+        StoredBlob.query.filter_by(id=blob_id).update(
+            {"ref_count": StoredBlob.ref_count - 1}, synchronize_session=False
+        )
+        # Only the request that takes the count to zero removes the row and the object
+        removed = StoredBlob.query.filter(StoredBlob.id == blob_id, StoredBlob.ref_count <= 0)\
+            .delete(synchronize_session=False)
+        deleted = bool(removed) and get_storage().delete_file(blob_url)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return deleted
+
+
+def _add_ref(blob_id: int, delta: int) -> int:
+    """Atomic in SQL so concurrent uploads/deletes cannot lose an update; returns rows updated."""
+    updated = StoredBlob.query.filter_by(id=blob_id).update(
+        {"ref_count": StoredBlob.ref_count + delta}, synchronize_session=False
+    )
+    db.session.commit()
+    return updated
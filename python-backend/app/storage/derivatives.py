@@ -0,0 +1,174 @@
+# app/storage/derivatives.py
+import hashlib
+import io
+from typing import IO, List, Optional, Union
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import FileStorage
+
+from app import db
+from app.models import FileDerivative
+from .storage_loader import get_storage
+
+Source = Union[str, IO[bytes]]  # local path or a readable, seekable stream
+
+
+def parse_sizes(value) -> List[int]:
+    """'128,512' (config string) or an iterable of ints -> sorted unique sizes."""
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    return sorted({int(v) for v in value})
+
+
+def _kind(size: int) -> str:
+    return f"thumb_{size}"
+
+
+def _is_pdf(file_type: str, filename: str) -> bool:
+    return file_type == "application/pdf" or filename.lower().endswith(".pdf")
+
+
+def can_render(file_type: str, filename: str = "") -> bool:
+    """Images and PDFs get thumbnails; other files never do."""
+    return (_is_pdf(file_type, filename) or file_type.startswith("image")
+            or filename.lower().endswith((".jpg", ".jpeg", ".png", ".webp", ".avif")))
+
+
+def missing_sizes(existing: List[FileDerivative], sizes=None) -> List[int]:
+    """Configured sizes (DERIVATIVE_SIZES by default) not among `existing`."""
+    sizes = parse_sizes(sizes if sizes is not None else current_app.config.get("DERIVATIVE_SIZES", "128,512"))
+    kinds = {d.kind for d in existing}
+    return [s for s in sizes if _kind(s) not in kinds]
+
+
+# --------------------------------------------------------
+## 🎨 Rendering
+# --------------------------------------------------------
+
+def _render_pdf_first_page(source: Source, max_edge: int):
+    """First page as a PIL image (needs PyMuPDF); None when it is not installed."""
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        print("⚠️ PyMuPDF is not installed; no PDF previews")
+        return None
+    from PIL import Image
+
+    if isinstance(source, str):
+        document = fitz.open(source)
+    else:
+        source.seek(0)
+        document = fitz.open(stream=source.read(), filetype="pdf")
+    try:
+        if document.page_count == 0:
+            return None
+        page = document[0]
+        zoom = max_edge / max(page.rect.width, page.rect.height, 1)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    finally:
+        document.close()
+
+
+def render_preview(source: Source, file_type: str, filename: str = "", max_edge: int = 512):
+    """
+    Decodes the source into an upright RGB PIL image no smaller than needed
+    for `max_edge` thumbnails: the image itself, or a PDF's first page.
+    Returns None for other types or undecodable files.
+    """
+    from PIL import Image, ImageOps
+
+    if not can_render(file_type, filename):
+        return None
+    try:
+        if _is_pdf(file_type, filename):
+            image = _render_pdf_first_page(source, max_edge)
+        else:
+            if not isinstance(source, str):
+                source.seek(0)
+            image = Image.open(source)
+            # JPEG can decode straight at a reduced scale
+            image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        print(f"⚠️ Preview render failed for {filename or file_type}: {e}")
+        return None
+    if image is None:
+        return None
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+# --------------------------------------------------------
+## 🏭 Generate / Delete
+# --------------------------------------------------------
+
+def create_derivatives(source: Source, source_url: str, file_type: str, filename: str = "",
+                       sizes=None, folder: str = "derivatives") -> List[FileDerivative]:
+    """
+    Makes the missing `sizes` (long edge, px) of a stored object and uploads
+    them through the active storage driver as JPEGs. Existing derivatives of
+    `source_url` are kept, so this is cheap to call again (dedup uploads,
+    lazy requests). Commits.
+
+    Returns:
+        list: All derivatives of `source_url` (empty if it cannot be rendered).
+    """
+    existing = FileDerivative.query.filter_by(source_url=source_url).all()
+    missing = missing_sizes(existing, sizes)
+    if not missing or not can_render(file_type, filename):
+        return existing
+
+    image = render_preview(source, file_type, filename, max_edge=max(missing))
+    if image is None:
+        return existing
+
+    storage = get_storage()
+    quality = current_app.config.get("DERIVATIVE_QUALITY", 80)
+    # Names follow the source, so regenerating overwrites instead of leaking objects
+    key = hashlib.sha256(source_url.encode("utf-8")).hexdigest()[:32]
+    created = []
+    for size in sorted(missing, reverse=True):
+        thumb = image.copy()
+        thumb.thumbnail((size, size))
+        buffer = io.BytesIO()
+        thumb.save(buffer, "JPEG", quality=quality, optimize=True)
+        data_size = buffer.tell()
+        buffer.seek(0)
+
+        name = f"{key}_{_kind(size)}.jpg"
+        url = storage.upload_file(FileStorage(stream=buffer, filename=name, content_type="image/jpeg"),
+                                  folder=folder, name=name)
+        if not url:
+            print(f"⚠️ Derivative upload failed: {name}")
+            continue
+        created.append(FileDerivative(source_url, _kind(size), url, thumb.width, thumb.height, data_size))
+
+    try:
+        db.session.add_all(created)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request generated them first (same object names)
+        db.session.rollback()
+    return FileDerivative.query.filter_by(source_url=source_url).all()
+
+
+def delete_derivatives(source_url: Optional[str]) -> int:
+    """Removes every derivative of `source_url` from storage and the database. Does not commit."""
+    if not source_url:
+        return 0
+    rows = FileDerivative.query.filter_by(source_url=source_url).all()
+    storage = get_storage()
+    for row in rows:
+        try:
+            storage.delete_file(row.url)
+        except Exception as e:
+            print(f"⚠️ Failed to delete derivative {row.url}: {e}")
+        db.session.delete(row)
+    return len(rows)
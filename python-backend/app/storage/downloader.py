@@ -0,0 +1,249 @@
+# app/storage/downloader.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class DownloadError(Exception):
+    """Raised when a stored file cannot be downloaded."""
+
+
+# --------------------------------------------------------
+## ⬇️ Pooled, Cached Blob Downloader
+# --------------------------------------------------------
+
+class BlobDownloader:
+    """
+    Fetches stored files for analysis and chat.
+
+    - One pooled keep-alive `requests.Session` per process, with connect/read
+      timeouts and retries on transient errors.
+    - Bodies are streamed in chunks straight into a file in the on-disk blob
+      cache (no full in-memory copy followed by a second copy to disk).
+    - Cache entries are keyed by URL and remember the ETag / Last-Modified
+      headers. A fresh entry (or an immutable, content-addressed URL) is
+      served without touching the network; a stale one is revalidated with a
+      conditional GET and reused on 304.
+    - Pruning never deletes a blob fetched or reused in the last
+      `min_age` seconds. A caller may still be reading that path, even in
+      another worker process. The cache can overshoot its cap until
+      those entries age out.
+    """
+
+    # Cloudinary rejects some default client user agents with a 401
+    USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+    def __init__(self, cache_dir: str, max_cache_bytes: int = 500 * 1024 * 1024,
+                 fresh_seconds: int = 300, pool_size: int = 10,
+                 connect_timeout: float = 5, read_timeout: float = 60,
+                 chunk_size: int = 1024 * 1024, min_age: float = 600):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.min_age = min_age
+        self.fresh_seconds = fresh_seconds
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = self.USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                              allowed_methods=["GET"])
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._prune_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {"cache_hits": 0, "revalidated": 0, "downloads": 0, "pruned": 0}
+
+    # --------------------------------------------------------
+    ## 📥 Public API
+    # --------------------------------------------------------
+
+    def fetch(self, url: str, suffix: str = "", immutable: bool = False) -> str:
+        """
+        Returns a local path holding the content behind `url`.
+
+        `file://` URLs are returned as-is. For http(s) URLs the returned path
+        lives in the shared blob cache and must NOT be deleted by the caller.
+        Pass `immutable=True` for content-addressed URLs, which never change.
+        """
+        if url.startswith("file://"):
+            return url[len("file://"):]
+        if not url.startswith("http"):
+            raise DownloadError(f"Unsupported file URL: {url[:30]}")
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = os.path.join(self.cache_dir, key + suffix)
+        meta = self._read_meta(key)
+
+        headers = {}
+        if meta and os.path.exists(path):
+            age = time.time() - meta.get("fetched_at", 0)
+            if immutable or age < self.fresh_seconds:
+                self._count("cache_hits")
+                os.utime(path)  # LRU touch (also shields it from pruning for min_age)
+                return path
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and headers:
+                    self._count("revalidated")
+                    self._write_meta(key, dict(meta, fetched_at=time.time()))
+                    os.utime(path)
+                    return path
+                if response.status_code != 200:
+                    print(f"❌ DOWNLOAD FAILED: Status {response.status_code}")
+                    raise DownloadError(f"Failed to download file (status {response.status_code})")
+
+                # Stream into a temp file in the cache dir, then atomically swap it in
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+                try:
+                    with os.fdopen(fd, "wb") as out:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            out.write(chunk)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+
+                self._write_meta(key, {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.time()
+                })
+        except requests.RequestException as e:
+            raise DownloadError(f"Failed to download file: {e}") from e
+
+        self._count("downloads")
+        self._prune()
+        return path
+
+    def read_bytes(self, url: str, suffix: str = "", immutable: bool = False) -> bytes:
+        """Fetches `url` and returns its content with a single read from disk."""
+        with open(self.fetch(url, suffix, immutable), "rb") as f:
+            return f.read()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    # --------------------------------------------------------
+    ## 🗂️ Cache Bookkeeping
+    # --------------------------------------------------------
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".meta")
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(key))
+
+    def _prune(self):
+        """
+        Deletes least recently used blobs once the cache exceeds its size cap,
+        skipping those touched in the last `min_age` seconds (still in use).
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            in_use_after = time.time() - self.min_age
+            for name in os.listdir(self.cache_dir):
+                if name.endswith((".meta", ".tmp", ".part")):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full, name))
+                total += st.st_size
+
+            entries.sort()
+            pruned = 0
+            for mtime, size, full, name in entries:
+                if total <= self.max_cache_bytes or mtime >= in_use_after:
+                    break
+                key = name.split(".", 1)[0]
+                for p in (full, self._meta_path(key)):
+                    try: os.remove(p)
+                    except OSError: pass
+                total -= size
+                pruned += 1
+            if pruned:
+                self._count("pruned", pruned)
+        finally:
+            self._prune_lock.release()
+
+
+# --------------------------------------------------------
+## 🏭 Per-Process Instance
+# --------------------------------------------------------
+
+_downloader_lock = threading.Lock()
+
+
+def get_downloader() -> BlobDownloader:
+    """Returns the app's shared BlobDownloader, building it on first use."""
+    downloader = current_app.extensions.get("blob_downloader")
+    if downloader is None:
+        with _downloader_lock:
+            downloader = current_app.extensions.get("blob_downloader")
+            if downloader is None:
+                config = current_app.config
+                downloader = BlobDownloader(
+                    cache_dir=config.get("DOWNLOAD_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ai-vault-blobs"),
+                    max_cache_bytes=config.get("DOWNLOAD_CACHE_MAX_MB", 500) * 1024 * 1024,
+                    fresh_seconds=config.get("DOWNLOAD_CACHE_FRESH_SECONDS", 300),
+                    pool_size=config.get("DOWNLOAD_POOL_SIZE", 10),
+                    connect_timeout=config.get("DOWNLOAD_CONNECT_TIMEOUT", 5),
+                    read_timeout=config.get("DOWNLOAD_READ_TIMEOUT", 60),
+                    min_age=config.get("DOWNLOAD_CACHE_MIN_AGE", 600)
+                )
+                current_app.extensions["blob_downloader"] = downloader
+    return downloader
+
+
+def fetch_uploaded_file(file_record) -> str:
+    """
+    Fetches an UploadedFile through the shared downloader and returns its
+    local path, keeping the original extension (Gemini infers MIME types from it).
+    """
+    ext = os.path.splitext(file_record.filename)[1].lower()
+    # Content-addressed URLs (see blob_store) never change behind the same URL
+    immutable = bool(file_record.content_hash and file_record.content_hash in file_record.url)
+    return get_downloader().fetch(file_record.url, suffix=ext or ".bin", immutable=immutable)
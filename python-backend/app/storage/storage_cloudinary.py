@@ -1,4 +1,5 @@
 # app/storage/storage_cloudinary.py
+import os
 import cloudinary
 import cloudinary.uploader
 from flask import current_app
@@ -18,16 +19,24 @@ class CloudinaryStorage:
             api_secret=current_app.config.get("CLOUDINARY_API_SECRET", ""),
             secure=True
         )
+        # Connections: cloudinary.uploader already reuses one module-level keep-alive
+        # PoolManager (SDK defaults); the driver registry keeps this instance per process
 
-    def upload_file(self, file, folder="uploads"):
+    def upload_file(self, file, folder="uploads", name=None):
         """
         Upload any file. resource_type='auto' lets cloudinary handle images/documents.
         `file` can be FileStorage (Flask) or a local path.
+        `name` (optional) becomes the public_id, e.g. a content hash.
         """
+        options = {}
+        if name:
+            options["public_id"] = os.path.splitext(name)[0]
+            options["overwrite"] = False
         upload_result = cloudinary.uploader.upload(
             file,
             folder=folder,
-            resource_type="auto"
+            resource_type="auto",
+            **options
         )
         return upload_result.get("secure_url")
 
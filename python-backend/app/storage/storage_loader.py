@@ -1,23 +1,71 @@
 # app/storage/storage_loader.py
+import threading
 from flask import current_app
 from .storage_local import LocalStorage
 from .storage_cloudinary import CloudinaryStorage
 from .storage_s3 import S3Storage
 
 
+# Config keys each driver is built from; a change in any of them rebuilds the driver
+DRIVER_CONFIG_KEYS = {
+    "local": ("LOCAL_UPLOAD_PATH",),
+    "s3": (
+        "AWS_S3_BUCKET_NAME", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION",
+        "AWS_S3_ENDPOINT_URL", "S3_MULTIPART_THRESHOLD_MB", "S3_MULTIPART_CHUNKSIZE_MB",
+        "S3_MAX_CONCURRENCY", "STORAGE_POOL_SIZE"
+    ),
+    "cloudinary": (
+        "CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"
+    ),
+}
+
+DRIVER_CLASSES = {
+    "local": LocalStorage,
+    "s3": S3Storage,
+    "cloudinary": CloudinaryStorage,
+}
+
+# Per-process registry: driver name -> (config fingerprint, instance)
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _fingerprint(driver):
+    config = current_app.config
+    # root_path matters for LocalStorage's default folder
+    return (current_app.root_path,) + tuple(config.get(key) for key in DRIVER_CONFIG_KEYS[driver])
+
+
 def get_storage():
     """
     Returns the active storage driver (local, cloudinary, or s3)
     based on STORAGE_DRIVER in config.
+
+    Drivers are built once per process and reused across requests (one boto3
+    client / HTTP connection pool instead of one per request). A driver is
+    rebuilt only when the config values it depends on change.
     """
 
     driver = current_app.config.get("STORAGE_DRIVER", "cloudinary").lower()
+    if driver not in DRIVER_CLASSES:
+        # default
+        driver = "cloudinary"
+
+    fingerprint = _fingerprint(driver)
+    cached = _registry.get(driver)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
 
-    if driver == "local":
-        return LocalStorage()
+    with _registry_lock:
+        cached = _registry.get(driver)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        instance = DRIVER_CLASSES[driver]()
+        _registry[driver] = (fingerprint, instance)
+        return instance
 
-    if driver == "s3":
-        return S3Storage()
 
-    # default
-    return CloudinaryStorage()
+def reset_storage_registry():
+    """Forgets every cached driver (next get_storage() call rebuilds)."""
+    with _registry_lock:
+        _registry.clear()
@@ -19,8 +19,8 @@ class LocalStorage:
         self.upload_root = os.path.abspath(base)
         Path(self.upload_root).mkdir(parents=True, exist_ok=True)
 
-    def _save_file(self, file_obj, dest_folder):
-        filename = secure_filename(file_obj.filename)
+    def _save_file(self, file_obj, dest_folder, filename=None):
+        filename = secure_filename(filename or file_obj.filename)
         folder = os.path.join(self.upload_root, dest_folder)
         Path(folder).mkdir(parents=True, exist_ok=True)
         dest_path = os.path.join(folder, filename)
@@ -28,8 +28,10 @@ class LocalStorage:
         # return file path (not a remote url) — you can adjust to serve static files
         return dest_path
 
-    def upload_file(self, file, folder="files"):
-        path = self._save_file(file, folder)
+    def upload_file(self, file, folder="files", name=None):
+        # `name` overrides the stored filename (e.g. a content hash, so that
+        # different uploads called "scan.pdf" never overwrite each other)
+        path = self._save_file(file, folder, name)
         # return a file:// path so callers can see it; in dev you may want to serve with flask send_from_directory
         return f"file://{path}"
 
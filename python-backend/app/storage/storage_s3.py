@@ -1,6 +1,9 @@
 # app/storage/storage_s3.py
 import os
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from flask import current_app
 from werkzeug.utils import secure_filename
@@ -13,34 +16,67 @@ class S3Storage:
      - AWS_ACCESS_KEY_ID
      - AWS_SECRET_ACCESS_KEY
      - AWS_REGION (optional)
+     - AWS_S3_ENDPOINT_URL (optional, e.g. a local moto/MinIO server)
+
+    Uploads are streamed with boto3's managed transfer: bodies above
+    S3_MULTIPART_THRESHOLD_MB become a multipart upload whose parts
+    (S3_MULTIPART_CHUNKSIZE_MB each) are sent by S3_MAX_CONCURRENCY threads,
+    so memory stays at roughly chunk size x concurrency per upload.
     """
 
     def __init__(self):
         self.bucket = current_app.config.get("AWS_S3_BUCKET_NAME")
         self.region = current_app.config.get("AWS_REGION", "")
+        self.endpoint_url = current_app.config.get("AWS_S3_ENDPOINT_URL")
         self._client = boto3.client(
             "s3",
             aws_access_key_id=current_app.config.get("AWS_ACCESS_KEY_ID"),
             aws_secret_access_key=current_app.config.get("AWS_SECRET_ACCESS_KEY"),
-            region_name=self.region or None
+            region_name=self.region or None,
+            endpoint_url=self.endpoint_url or None,
+            # One keep-alive pool shared by every request and multipart thread
+            config=BotoConfig(
+                max_pool_connections=current_app.config.get("STORAGE_POOL_SIZE", 10),
+                tcp_keepalive=True
+            )
+        )
+        mb = 1024 * 1024
+        self._transfer_config = TransferConfig(
+            multipart_threshold=current_app.config.get("S3_MULTIPART_THRESHOLD_MB", 8) * mb,
+            multipart_chunksize=current_app.config.get("S3_MULTIPART_CHUNKSIZE_MB", 8) * mb,
+            max_concurrency=current_app.config.get("S3_MAX_CONCURRENCY", 4),
+            use_threads=True
         )
 
+    def _object_url(self, key):
+        # Construct URL (public object assumed)
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        if self.region:
+            return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
     def _upload_bytes(self, file_obj, key, ExtraArgs=None):
         try:
-            # file_obj is a FileStorage; use file_obj.stream or .read()
-            content = file_obj.read()
-            self._client.put_object(Bucket=self.bucket, Key=key, Body=content, **(ExtraArgs or {}))
-            # Construct URL (public object assumed)
-            if self.region:
-                return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
-            return f"https://{self.bucket}.s3.amazonaws.com/{key}"
-        except ClientError:
+            # file_obj is a FileStorage; stream its underlying file instead of
+            # reading the whole body into memory
+            stream = getattr(file_obj, "stream", file_obj)
+            self._client.upload_fileobj(
+                stream, self.bucket, key,
+                ExtraArgs=ExtraArgs or None,
+                Config=self._transfer_config
+            )
+            return self._object_url(key)
+        except (ClientError, S3UploadFailedError):
             return None
 
-    def upload_file(self, file, folder="uploads"):
-        filename = secure_filename(file.filename)
+    def upload_file(self, file, folder="uploads", name=None):
+        filename = secure_filename(name or file.filename)
         key = f"{folder}/{filename}"
-        url = self._upload_bytes(file, key, ExtraArgs={"ACL": "public-read"})
+        extra = {"ACL": "public-read"}
+        if getattr(file, "mimetype", None):
+            extra["ContentType"] = file.mimetype
+        url = self._upload_bytes(file, key, ExtraArgs=extra)
         return url
 
     def upload_profile_picture(self, file, user_id):
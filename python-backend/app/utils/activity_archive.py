@@ -0,0 +1,206 @@
+# app/utils/activity_archive.py
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, and_, inspect, or_, text
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import ActivityLog, ActivityDailyCount
+from .activity_logger import ACTION_EVENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------------
+## 🧱 Schema Upgrade
+# --------------------------------------------------------
+
+def ensure_activity_schema():
+    """
+    Brings an existing activity_logs table up to the model: adds and
+    backfills `event_type` and creates the history/retention indexes
+    (db.create_all only does either for new tables).
+    """
+    columns = {c["name"] for c in inspect(db.engine).get_columns("activity_logs")}
+    with db.engine.begin() as conn:
+        if "event_type" not in columns:
+            conn.execute(text(
+                f"ALTER TABLE activity_logs ADD COLUMN event_type VARCHAR(32) NOT NULL DEFAULT '{ActivityLog.EVENT_OTHER}'"
+            ))
+            for prefix, event_type in ACTION_EVENT_TYPES:
+                conn.execute(text("UPDATE activity_logs SET event_type = :type WHERE action LIKE :prefix"),
+                             {"type": event_type, "prefix": f"{prefix}%"})
+            logger.info("Added and backfilled activity_logs.event_type")
+        for index in ActivityLog.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# --------------------------------------------------------
+## 📜 History Queries
+# --------------------------------------------------------
+
+def history_page(user_id: int, event_types: Sequence[str], limit: int,
+                 after: Optional[list] = None) -> Tuple[List[ActivityLog], Optional[list]]:
+    """
+    One page of a user's events, newest first, by keyset on (timestamp, id):
+    each page is an index range scan on ix_activity_user_event_time, however
+    deep the caller pages. `after` is the cursor returned with the previous page.
+
+    Returns:
+        tuple: (rows, cursor for the next page or None)
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = ActivityLog.query.filter(ActivityLog.user_id == user_id, ActivityLog.event_type.in_(event_types))
+    if after:
+        try:
+            after_ts, after_id = datetime.fromisoformat(after[0]), int(after[1])
+        except (TypeError, ValueError, IndexError) as e:
+            raise ValueError("Invalid cursor") from e
+        query = query.filter(or_(
+            ActivityLog.timestamp < after_ts,
+            and_(ActivityLog.timestamp == after_ts, ActivityLog.id < after_id)
+        ))
+    rows = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(limit).all()
+    last = [rows[-1].timestamp.isoformat(), rows[-1].id] if len(rows) == limit else None
+    return rows, last
+
+
+# --------------------------------------------------------
+## 🗄️ Retention / Rollup
+# --------------------------------------------------------
+
+def archive_table(month: str) -> Table:
+    """The archive table for one month ('YYYYMM'), same columns as activity_logs."""
+    return Table(
+        f"activity_logs_{month}", MetaData(),
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        Column("user_id", Integer, nullable=False),
+        Column("event_type", String(32), nullable=False),
+        Column("action", String(200), nullable=False),
+        Column("route", String(200), nullable=False),
+        Column("timestamp", DateTime, index=True),
+    )
+
+
+class ActivityArchiver:
+    """
+    Keeps activity_logs to the last `retention_days`: older rows are copied
+    into monthly tables (activity_logs_YYYYMM), counted into
+    activity_daily_counts, and deleted, `batch_size` rows per transaction.
+
+    Every process may run it. A batch that another process archived first
+    fails on the archive table's primary key and is rolled back whole, so
+    rows are never counted twice.
+    """
+
+    def __init__(self, app, retention_days: int = 90, batch_size: int = 5000,
+                 interval: float = 3600, max_batches: int = 100):
+        self.app = app
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_batches = max_batches
+        self._stopped = threading.Event()
+        self._thread = None
+        self._tables: Dict[str, Table] = {}
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="activity-archiver", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Archives everything past the retention window; returns the number of rows moved."""
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        moved = 0
+        with self.app.app_context():
+            for _ in range(self.max_batches):
+                count = self._archive_batch(cutoff)
+                moved += count
+                if count < self.batch_size:
+                    break
+        if moved:
+            logger.info(f"Archived {moved} activity log rows older than {cutoff.date()}")
+        return moved
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Activity archiver error")
+
+    def _table(self, conn, month: str) -> Table:
+        table = self._tables.get(month)
+        if table is None:
+            table = self._tables[month] = archive_table(month)
+            table.create(conn, checkfirst=True)
+        return table
+
+    def _archive_batch(self, cutoff: datetime) -> int:
+        log = ActivityLog.__table__
+        try:
+            with db.engine.begin() as conn:
+                rows = conn.execute(
+                    log.select().where(log.c.timestamp < cutoff)
+                    .order_by(log.c.timestamp, log.c.id).limit(self.batch_size)
+                ).mappings().all()
+                if not rows:
+                    return 0
+
+                by_month: Dict[str, list] = {}
+                counts: Counter = Counter()
+                for row in rows:
+                    by_month.setdefault(row["timestamp"].strftime("%Y%m"), []).append(dict(row))
+                    counts[(row["timestamp"].date(), row["user_id"], row["event_type"])] += 1
+
+                for month, month_rows in by_month.items():
+                    conn.execute(self._table(conn, month).insert(), month_rows)
+                self._add_counts(conn, counts)
+                conn.execute(log.delete().where(log.c.id.in_([row["id"] for row in rows])))
+                return len(rows)
+        except IntegrityError:
+            logger.info("Activity batch already archived by another worker; skipping")
+            return 0
+
+    @staticmethod
+    def _add_counts(conn, counts: Counter):
+        daily = ActivityDailyCount.__table__
+        for (day, user_id, event_type), count in counts.items():
+            key = and_(daily.c.day == day, daily.c.user_id == user_id, daily.c.event_type == event_type)
+            updated = conn.execute(daily.update().where(key).values(count=daily.c.count + count)).rowcount
+            if not updated:
+                conn.execute(daily.insert().values(day=day, user_id=user_id, event_type=event_type, count=count))
+
+
+# --------------------------------------------------------
+## 🏭 Factory Helpers
+# --------------------------------------------------------
+
+def init_activity_archiver(app) -> ActivityArchiver:
+    """Upgrades the activity_logs schema and starts the retention job (if configured)."""
+    with app.app_context():
+        ensure_activity_schema()
+    archiver = ActivityArchiver(
+        app,
+        retention_days=app.config.get("ACTIVITY_LOG_RETENTION_DAYS", 90),
+        batch_size=app.config.get("ACTIVITY_ARCHIVE_BATCH_SIZE", 5000),
+        interval=app.config.get("ACTIVITY_ARCHIVE_INTERVAL", 3600)
+    )
+    archiver.start()
+    app.extensions["activity_archiver"] = archiver
+    return archiver
@@ -2,35 +2,220 @@
 from app import db
 from datetime import datetime, timezone
 from app.models import ActivityLog
+import atexit
 import logging
-from flask import has_app_context
+import queue
+import threading
+import time
+from flask import current_app, has_app_context
 
 logger = logging.getLogger(__name__)
 
-def log_activity(user_id, action, route="/unknown"):
+# Event type for callers that don't pass one, by action prefix (also used to backfill old rows)
+ACTION_EVENT_TYPES = (
+    ("Uploaded file", ActivityLog.EVENT_FILE_UPLOAD),
+    ("Deleted file", ActivityLog.EVENT_FILE_DELETE),
+    ("AI analyzed", ActivityLog.EVENT_FILE_ANALYZE),
+    ("User logged in", ActivityLog.EVENT_AUTH),
+    ("User signed up", ActivityLog.EVENT_AUTH),
+    ("Viewed profile", ActivityLog.EVENT_ACCOUNT),
+    ("Changed password", ActivityLog.EVENT_ACCOUNT),
+    ("Password reset", ActivityLog.EVENT_ACCOUNT),
+    ("Requested password reset", ActivityLog.EVENT_ACCOUNT),
+    ("Fetched all users", ActivityLog.EVENT_ADMIN),
+    ("Viewed user", ActivityLog.EVENT_ADMIN),
+    ("Updated user", ActivityLog.EVENT_ADMIN),
+    ("Deleted user", ActivityLog.EVENT_ADMIN),
+    ("Searched users", ActivityLog.EVENT_ADMIN),
+    ("Changed role", ActivityLog.EVENT_ADMIN),
+)
+
+
+def event_type_for(action: str) -> str:
+    for prefix, event_type in ACTION_EVENT_TYPES:
+        if action.startswith(prefix):
+            return event_type
+    return ActivityLog.EVENT_OTHER
+
+
+class ActivityLogWriter:
     """
-    Save activity in DB and write a logger entry.
+    Buffers activity events in a bounded in-process queue; a background
+    thread bulk-inserts them when `batch_size` events are waiting or every
+    `flush_interval` seconds, whichever comes first.
+
+    Inserts go through their own pooled connection, never the request's
+    session, so logging neither adds a commit to the request nor commits
+    whatever else that session has pending. When the queue is full, events
+    are dropped ('drop') or the caller waits up to `block_timeout` seconds
+    first ('block'); both are counted. stop() drains the queue, and it runs
+    at interpreter exit.
+    """
+
+    def __init__(self, app, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 2.0, overflow: str = "drop", block_timeout: float = 0.05):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._flush_now = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "blocked": 0, "flushes": 0,
+                       "failed_batches": 0, "max_batch": 0, "last_flush_ms": 0.0}
+
+    # --------------------------------------------------------
+    ## ▶️ Lifecycle
+    # --------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._flush_loop, name="activity-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def stop(self, timeout: float = 5.0):
+        """Stops the flusher after it has written everything still queued."""
+        self._stopped.set()
+        self._flush_now.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # --------------------------------------------------------
+    ## 📥 Producer API
+    # --------------------------------------------------------
+
+    def submit(self, user_id, action, route, event_type=None) -> bool:
+        """Queues one event; returns False if it was dropped."""
+        row = {"user_id": user_id, "event_type": event_type or event_type_for(action),
+               "action": action, "route": route, "timestamp": datetime.now(timezone.utc)}
+        try:
+            if self.overflow == "block":
+                try:
+                    self._queue.put_nowait(row)
+                except queue.Full:
+                    self._count("blocked")
+                    self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"Activity log queue full; dropped: user={user_id} action={action}")
+            return False
+
+        self._count("enqueued")
+        if self._queue.qsize() >= self.batch_size:
+            self._flush_now.set()
+        return True
+
+    def flush(self):
+        """Writes everything queued right now (inline; for tests and shutdown)."""
+        while self._write_batch(self._drain()):
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["overflow"] = self.overflow
+        return stats
+
+    # --------------------------------------------------------
+    ## 🧵 Flusher Side
+    # --------------------------------------------------------
+
+    def _flush_loop(self):
+        while not self._stopped.is_set():
+            self._flush_now.wait(self.flush_interval)
+            self._flush_now.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Activity log flusher error")
+        self.flush()
+
+    def _drain(self) -> list:
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write_batch(self, rows: list) -> bool:
+        if not rows:
+            return False
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                # One multi-row INSERT in its own transaction, outside any ORM session
+                with db.engine.begin() as conn:
+                    conn.execute(ActivityLog.__table__.insert(), rows)
+        except Exception as e:
+            logger.exception(f"Failed to write {len(rows)} activity log rows: {e}")
+            self._count("failed_batches")
+            return True  # rows are lost, but keep draining the queue
+        with self._lock:
+            self._stats["written"] += len(rows)
+            self._stats["flushes"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(rows))
+            self._stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return True
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+
+# --------------------------------------------------------
+## 🏭 Factory Helpers
+# --------------------------------------------------------
+
+def init_activity_writer(app) -> ActivityLogWriter:
+    """Creates the per-process activity log writer and starts its flusher."""
+    writer = ActivityLogWriter(
+        app,
+        max_queue=app.config.get("ACTIVITY_LOG_QUEUE_SIZE", 10000),
+        batch_size=app.config.get("ACTIVITY_LOG_BATCH_SIZE", 200),
+        flush_interval=app.config.get("ACTIVITY_LOG_FLUSH_INTERVAL", 2.0),
+        overflow=app.config.get("ACTIVITY_LOG_OVERFLOW", "drop").lower()
+    )
+    if app.config.get("ACTIVITY_LOG_ASYNC", True):
+        writer.start()
+    app.extensions["activity_writer"] = writer
+    return writer
+
+
+def log_activity(user_id, action, route="/unknown", event_type=None):
+    """
+    Queue an activity row for the background writer and write a logger entry.
+    Without a started writer (ACTIVITY_LOG_ASYNC off) the row is written
+    immediately, still on the writer's own connection. `event_type` defaults
+    to the one matching the action's prefix (ACTION_EVENT_TYPES).
     """
     # Safety check: Ensure we are in an app context
     if not has_app_context():
         logger.warning("Attempted to log activity outside of application context.")
         return
 
+    writer = current_app.extensions.get("activity_writer")
+    if writer is None:
+        writer = init_activity_writer(current_app._get_current_object())
+
     try:
-        entry = ActivityLog(
-            user_id=user_id,
-            action=action,
-            route=route,
-            timestamp=datetime.now(timezone.utc)
-        )
-        db.session.add(entry)
-        db.session.commit()
+        if writer.submit(user_id, action, route, event_type) and not writer.running:
+            writer.flush()
         logger.info(f"Activity logged: user={user_id} action={action} route={route}")
-
     except Exception as e:
         logger.exception(f"Failed to log activity: {e}")
-        # Only rollback if the session is active
-        try:
-            db.session.rollback()
-        except:
-            pass
\ No newline at end of file
@@ -0,0 +1,51 @@
+# app/utils/compressed_text.py
+from typing import Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # optional: without it everything is stored as plain UTF-8
+    zstandard = None
+
+# Every zstd frame starts with these bytes; UTF-8 text never can (0xB5 can't follow '(')
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _settings():
+    config = current_app.config if has_app_context() else {}
+    return (config.get("ANALYSIS_COMPRESSION", "zstd").lower(),
+            config.get("ANALYSIS_COMPRESS_MIN_BYTES", 4096),
+            config.get("ANALYSIS_ZSTD_LEVEL", 3))
+
+
+def compress_text(value: str) -> bytes:
+    """UTF-8 bytes, zstd-compressed when enabled, available and large enough to pay off."""
+    data = value.encode("utf-8")
+    codec, min_bytes, level = _settings()
+    if codec != "zstd" or zstandard is None or len(data) < min_bytes:
+        return data
+    packed = zstandard.ZstdCompressor(level=level).compress(data)
+    return packed if len(packed) < len(data) else data
+
+
+def decompress_text(data: bytes) -> str:
+    """Reverses compress_text(); rows written with or without compression both read back."""
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("Stored text is zstd-compressed; install 'zstandard' to read it")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """A str column stored as bytes, zstd-compressed past ANALYSIS_COMPRESS_MIN_BYTES."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[bytes]:
+        return None if value is None else compress_text(value)
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Optional[str]:
+        return None if value is None else decompress_text(bytes(value))
@@ -0,0 +1,42 @@
+# app/utils/pagination.py
+import base64
+import json
+from typing import Any, List, Optional
+
+
+# --------------------------------------------------------
+## 🔖 Opaque Keyset Cursors
+# --------------------------------------------------------
+
+def encode_cursor(values: List[Any]) -> str:
+    """Packs the sort key of the last returned row into an opaque URL-safe token."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[List[Any]]:
+    """
+    Reverses encode_cursor(). Returns None for a missing token.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_limit(raw, default: int = 20, maximum: int = 100) -> int:
+    """Clamps a ?limit= query value to 1..maximum."""
+    try:
+        limit = int(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
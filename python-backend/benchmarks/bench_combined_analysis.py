@@ -0,0 +1,90 @@
+# benchmarks/bench_combined_analysis.py
+"""
+Benchmark: per-stage image analysis (tagging, OCR, vision, summary) vs the
+single structured-output call of AI_ANALYSIS_MODE=combined.
+
+Reports Gemini calls (uploads included), prompt/output tokens and wall time
+per analysis, with the result cache bypassed. Runs offline against the fake
+backend by default (GEMINI_FAKE_LATENCY simulates a round trip); pass --live
+to call Gemini with GEMINI_API_KEY. Run from python-backend/:
+
+    python benchmarks/bench_combined_analysis.py [image_path] [--live] [--runs N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_sample_image() -> str:
+    from PIL import Image, ImageDraw
+    path = os.path.join(tempfile.mkdtemp(), "sample.png")
+    image = Image.new("RGB", (640, 360), "white")
+    ImageDraw.Draw(image).text((40, 160), "Invoice #1042  Total: $318.40", fill="black")
+    image.save(path)
+    return path
+
+
+def measure(fn, runs: int) -> dict:
+    from app.ai import file_handles
+    from app.ai.gemini_client import get_gemini_client
+
+    client = get_gemini_client()
+    totals = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+    for _ in range(runs):
+        file_handles._files = None  # each analysis pays for its own upload
+        file_handles.get_file_cache()  # built here: the stages run outside the app context
+        before = client.stats()
+        start = time.perf_counter()
+        fn()
+        totals["seconds"] += time.perf_counter() - start
+        after = client.stats()
+        for key in ("calls", "prompt_tokens", "output_tokens"):
+            totals[key] += after[key] - before[key]
+    return {key: value / runs for key, value in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", nargs="?")
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the fake backend")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ["GEMINI_BACKEND"] = "fake"
+        os.environ.setdefault("GEMINI_FAKE_LATENCY", "0.8")
+    os.environ["AI_CACHE_PATH"] = ""          # memory-only caches, nothing shared between runs
+    os.environ["GEMINI_LIMITER_PATH"] = ""
+    os.environ.setdefault("GEMINI_RPM", "600")
+
+    from flask import Flask
+    from app.config import Config
+    from app.ai.analysis_pipeline import _run_image_stages, run_combined_image
+    from app.ai.gemini_client import init_gemini_client
+    from app.ai.result_cache import init_result_cache
+
+    image_path = args.image or make_sample_image()
+    mime_type = "image/png" if image_path.lower().endswith(".png") else "image/jpeg"
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_gemini_client(app)
+    init_result_cache(app)
+    with app.app_context():
+        stages = measure(lambda: _run_image_stages(image_path, image_bytes, mime_type, use_cache=False), args.runs)
+        combined = measure(lambda: run_combined_image(image_path, mime_type, use_cache=False), args.runs)
+
+    print(f"{'mode':<10}{'calls':>8}{'prompt tok':>12}{'output tok':>12}{'latency':>11}")
+    for name, row in (("stages", stages), ("combined", combined)):
+        print(f"{name:<10}{row['calls']:>8.1f}{row['prompt_tokens']:>12.0f}"
+              f"{row['output_tokens']:>12.0f}{row['seconds']:>9.2f} s")
+
+
+if __name__ == "__main__":
+    main()
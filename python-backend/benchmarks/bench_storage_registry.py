@@ -0,0 +1,57 @@
+# benchmarks/bench_storage_registry.py
+"""
+Microbenchmark: per-request cost of obtaining a storage driver.
+
+"per-request build" is what get_storage() used to do (a new driver, and for
+S3 a new boto3 client, on every call); "registry" is the cached driver.
+No network calls are made. Run from python-backend/:
+
+    python benchmarks/bench_storage_registry.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask
+from app.config import Config
+from app.storage.storage_loader import DRIVER_CLASSES, get_storage, reset_storage_registry
+
+ITERATIONS = {"local": 2000, "cloudinary": 2000, "s3": 200}
+
+
+def bench(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6  # microseconds per call
+
+
+def main():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(
+        LOCAL_UPLOAD_PATH=tempfile.mkdtemp(),
+        AWS_S3_BUCKET_NAME="bench-bucket",
+        AWS_ACCESS_KEY_ID="bench",
+        AWS_SECRET_ACCESS_KEY="bench",
+        AWS_REGION="us-east-1",
+        CLOUDINARY_CLOUD_NAME="bench",
+    )
+
+    print(f"{'driver':<12}{'per-request build':>20}{'registry':>14}{'speedup':>10}")
+    with app.app_context():
+        for driver, n in ITERATIONS.items():
+            app.config["STORAGE_DRIVER"] = driver
+            reset_storage_registry()
+            get_storage()  # warm the registry once
+
+            built = bench(DRIVER_CLASSES[driver], n)
+            cached = bench(get_storage, n)
+            print(f"{driver:<12}{built:>17.1f} us{cached:>11.1f} us{built / cached:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_summarize.py
+"""
+Benchmark: one summary call over the old 10k-character cut vs map-reduce
+over the whole document, and re-analysis after a one-paragraph edit.
+
+Reports Gemini calls, prompt tokens and wall time. Runs offline against the
+fake backend by default (GEMINI_FAKE_LATENCY simulates a round trip); pass
+--live to call Gemini with GEMINI_API_KEY. Run from python-backend/:
+
+    python benchmarks/bench_summarize.py [text_file] [--live] [--fan-out N] [--chunk-tokens N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def make_sample_text(paragraphs: int = 400) -> str:
+    rng = random.Random(7)
+    words = ("revenue quarter growth margin region customer contract supplier forecast "
+             "risk audit policy invoice shipment budget target review").split()
+    return "\n\n".join(
+        f"Section {i}. " + " ".join(rng.choice(words) for _ in range(rng.randint(40, 120))) + "."
+        for i in range(paragraphs)
+    )
+
+
+def measure(fn) -> dict:
+    from app.ai.gemini_client import get_gemini_client
+
+    client = get_gemini_client()
+    before = client.stats()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    after = client.stats()
+    return {"calls": after["calls"] - before["calls"],
+            "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+            "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("text", nargs="?")
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the fake backend")
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ["GEMINI_BACKEND"] = "fake"
+        os.environ.setdefault("GEMINI_FAKE_LATENCY", "0.8")
+    os.environ["AI_CACHE_PATH"] = ""          # memory-only cache, fresh per run
+    os.environ["GEMINI_LIMITER_PATH"] = ""
+    os.environ.setdefault("GEMINI_RPM", "600")
+
+    from flask import Flask
+    from app.config import Config
+    from app.ai.gemini_client import init_gemini_client
+    from app.ai.result_cache import init_result_cache
+    from app.ai.summarize_api import split_for_summary, summarize_document, summarize_text
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_gemini_client(app)
+    init_result_cache(app)
+
+    if args.text:
+        with open(args.text, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        text = make_sample_text()
+    paragraphs = text.split("\n\n")
+    paragraphs[len(paragraphs) // 2] += " (edited)"
+    edited = "\n\n".join(paragraphs)
+
+    chunks = split_for_summary(text, args.chunk_tokens)
+    print(f"{len(text)} chars, {len(chunks)} chunks of <= {args.chunk_tokens} tokens, fan-out {args.fan_out}")
+
+    rows = [
+        ("truncated", measure(lambda: summarize_text(text[:10000], use_cache=False))),
+        ("map-reduce", measure(lambda: summarize_document(text, True, args.chunk_tokens, args.fan_out))),
+        ("after edit", measure(lambda: summarize_document(edited, True, args.chunk_tokens, args.fan_out))),
+    ]
+    print(f"{'run':<12}{'calls':>7}{'prompt tok':>12}{'latency':>11}")
+    for name, row in rows:
+        print(f"{name:<12}{row['calls']:>7}{row['prompt_tokens']:>12}{row['seconds']:>9.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# tests/test_vector_index.py
+import numpy as np
+import pytest
+from flask import Flask
+
+from app import db
+from app.models import FileChunk
+from app.search.vector_index import FlatVectorIndex
+
+MODEL = "test-model"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _unit(dim: int, axis: int) -> bytes:
+    vec = np.zeros(dim, dtype=np.float32)
+    vec[axis] = 1.0
+    return vec.tobytes()
+
+
+def _add_file(index: FlatVectorIndex, file_id: int, axis: int, count: int = 2):
+    chunks = [FileChunk(file_id, 1, "summary", i, f"file {file_id} chunk {i}", _unit(4, axis), MODEL)
+              for i in range(count)]
+    db.session.add_all(chunks)
+    db.session.flush()
+    index.upsert(chunks)
+    db.session.commit()
+    return [c.id for c in chunks]
+
+
+def _remove_file(index: FlatVectorIndex, file_id: int):
+    index.remove_file(file_id)
+    FileChunk.query.filter_by(file_id=file_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _top(index: FlatVectorIndex, axis: int):
+    query = np.frombuffer(_unit(4, axis), dtype=np.float32)[None, :]
+    hit = index.search(1, MODEL, query, k=1)[0][0]
+    return hit.file_id, round(hit.score, 3)
+
+
+def test_delete_then_reinsert_with_reused_ids_invalidates_cache(app, tmp_path):
+    index = FlatVectorIndex(str(tmp_path / "vectors"))
+    first_ids = _add_file(index, file_id=1, axis=0)
+    assert _top(index, 0) == (1, 1.0)
+
+    # Same chunk count, and SQLite hands out the deleted rowids again
+    _remove_file(index, 1)
+    second_ids = _add_file(index, file_id=2, axis=1)
+    assert second_ids == first_ids
+
+    assert _top(index, 1) == (2, 1.0)
+    assert _top(index, 0) == (2, 0.0)
+
+    # A fresh process reading the on-disk cache sees the new vectors too
+    assert _top(FlatVectorIndex(str(tmp_path / "vectors")), 1) == (2, 1.0)